@@ -0,0 +1,111 @@
+"""
+Per-hit formatting cost of catalog search hits: re-parsing the stored JSON on every hit
+(the old request path) versus the cached `__slots__` records.
+
+    python -m agents.catalog.benchmark --hits 20000
+"""
+import argparse
+import json
+import time
+from typing import Callable, Dict, List
+
+from agents.catalog.records import CatalogRecordCache
+from agents.catalog.renderers import RENDERERS
+
+
+def load_hits(hotel_file: str, tour_file: str) -> List[Dict]:
+    """Weaviate-shaped records, stringified the way the ingestion endpoints store them."""
+    hits = []
+    with open(hotel_file) as f:
+        for hotel in json.load(f):
+            hits.append({"category": "hotel", "doc_id": str(hotel.get("id")), "chunk_id": "0", "url": "", "content": json.dumps(hotel, ensure_ascii=False)})
+    with open(tour_file) as f:
+        for tour in json.load(f):
+            hits.append({"category": "tour", "doc_id": str(tour.get("tour_id")), "chunk_id": "0", "url": "", "content": json.dumps(tour, ensure_ascii=False)})
+    return hits
+
+
+def format_hit_legacy(hit: Dict) -> Dict:
+    """What extract_travel_data / the controller formatters did per hit before the record cache."""
+    try:
+        payload = json.loads(hit["content"])
+        if isinstance(payload, str):
+            payload = json.loads(payload)
+    except Exception:
+        payload = {}
+    if hit["category"] == "hotel":
+        return {
+            "id": payload.get("id") or payload.get("hotel_id") or hit["doc_id"],
+            "name": payload.get("name"),
+            "city": payload.get("city"),
+            "country": payload.get("country"),
+            "description": payload.get("des") or payload.get("description"),
+            "price_range": payload.get("price_range") or payload.get("price"),
+            "link": hit["url"] or payload.get("link"),
+        }
+    provider = payload.get("provider") or {}
+    items = payload.get("items", [])
+    duration = 0
+    for item in items:
+        try:
+            duration += int(item.get("duration_minutes", 0))
+        except (ValueError, TypeError):
+            continue
+    return {
+        "id": payload.get("tour_id") or payload.get("id") or hit["doc_id"],
+        "name": payload.get("tour_name") or payload.get("name"),
+        "city": payload.get("city"),
+        "country": payload.get("country"),
+        "provider": provider.get("name"),
+        "provider_contact": provider.get("contact_email"),
+        "link": provider.get("website") or hit["url"],
+        "highlights": [item.get("location_name") or item.get("description") for item in items if isinstance(item, dict)],
+        "duration_minutes": duration,
+        "items": items,
+    }
+
+
+def make_cached_formatter(cache: CatalogRecordCache) -> Callable[[Dict], Dict]:
+    def format_hit_cached(hit: Dict) -> Dict:
+        record = cache.get(hit["category"], hit["doc_id"], hit["content"], chunk_id=hit["chunk_id"], url=hit["url"])
+        if record.rendered is None:
+            record.rendered = RENDERERS[record.category](record)
+        return record.to_dict()
+    return format_hit_cached
+
+
+def time_per_hit(format_hit: Callable[[Dict], Dict], hits: List[Dict], total_hits: int) -> float:
+    start = time.perf_counter()
+    for index in range(total_hits):
+        format_hit(hits[index % len(hits)])
+    return (time.perf_counter() - start) / total_hits * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--hits", type=int, default=20000, help="Search hits formatted per variant")
+    parser.add_argument("--hotels", default="hotel_data.json")
+    parser.add_argument("--tours", default="tour_data.json")
+    args = parser.parse_args()
+
+    hits = load_hits(args.hotels, args.tours)
+    cache = CatalogRecordCache()
+    cached = make_cached_formatter(cache)
+    # Same output either way
+    for hit in hits:
+        assert cached(hit) == format_hit_legacy(hit), hit["doc_id"]
+
+    legacy_us = time_per_hit(format_hit_legacy, hits, args.hits)
+    cached_us = time_per_hit(cached, hits, args.hits)
+    print(json.dumps({
+        "catalog_records": len(hits),
+        "hits": args.hits,
+        "legacy_us_per_hit": round(legacy_us, 3),
+        "cached_us_per_hit": round(cached_us, 3),
+        "speedup": round(legacy_us / cached_us, 2) if cached_us else None,
+        "record_cache": cache.stats(),
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
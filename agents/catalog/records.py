@@ -0,0 +1,195 @@
+import json
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from dotenv import load_dotenv
+load_dotenv()
+
+CATALOG_RECORD_CACHE_SIZE = int(os.getenv("CATALOG_RECORD_CACHE_SIZE", "10000"))
+
+
+def parse_payload(content: str) -> Optional[dict]:
+    """Parse a stringified (possibly double-encoded) catalog payload; None if it isn't a JSON object."""
+    try:
+        data = json.loads(content)
+        if isinstance(data, str):
+            data = json.loads(data)
+    except Exception:
+        return None
+    return data if isinstance(data, dict) else None
+
+
+def _duration(items: List[dict]) -> int:
+    duration = 0
+    for item in items:
+        try:
+            duration += int(item.get("duration_minutes", 0))
+        except (ValueError, TypeError):
+            continue
+    return duration
+
+
+class PayloadRecord:
+    """A parsed JSON payload of a category without a typed record."""
+
+    __slots__ = ("category", "payload", "rendered", "json_tokens", "rendered_tokens")
+
+    def __init__(self, category: str, payload: dict):
+        self.category = category
+        self.payload = payload
+        # Filled lazily by agents.catalog.renderers
+        self.rendered: Optional[str] = None
+        self.json_tokens: Optional[int] = None
+        self.rendered_tokens: Optional[int] = None
+
+
+class HotelRecord(PayloadRecord):
+
+    __slots__ = ("id", "name", "city", "country", "price_range", "description", "link")
+
+    def __init__(self, payload: dict, doc_id: Optional[str] = None, url: Optional[str] = None):
+        super().__init__("hotel", payload)
+        self.id = payload.get("id") or payload.get("hotel_id") or doc_id
+        self.name = payload.get("name")
+        self.city = payload.get("city")
+        self.country = payload.get("country")
+        self.price_range = payload.get("price_range") or payload.get("price")
+        self.description = payload.get("des") or payload.get("description")
+        self.link = url or payload.get("link")
+
+    def to_dict(self) -> dict:
+        return {
+            "id": self.id,
+            "name": self.name,
+            "city": self.city,
+            "country": self.country,
+            "description": self.description,
+            "price_range": self.price_range,
+            "link": self.link,
+        }
+
+
+class TourRecord(PayloadRecord):
+
+    __slots__ = ("id", "name", "city", "country", "provider", "provider_contact", "link", "items", "highlights", "duration_minutes")
+
+    def __init__(self, payload: dict, doc_id: Optional[str] = None, url: Optional[str] = None):
+        super().__init__("tour", payload)
+        provider = payload.get("provider")
+        provider = provider if isinstance(provider, dict) else {}
+        self.id = payload.get("tour_id") or payload.get("id") or doc_id
+        self.name = payload.get("tour_name") or payload.get("name")
+        self.city = payload.get("city")
+        self.country = payload.get("country")
+        self.provider = provider.get("name")
+        self.provider_contact = provider.get("contact_email")
+        self.link = provider.get("website") or url
+        self.items = [item for item in payload.get("items") or [] if isinstance(item, dict)]
+        self.highlights = [item.get("location_name") or item.get("description") for item in self.items]
+        self.duration_minutes = _duration(self.items)
+
+    def to_dict(self) -> dict:
+        return {
+            "id": self.id,
+            "name": self.name,
+            "city": self.city,
+            "country": self.country,
+            "provider": self.provider,
+            "provider_contact": self.provider_contact,
+            "link": self.link,
+            "highlights": list(self.highlights),
+            "duration_minutes": self.duration_minutes,
+            "items": self.items,
+        }
+
+
+RECORD_TYPES = {
+    "hotel": HotelRecord,
+    "tour": TourRecord,
+}
+
+CacheKey = Tuple[str, str, str]
+
+
+class CatalogRecordCache:
+    """
+    Per-process LRU of parsed catalog payloads keyed by (category, doc_id, chunk_id).
+
+    An entry is reused only while the stored content string is unchanged, so re-ingested
+    records are parsed again on their next hit; content that isn't JSON is cached as None.
+    """
+
+    def __init__(self, max_size: int = CATALOG_RECORD_CACHE_SIZE):
+        self.max_size = max(1, max_size)
+        self._entries: "OrderedDict[CacheKey, Tuple[str, Optional[PayloadRecord]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(
+            self,
+            category: Optional[str],
+            doc_id,
+            content: str,
+            chunk_id=None,
+            url: Optional[str] = None,
+        ) -> Optional[PayloadRecord]:
+        category = (category or "").lower()
+        key = (category, str(doc_id), str(chunk_id))
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == content:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+
+        payload = parse_payload(content) if content else None
+        if payload is None:
+            record = None
+        else:
+            record_type = RECORD_TYPES.get(category)
+            record = record_type(payload, doc_id, url) if record_type else PayloadRecord(category, payload)
+
+        with self._lock:
+            self.misses += 1
+            self._entries[key] = (content, record)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+        return record
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+
+_catalog_records = CatalogRecordCache()
+
+
+def get_catalog_records() -> CatalogRecordCache:
+    """Process-wide record cache shared by prompt rendering and API formatting."""
+    return _catalog_records
+
+
+def catalog_record_for_document(document) -> Optional[PayloadRecord]:
+    """The cached record of a retrieved langchain Document."""
+    metadata = document.metadata
+    return _catalog_records.get(
+        metadata.get("category"),
+        metadata.get("doc_id"),
+        document.page_content,
+        chunk_id=metadata.get("chunk_id"),
+        url=metadata.get("url"),
+    )
@@ -0,0 +1,105 @@
+import threading
+from collections import Counter
+from typing import Callable, Dict
+
+from langchain_core.documents import Document
+
+from agents.catalog.records import HotelRecord, PayloadRecord, TourRecord, catalog_record_for_document
+from agents.llm.token_budget import get_token_budgeter
+
+SEPARATOR = " — "
+
+
+def _join(*parts) -> str:
+    return SEPARATOR.join(str(part).strip() for part in parts if part not in (None, "", []))
+
+
+def _place(record: PayloadRecord) -> str:
+    return ", ".join(part for part in (record.city, record.country) if part)
+
+
+def render_hotel(record: HotelRecord) -> str:
+    """Hotel Artemide — Rome, Italy — $160–$240 per night — A stylish 4-star hotel ..."""
+    return _join(
+        record.name,
+        _place(record),
+        record.price_range,
+        " ".join((record.description or "").split()),
+        record.link,
+    )
+
+
+def render_tour(record: TourRecord) -> str:
+    """Tour name — place — provider — total duration, then one line per stop."""
+    stops = []
+    for item in record.items:
+        minutes = item.get("duration_minutes")
+        stop = _join(item.get("location_name"), item.get("description"))
+        stops.append(f"- {stop} ({minutes} min)" if minutes else f"- {stop}")
+    header = _join(
+        record.name,
+        _place(record),
+        f"by {record.provider}" if record.provider else None,
+        f"{record.duration_minutes} min" if record.duration_minutes else None,
+        record.link,
+    )
+    return "\n".join([header] + stops)
+
+
+# Renderer per Weaviate `category`; other categories (e.g. PDF chunks) are plain text already
+RENDERERS: Dict[str, Callable[[PayloadRecord], str]] = {
+    "hotel": render_hotel,
+    "tour": render_tour,
+}
+
+
+class CatalogRenderer:
+    """
+    Renders catalog documents for prompts from the cached records (agents/catalog/records.py):
+    each record is rendered once and the token saving against the raw JSON is tracked.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.renders: Counter = Counter()
+        self.json_tokens: Counter = Counter()
+        self.rendered_tokens: Counter = Counter()
+
+    def render_document(self, document: Document) -> str:
+        record = catalog_record_for_document(document)
+        renderer = RENDERERS.get(record.category) if record is not None else None
+        if renderer is None:
+            return document.page_content
+
+        if record.rendered is None:
+            budget = get_token_budgeter()
+            rendered = renderer(record)
+            record.json_tokens = budget.count(document.page_content)
+            record.rendered_tokens = budget.count(rendered)
+            record.rendered = rendered
+
+        with self._lock:
+            self.renders[record.category] += 1
+            self.json_tokens[record.category] += record.json_tokens
+            self.rendered_tokens[record.category] += record.rendered_tokens
+        return record.rendered
+
+    def stats(self) -> Dict:
+        categories = {}
+        for category, renders in self.renders.items():
+            json_tokens = self.json_tokens[category]
+            rendered_tokens = self.rendered_tokens[category]
+            categories[category] = {
+                "renders": renders,
+                "json_tokens": json_tokens,
+                "rendered_tokens": rendered_tokens,
+                "token_reduction": 1 - rendered_tokens / json_tokens if json_tokens else 0.0,
+            }
+        return {"categories": categories}
+
+
+_catalog_renderer = CatalogRenderer()
+
+
+def get_catalog_renderer() -> CatalogRenderer:
+    return _catalog_renderer
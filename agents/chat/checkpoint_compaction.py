@@ -0,0 +1,125 @@
+import asyncio
+import logging
+import os
+from contextlib import asynccontextmanager
+from typing import Dict
+
+from langgraph.checkpoint.postgres.aio import AsyncPostgresSaver, _get_connection
+from psycopg.rows import dict_row
+from psycopg_pool import AsyncConnectionPool
+from dotenv import load_dotenv
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+CHECKPOINT_KEEP_LAST = int(os.getenv("CHECKPOINT_KEEP_LAST", "5"))
+CHECKPOINT_COMPACTION_INTERVAL_S = float(os.getenv("CHECKPOINT_COMPACTION_INTERVAL_S", "900"))
+
+# Advisory lock key: checkpoint writes take it shared, the orphaned-blob delete exclusively
+CHECKPOINT_WRITE_LOCK_ID = 7_291_004_317
+
+
+# checkpoint_id is a time-ordered uuid6, so ordering by it gives the newest checkpoints first
+DELETE_OLD_CHECKPOINTS = """
+    DELETE FROM checkpoints c
+    USING (
+        SELECT thread_id, checkpoint_ns, checkpoint_id,
+               row_number() OVER (PARTITION BY thread_id, checkpoint_ns ORDER BY checkpoint_id DESC) AS rn
+        FROM checkpoints
+    ) ranked
+    WHERE c.thread_id = ranked.thread_id
+      AND c.checkpoint_ns = ranked.checkpoint_ns
+      AND c.checkpoint_id = ranked.checkpoint_id
+      AND ranked.rn > %s
+"""
+
+DELETE_ORPHANED_WRITES = """
+    DELETE FROM checkpoint_writes w
+    WHERE NOT EXISTS (
+        SELECT 1 FROM checkpoints c
+        WHERE c.thread_id = w.thread_id
+          AND c.checkpoint_ns = w.checkpoint_ns
+          AND c.checkpoint_id = w.checkpoint_id
+    )
+"""
+
+# A blob is live while any remaining checkpoint of its thread still points at its channel version
+DELETE_ORPHANED_BLOBS = """
+    DELETE FROM checkpoint_blobs b
+    WHERE NOT EXISTS (
+        SELECT 1 FROM checkpoints c
+        WHERE c.thread_id = b.thread_id
+          AND c.checkpoint_ns = b.checkpoint_ns
+          AND c.checkpoint -> 'channel_versions' ->> b.channel = b.version
+    )
+"""
+
+
+class CompactionSafePostgresSaver(AsyncPostgresSaver):
+    """
+    AsyncPostgresSaver whose checkpoint writes can't race compaction.
+
+    aput writes checkpoint_blobs before the checkpoints row that refers to them; on an autocommit
+    pool the blobs are visible on their own in between and DELETE_ORPHANED_BLOBS would drop them.
+    Pipelined writes (aput, aput_writes) therefore run in one transaction holding
+    CHECKPOINT_WRITE_LOCK_ID shared, which the orphaned-blob delete takes exclusively.
+    """
+
+    @asynccontextmanager
+    async def _cursor(self, *, pipeline: bool = False):
+        if not pipeline or self.pipe:
+            async with super()._cursor(pipeline=pipeline) as cur:
+                yield cur
+            return
+        async with _get_connection(self.conn) as conn:
+            async with self.lock, conn.transaction():
+                await conn.execute("SELECT pg_advisory_xact_lock_shared(%s)", (CHECKPOINT_WRITE_LOCK_ID,))
+                async with conn.pipeline(), conn.cursor(binary=True, row_factory=dict_row) as cur:
+                    yield cur
+
+
+def conversation_thread_id(conversation_id) -> str:
+    """LangGraph thread id for a conversation, so each conversation has its own checkpoint history."""
+    return f"conversation-{conversation_id}"
+
+
+async def compact_checkpoints(pool: AsyncConnectionPool, keep_last: int = CHECKPOINT_KEEP_LAST) -> Dict[str, int]:
+    """
+    Keep only the newest `keep_last` checkpoints per thread and delete the
+    checkpoint_writes / checkpoint_blobs rows no remaining checkpoint refers to.
+    """
+    keep_last = max(1, keep_last)
+    async with pool.connection() as conn:
+        async with conn.cursor() as cur:
+            await cur.execute(DELETE_OLD_CHECKPOINTS, (keep_last,))
+            checkpoints_deleted = cur.rowcount
+            await cur.execute(DELETE_ORPHANED_WRITES)
+            writes_deleted = cur.rowcount
+        # Waits for in-flight checkpoint writes (see CompactionSafePostgresSaver) so their blobs aren't seen as orphaned
+        async with conn.transaction(), conn.cursor() as cur:
+            await cur.execute("SELECT pg_advisory_xact_lock(%s)", (CHECKPOINT_WRITE_LOCK_ID,))
+            await cur.execute(DELETE_ORPHANED_BLOBS)
+            blobs_deleted = cur.rowcount
+
+    stats = {
+        "keep_last": keep_last,
+        "checkpoints_deleted": checkpoints_deleted,
+        "writes_deleted": writes_deleted,
+        "blobs_deleted": blobs_deleted,
+    }
+    logger.info(f"Checkpoint compaction: {stats}")
+    return stats
+
+
+async def run_compaction_loop(
+        pool: AsyncConnectionPool,
+        interval_seconds: float = CHECKPOINT_COMPACTION_INTERVAL_S,
+        keep_last: int = CHECKPOINT_KEEP_LAST,
+    ):
+    """Background job started from the app lifespan; runs until cancelled."""
+    while True:
+        await asyncio.sleep(interval_seconds)
+        try:
+            await compact_checkpoints(pool, keep_last)
+        except Exception as e:
+            logger.warning(f"Checkpoint compaction failed: {e}")
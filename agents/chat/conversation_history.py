@@ -0,0 +1,205 @@
+import asyncio
+import logging
+import os
+from typing import Dict, List, Optional
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage
+from langchain_core.output_parsers import StrOutputParser
+from langchain_core.prompts import ChatPromptTemplate
+
+from agents.llm.cache import llm_cache_scope
+from agents.llm.gateway import BACKGROUND, llm_priority
+from agents.llm.token_budget import get_token_budgeter
+from database.db import database
+from dotenv import load_dotenv
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Unsummarized messages put into the prompt next to the stored summary
+HISTORY_RECENT_MESSAGES = int(os.getenv("HISTORY_RECENT_MESSAGES", "10"))
+# A conversation is summarized once it has more unsummarized messages than this
+SUMMARY_TRIGGER_MESSAGES = int(os.getenv("SUMMARY_TRIGGER_MESSAGES", "20"))
+# Newest messages left out of the summary so recent turns stay verbatim
+SUMMARY_KEEP_RECENT = int(os.getenv("SUMMARY_KEEP_RECENT", "10"))
+SUMMARY_MAX_WORDS = int(os.getenv("SUMMARY_MAX_WORDS", "200"))
+SUMMARIZER_INTERVAL_S = float(os.getenv("SUMMARIZER_INTERVAL_S", "60"))
+SUMMARIZER_BATCH_SIZE = int(os.getenv("SUMMARIZER_BATCH_SIZE", "20"))
+
+SELECT_SUMMARY = "SELECT summary FROM conversation_summaries WHERE conversation_id = :conversation_id"
+
+SELECT_RECENT_MESSAGES = """
+    SELECT id, content, from_ai FROM messages
+    WHERE conversation_id = :conversation_id AND COALESCE(is_summarized, 0) = 0
+    ORDER BY id DESC
+    LIMIT :limit
+"""
+
+SELECT_UNSUMMARIZED_MESSAGES = """
+    SELECT id, content, from_ai FROM messages
+    WHERE conversation_id = :conversation_id AND COALESCE(is_summarized, 0) = 0
+    ORDER BY id ASC
+"""
+
+SELECT_CONVERSATIONS_TO_SUMMARIZE = """
+    SELECT conversation_id FROM messages
+    WHERE COALESCE(is_summarized, 0) = 0
+    GROUP BY conversation_id
+    HAVING count(*) > :trigger
+    LIMIT :limit
+"""
+
+UPSERT_SUMMARY = """
+    INSERT INTO conversation_summaries (conversation_id, summary, summarized_until_id, updated_at)
+    VALUES (:conversation_id, :summary, :summarized_until_id, EXTRACT(EPOCH FROM NOW()))
+    ON CONFLICT (conversation_id) DO UPDATE
+    SET summary = EXCLUDED.summary,
+        summarized_until_id = EXCLUDED.summarized_until_id,
+        updated_at = EXCLUDED.updated_at
+"""
+
+MARK_SUMMARIZED = """
+    UPDATE messages SET is_summarized = 1
+    WHERE conversation_id = :conversation_id AND id <= :summarized_until_id AND COALESCE(is_summarized, 0) = 0
+"""
+
+
+def _to_message(row) -> BaseMessage:
+    row = dict(row)
+    if row.get("from_ai"):
+        return AIMessage(content=row["content"] or "")
+    return HumanMessage(content=row["content"] or "")
+
+
+async def load_history(conversation_id, limit: int = HISTORY_RECENT_MESSAGES) -> Dict:
+    """
+    The stored summary plus the newest unsummarized messages (oldest first), with
+    AI replies as AIMessage and user messages as HumanMessage.
+    """
+    summary_row = await database.fetch_one(query=SELECT_SUMMARY, values={"conversation_id": int(conversation_id)})
+    rows = await database.fetch_all(
+        query=SELECT_RECENT_MESSAGES,
+        values={"conversation_id": int(conversation_id), "limit": limit},
+    )
+    return {
+        "summary": summary_row["summary"] if summary_row is not None else None,
+        "messages": [_to_message(row) for row in reversed(rows)],
+    }
+
+
+def has_prior_turns(summary: Optional[str], messages: List[BaseMessage], current_message: str) -> bool:
+    """
+    Whether the conversation had anything before the current message: a summary, or any stored
+    message other than the current user message (the webhook stores it before the agent runs).
+    """
+    if summary:
+        return True
+    earlier = list(messages or [])
+    if earlier and isinstance(earlier[-1], HumanMessage) and (earlier[-1].content or "").strip() == current_message.strip():
+        earlier = earlier[:-1]
+    return bool(earlier)
+
+
+def format_history(summary: Optional[str], messages: List[BaseMessage], max_tokens: Optional[int] = None) -> str:
+    """
+    Render the summary and recent turns as plain text for a prompt. With `max_tokens`
+    the oldest turns are dropped first (see TokenBudgeter.fit_history).
+    """
+    turns = []
+    for message in messages or []:
+        speaker = "Assistant" if isinstance(message, AIMessage) else "User"
+        turns.append(f"{speaker}: {message.content}")
+    summary_line = f"Summary of the earlier conversation: {summary}" if summary else None
+
+    if max_tokens is None:
+        lines = ([summary_line] if summary_line else []) + turns
+    else:
+        lines = get_token_budgeter().fit_history(summary_line, turns, max_tokens)
+    return "\n".join(lines) if lines else "No previous messages."
+
+
+class ConversationSummarizer:
+    """Folds older messages of long conversations into conversation_summaries."""
+
+    def __init__(
+            self,
+            llm_model: BaseChatModel,
+            trigger_messages: int = SUMMARY_TRIGGER_MESSAGES,
+            keep_recent: int = SUMMARY_KEEP_RECENT,
+            max_words: int = SUMMARY_MAX_WORDS,
+        ):
+        self.trigger_messages = trigger_messages
+        self.keep_recent = max(0, keep_recent)
+        self.max_words = max_words
+        prompt = ChatPromptTemplate.from_template(
+            """You maintain a running summary of a chat between a traveller and a travel concierge.
+
+            Current summary:
+            {summary}
+
+            New messages:
+            {messages}
+
+            Write an updated summary of at most {max_words} words. Keep names, dates, destinations,
+            budgets, preferences and anything already booked or promised. Return only the summary."""
+        )
+        self.chain = prompt | llm_model | StrOutputParser()
+        self.conversations_summarized = 0
+        self.messages_summarized = 0
+
+    async def summarize_conversation(self, conversation_id) -> int:
+        """Summarize all but the newest `keep_recent` unsummarized messages. Returns how many were folded."""
+        conversation_id = int(conversation_id)
+        rows = await database.fetch_all(query=SELECT_UNSUMMARIZED_MESSAGES, values={"conversation_id": conversation_id})
+        to_fold = rows[:len(rows) - self.keep_recent] if self.keep_recent else rows
+        if not to_fold:
+            return 0
+
+        summary_row = await database.fetch_one(query=SELECT_SUMMARY, values={"conversation_id": conversation_id})
+        # Queued behind interactive turns in the LLM gateway
+        with llm_cache_scope("summarizer"), llm_priority(BACKGROUND):
+            summary = await self.chain.ainvoke({
+                "summary": summary_row["summary"] if summary_row is not None else "None yet.",
+                "messages": format_history(None, [_to_message(row) for row in to_fold]),
+                "max_words": self.max_words,
+            })
+
+        summarized_until_id = dict(to_fold[-1])["id"]
+        values = {"conversation_id": conversation_id, "summarized_until_id": summarized_until_id}
+        async with database.transaction():
+            await database.execute(query=UPSERT_SUMMARY, values={**values, "summary": summary.strip()})
+            await database.execute(query=MARK_SUMMARIZED, values=values)
+
+        self.conversations_summarized += 1
+        self.messages_summarized += len(to_fold)
+        return len(to_fold)
+
+    async def summarize_pending(self, limit: int = SUMMARIZER_BATCH_SIZE) -> int:
+        rows = await database.fetch_all(
+            query=SELECT_CONVERSATIONS_TO_SUMMARIZE,
+            values={"trigger": self.trigger_messages, "limit": limit},
+        )
+        folded = 0
+        for row in rows:
+            try:
+                folded += await self.summarize_conversation(row["conversation_id"])
+            except Exception as e:
+                logger.warning(f"Summarizing conversation {row['conversation_id']} failed: {e}")
+        return folded
+
+    def stats(self) -> Dict:
+        return {
+            "conversations_summarized": self.conversations_summarized,
+            "messages_summarized": self.messages_summarized,
+        }
+
+
+async def run_summarizer_loop(summarizer: ConversationSummarizer, interval_seconds: float = SUMMARIZER_INTERVAL_S):
+    """Background job started from the app lifespan; runs until cancelled."""
+    while True:
+        await asyncio.sleep(interval_seconds)
+        try:
+            await summarizer.summarize_pending()
+        except Exception as e:
+            logger.warning(f"Conversation summarizer failed: {e}")
@@ -0,0 +1,117 @@
+import os
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, List, Optional
+
+from dotenv import load_dotenv
+load_dotenv()
+
+# Time budget of one webhook turn; clients may ask for less (never more) with DEADLINE_HEADER
+REQUEST_DEADLINE_S = float(os.getenv("REQUEST_DEADLINE_S", "25"))
+DEADLINE_HEADER = os.getenv("DEADLINE_HEADER", "X-Request-Deadline-Ms")
+# Remaining time below which a stage is skipped rather than started
+DEADLINE_MIN_RETRIEVAL_S = float(os.getenv("DEADLINE_MIN_RETRIEVAL_S", "1.5"))
+DEADLINE_MIN_GRADER_S = float(os.getenv("DEADLINE_MIN_GRADER_S", "4"))
+DEADLINE_MIN_ANSWER_S = float(os.getenv("DEADLINE_MIN_ANSWER_S", "1"))
+DEADLINE_MIN_RELEVANT_DATA_S = float(os.getenv("DEADLINE_MIN_RELEVANT_DATA_S", "0.2"))
+# Extra time the whole turn gets over the deadline, so stages degrade themselves before it is cut off
+DEADLINE_GRACE_S = float(os.getenv("DEADLINE_GRACE_S", "1"))
+
+FALLBACK_REPLY = "Sorry, I'm taking longer than usual to answer. Could you send your message again in a moment?"
+
+# Stages that can be degraded, as reported in the webhook response and metrics
+RETRIEVAL = "retrieval"
+GRADER = "grader"
+ANSWER = "answer"
+RELEVANT_DATA = "relevant_data"
+
+
+class DeadlineStats:
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.degraded_requests = 0
+        self.stages: Counter = Counter()
+
+    def record(self, deadline: "Deadline"):
+        with self._lock:
+            self.requests += 1
+            if deadline.degraded:
+                self.degraded_requests += 1
+            self.stages.update(deadline.degraded)
+
+    def stats(self) -> Dict:
+        return {
+            "budget_seconds": REQUEST_DEADLINE_S,
+            "requests": self.requests,
+            "degraded_requests": self.degraded_requests,
+            "degraded_rate": self.degraded_requests / self.requests if self.requests else 0.0,
+            "stages": dict(self.stages),
+        }
+
+
+_deadline_stats = DeadlineStats()
+
+
+def get_deadline_stats() -> DeadlineStats:
+    return _deadline_stats
+
+
+class Deadline:
+    """Absolute end time of one request, and the stages degraded to meet it."""
+
+    def __init__(self, budget_s: float = REQUEST_DEADLINE_S):
+        self.budget_s = budget_s
+        self.expires_at = time.monotonic() + budget_s
+        self.degraded: List[str] = []
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def allows(self, min_seconds: float) -> bool:
+        return self.remaining() >= min_seconds
+
+    def timeout(self, cap: Optional[float] = None) -> float:
+        """The remaining budget, no longer than a stage's own timeout `cap`."""
+        remaining = self.remaining()
+        return remaining if cap is None else min(cap, remaining)
+
+    def degrade(self, stage: str):
+        if stage not in self.degraded:
+            print(f"⚠ Deadline: degraded {stage} ({self.remaining():.2f}s left)")
+            self.degraded.append(stage)
+
+
+def deadline_from_headers(headers) -> Deadline:
+    """REQUEST_DEADLINE_S, shortened by a DEADLINE_HEADER value in milliseconds."""
+    budget = REQUEST_DEADLINE_S
+    try:
+        requested = float(headers.get(DEADLINE_HEADER)) / 1000
+        if requested > 0:
+            budget = min(budget, requested)
+    except (TypeError, ValueError):
+        pass
+    return Deadline(budget)
+
+
+_current_deadline: ContextVar[Optional[Deadline]] = ContextVar("request_deadline", default=None)
+
+
+def current_deadline() -> Optional[Deadline]:
+    """The deadline of the request being served; None outside a request (e.g. background summaries)."""
+    return _current_deadline.get()
+
+
+@contextmanager
+def deadline_scope(deadline: Deadline):
+    """Make `deadline` visible to the graph nodes, the retriever and the LLM gateway run inside this block."""
+    token = _current_deadline.set(deadline)
+    try:
+        yield deadline
+    finally:
+        _current_deadline.reset(token)
+        _deadline_stats.record(deadline)
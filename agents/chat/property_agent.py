@@ -5,13 +5,14 @@
 
 
 import os
+import uuid
 from langchain_groq import ChatGroq
-from typing import Union, Optional
+from typing import AsyncIterator, Dict, Union, Optional
 
 import weaviate
 from langchain.vectorstores import Weaviate
 
-from sentence_transformers import SentenceTransformer
+from agents.embeddings.service import get_embedding_service
 
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.runnables import RunnablePassthrough, RunnableParallel
@@ -21,7 +22,16 @@ from langchain_core.messages import HumanMessage
 
 
 from agents.langchain_integrations.weaviate_retriever import STretriever
+from agents.langchain_integrations.weaviate_multi_search import WeaviateMultiClassSearch
 from agents.langgraph_propertyagent.build import workflow
+from agents.langgraph_propertyagent.routing import RELEVANCE_ROUTER, WITH_CONTEXT, WITHOUT_CONTEXT, build_relevance_router
+from agents.langgraph_propertyagent.speculation import SPECULATIVE_NO_CONTEXT, SpeculativeExecutor
+from agents.langgraph_propertyagent.answer_cache import SEMANTIC_ANSWER_CACHE_ENABLED, get_semantic_answer_cache
+from agents.langgraph_propertyagent.intent import CANNED_NODE, SMALL_TALK_NODE, INTENT_CLASSIFIER_ENABLED, INTENT_ROUTER_ENABLED, IntentRouter
+from agents.llm.cache import LLM_CACHE_BACKEND, build_llm_cache, llm_cache_scope
+from agents.llm.token_budget import get_token_budgeter
+from agents.llm.gateway import LLM_HEDGE_ENABLED, LLM_HEDGE_FALLBACK_MODEL, GatewayChatModel, HedgePolicy, get_llm_gateway
+from agents.chat.temporal_parser import get_temporal_parser_stats, parse_appointment
 
 
 from langgraph.types import StateSnapshot
@@ -35,6 +45,8 @@ import pytz
 # Xác định múi giờ GMT+8
 timezone = pytz.timezone('Asia/Singapore')
 
+CALENDAR_PROMPT = "Please help me check if there is an appointment in this statement. If so, return it in the format: Hour: ..., Minute:..., Day:..., Month:..., Year:... Note the time in 24h format, fill in your answer in the blank and return only the answer without any other characters mixed in. The current time is {hour}:{minute}, {day_of_week}, Day: {day} , Month:{month} , {year}.Apply the mindset of continuity and logic of the week . Below is the sentence to analyze:"
+
 def print_message_history(snapshot: StateSnapshot):
     print("==================================================")
     for message in snapshot.values['messages']:
@@ -62,14 +74,23 @@ class graph:
             # weaviate_url: str = "http://localhost:8080",
             weaviate_url: str = "http://weaviate:8080",
             embedding_model: str = 'all-distilroberta-v1',
-            k: int = 5
+            k: int = 5,
+            relevance_router: str = RELEVANCE_ROUTER,
+            speculative: bool = SPECULATIVE_NO_CONTEXT,
+            semantic_answer_cache: bool = SEMANTIC_ANSWER_CACHE_ENABLED,
+            llm_cache_backend: str = LLM_CACHE_BACKEND,
+            intent_router: bool = INTENT_ROUTER_ENABLED,
+            intent_classifier: bool = INTENT_CLASSIFIER_ENABLED,
+            hedge_fallback_model: Optional[str] = LLM_HEDGE_FALLBACK_MODEL if LLM_HEDGE_ENABLED else None
         ):
     
         self.k = k
-        self.embedding = SentenceTransformer(embedding_model)
+        self.embedding = get_embedding_service(embedding_model)
         client = weaviate.Client(
             url=weaviate_url  # Default local Weaviate URL
         )
+        # Single-request search over all classes; the vectorstores below are the per-class fallback
+        self.multi_class_search = WeaviateMultiClassSearch(client)
         # Create vectorstores for multiple classes
         self.weaviate_vectorstore_support = Weaviate(
             client=client, 
@@ -89,12 +110,39 @@ class graph:
             text_key="content",  
             attributes=["category", "content", "url", "doc_id", "chunk_id","agentId"]
         )
+        # Exact-match cache of (rendered prompt, model params) -> generation; temperature 0 makes reuse safe
+        self.llm_cache = build_llm_cache(llm_cache_backend)
+        # Every Groq call goes through the process-wide gateway (concurrency, TPM budget, priority, retries)
+        self.llm_gateway = get_llm_gateway()
         # Initialize the agent
-        self.agent_chat = ChatGroq(
-            model=llm_model, 
-            temperature=0,
-            api_key=os.getenv("GROQ_API_KEY")
+        self.agent_chat = GatewayChatModel(
+            model=ChatGroq(
+                model=llm_model, 
+                temperature=0,
+                api_key=os.getenv("GROQ_API_KEY"),
+                # Retried by the gateway, which backs off without holding a slot
+                max_retries=0
+            ),
+            gateway=self.llm_gateway,
+            # Optional: race slow calls against a smaller model (LLM_HEDGE_ENABLED)
+            fallback_model=ChatGroq(
+                model=hedge_fallback_model,
+                temperature=0,
+                api_key=os.getenv("GROQ_API_KEY"),
+                max_retries=0
+            ) if hedge_fallback_model else None,
+            hedge=HedgePolicy() if hedge_fallback_model else None,
+            # On the wrapper so cache hits never queue for a slot
+            cache=self.llm_cache
         )
+        # Decides respond_wContext vs respond_woContext after retrieval
+        self.relevance_router = build_relevance_router(relevance_router, llm_model=self.agent_chat)
+        # Optional: generate the no-context answer in parallel with retrieval and routing
+        self.speculation = SpeculativeExecutor() if speculative else None
+        # Shared with the ingestion endpoints, which invalidate answers citing updated records
+        self.answer_cache = get_semantic_answer_cache() if semantic_answer_cache else None
+        # Greetings and small talk are answered without retrieval; the classifier reuses the query embedding
+        self.intent_router = IntentRouter(self.embedding if intent_classifier else None) if intent_router else None
         self.graph=None
 
 
@@ -102,24 +150,37 @@ class graph:
             self,
             checkpointer: Optional[Union[MemorySaver, PostgresSaver]] = None
         ):
-        retriever = STretriever(
+        self.retriever = retriever = STretriever(
             vectorstore_support=self.weaviate_vectorstore_support,
             vectorstore_hotels=self.weaviate_vectorstore_hotels,
             vectorstore_tours=self.weaviate_vectorstore_tours,
             embedding_model=self.embedding, 
+            search_backend=self.multi_class_search,
             k=self.k
         )
-        workflow_ = workflow(retriever=retriever, llm_model=self.agent_chat)
+        workflow_ = workflow(
+            retriever=retriever,
+            llm_model=self.agent_chat,
+            relevance_router=self.relevance_router,
+            speculation=self.speculation,
+            answer_cache=self.answer_cache,
+            embedding_model=self.embedding,
+            intent_router=self.intent_router,
+        )
         self.graph = await workflow_.initialize_graph(checkpointer=checkpointer)
         return self.graph
     
 
     async def chat_calendar(self, input: str, config: dict):
-        if not self.graph:
-            raise ValueError("Graph not initialized. Call initialize_graph first.")
         # Lấy thời gian hiện tại ở múi giờ GMT+8
         current_time = datetime.now(timezone)
 
+        # Most appointment sentences ("tomorrow at 3pm") are parsed locally; only the rest reach the LLM
+        parsed = parse_appointment(input, now=current_time)
+        get_temporal_parser_stats().record(parsed)
+        if parsed is not None:
+            return parsed.format()
+
         # Lấy các thông tin: thứ, giờ, phút, ngày, tháng, năm
         day_of_week = current_time.strftime('%A')  # Thứ
         hour = current_time.strftime('%H')         # Giờ
@@ -128,38 +189,86 @@ class graph:
         month = current_time.strftime('%m')        # Tháng
         year = current_time.strftime('%Y')
         
-        prompt = f"Please help me check if there is an appointment in this statement. If so, return it in the format: Hour: ..., Minute:..., Day:..., Month:..., Year:... Note the time in 24h format, fill in your answer in the blank and return only the answer without any other characters mixed in. The current time is {hour}:{minute}, {day_of_week}, Day: {day} , Month:{month} , {year}.Apply the mindset of continuity and logic of the week . Below is the sentence to analyze:"
-        calendar_input = f"calendar_ {prompt} {input}"
-        inputs = {
-            "messages": [
-                HumanMessage(content=calendar_input)
-            ],
-        }
-        # last_state = dict(list(self.graph.stream(inputs, config=config))[-1])
-        # Use async stream
-        async for state in self.graph.astream(inputs, config=config):
-            last_state = state
-            
-        response = last_state[list(last_state.keys())[0]]['messages'][0]
-        print("response....",response)
-        # return response[1:-1] # Due to leading and trailing quotes in the response (to investigate in future.)
-        return response
+        prompt = f"{CALENDAR_PROMPT.format(hour=hour, minute=minute, day_of_week=day_of_week, day=day, month=month, year=year)} {input}"
+        get_token_budgeter().record("chat_calendar", prompt)
+        # A single direct call: the sentence needs no retrieval, grading or history
+        with llm_cache_scope("chat_calendar"):
+            response = await self.agent_chat.ainvoke([HumanMessage(content=prompt)])
+        print("response....",response.content)
+        return response.content.strip()
     
+    def _discard_speculation(self, turn_id: str):
+        """Cancel a speculative answer the turn didn't use, e.g. when it timed out, failed or was cancelled."""
+        if self.speculation is not None:
+            self.speculation.discard(turn_id)
+
     async def chat(self, input: str, config: dict):
         if not self.graph:
             raise ValueError("Graph not initialized. Call initialize_graph first.")
             
+        # The message id keys the turn's speculative answer (see _discard_speculation)
+        message = HumanMessage(content=input, id=str(uuid.uuid4()))
         inputs = {
             "messages": [
-                HumanMessage(content=input)
+                message
             ],
         }
         # last_state = dict(list(self.graph.stream(inputs, config=config))[-1])
         # Use async stream
         print("start chat...")
-        async for state in self.graph.astream(inputs, config=config):
-            last_state = state
+        documents = []
+        try:
+            async for state in self.graph.astream(inputs, config=config):
+                last_state = state
+                # Keep the retrieved documents so callers can reuse them instead of querying Weaviate again
+                if "retriever" in state:
+                    documents = state["retriever"].get("documents") or []
+        finally:
+            self._discard_speculation(message.id)
             
         response = last_state[list(last_state.keys())[0]]['messages'][0]
         # return response[1:-1] # Due to leading and trailing quotes in the response (to investigate in future.)
-        return response
+        return response, documents
+
+    async def astream_chat(self, input: str, config: dict) -> AsyncIterator[Dict]:
+        """
+        Same turn as `chat`, but yields {"type": "token", "content": ...} for every token the
+        responding node generates, then one {"type": "done", "reply": ..., "documents": [...]}.
+        """
+        if not self.graph:
+            raise ValueError("Graph not initialized. Call initialize_graph first.")
+
+        message = HumanMessage(content=input, id=str(uuid.uuid4()))
+        inputs = {
+            "messages": [
+                message
+            ],
+        }
+        responders = (WITH_CONTEXT, WITHOUT_CONTEXT, "respond_cached", CANNED_NODE, SMALL_TALK_NODE)
+        documents = []
+        tokens = []
+        reply = None
+        try:
+            async for event in self.graph.astream_events(inputs, config=config, version="v2"):
+                kind = event["event"]
+                node = event.get("metadata", {}).get("langgraph_node")
+                if kind == "on_chat_model_stream" and node in responders:
+                    content = event["data"]["chunk"].content
+                    if content:
+                        tokens.append(content)
+                        yield {"type": "token", "content": content}
+                elif kind == "on_chain_end" and event["name"] in ("retriever", *responders):
+                    output = event["data"].get("output")
+                    if not isinstance(output, dict):
+                        continue
+                    if event["name"] == "retriever":
+                        documents = output.get("documents") or []
+                    elif output.get("messages"):
+                        reply = output["messages"][0]
+        finally:
+            # Also runs when the client disconnects and the stream is closed
+            self._discard_speculation(message.id)
+
+        if reply is None:
+            reply = f" {''.join(tokens)}"
+        yield {"type": "done", "reply": reply, "documents": documents}
@@ -0,0 +1,135 @@
+"""
+Accuracy of the rule-based appointment parser on a fixed corpus, and its latency against
+the LLM call chat_calendar falls back to.
+
+    python -m agents.chat.temporal_benchmark --iterations 2000
+    python -m agents.chat.temporal_benchmark --llm 10    # also time 10 direct LLM calls (needs GROQ_API_KEY)
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+from agents.chat.temporal_parser import CALENDAR_TIMEZONE, parse_appointment
+
+# Wednesday 14 October 2026, 10:00 in Singapore
+NOW = CALENDAR_TIMEZONE.localize(datetime(2026, 10, 14, 10, 0))
+
+# (sentence, expected (year, month, day, hour, minute) or None when it must go to the LLM)
+CORPUS: List[Tuple[str, Optional[Tuple[int, int, int, int, int]]]] = [
+    ("Can we meet tomorrow at 3pm?", (2026, 10, 15, 15, 0)),
+    ("tomorrow 9am please", (2026, 10, 15, 9, 0)),
+    ("Book a call tmr at 10:30am", (2026, 10, 15, 10, 30)),
+    ("today at 4.15pm", (2026, 10, 14, 16, 15)),
+    ("I'm free today 17:45", (2026, 10, 14, 17, 45)),
+    ("the day after tomorrow at 11am", (2026, 10, 16, 11, 0)),
+    ("in 3 days at 2pm", (2026, 10, 17, 14, 0)),
+    ("in two hours", (2026, 10, 14, 12, 0)),
+    ("call me in 30 minutes", (2026, 10, 14, 10, 30)),
+    ("in an hour", (2026, 10, 14, 11, 0)),
+    ("Friday at 2pm", (2026, 10, 16, 14, 0)),
+    ("next monday 09:00", (2026, 10, 19, 9, 0)),
+    ("this thursday at noon", (2026, 10, 15, 12, 0)),
+    ("coming Sunday 8pm", (2026, 10, 18, 20, 0)),
+    ("next wednesday at 3 pm", (2026, 10, 21, 15, 0)),
+    ("tonight at 8", (2026, 10, 14, 20, 0)),
+    ("this afternoon at 3", (2026, 10, 14, 15, 0)),
+    ("tonight at 8:30", (2026, 10, 14, 20, 30)),
+    ("tomorrow at midnight", (2026, 10, 15, 0, 0)),
+    ("at 5pm", (2026, 10, 14, 17, 0)),
+    ("at 9am", (2026, 10, 15, 9, 0)),
+    ("25 December at 10am", (2026, 12, 25, 10, 0)),
+    ("December 3rd, 2026 at 14:00", (2026, 12, 3, 14, 0)),
+    ("on the 2nd of Jan at 9.30am", (2027, 1, 2, 9, 30)),
+    ("20/10 at 3pm", (2026, 10, 20, 15, 0)),
+    ("meeting on 5/11/2026 16:30", (2026, 11, 5, 16, 30)),
+    ("2026-10-30 at 08:15", (2026, 10, 30, 8, 15)),
+    ("Saturday 10am", (2026, 10, 17, 10, 0)),
+    ("Wednesday at 3pm", None),              # said on a Wednesday: today or next week
+    ("tomorrow", None),                      # no time
+    ("tomorrow at 3", None),                 # 3am or 3pm
+    ("call me at 3:30", None),               # 3:30am or 3:30pm
+    ("next monday 9:00", None),              # no leading zero: 9am or 9pm
+    ("next week at 3pm", None),
+    ("this weekend around 10am", None),
+    ("tomorrow or friday at 2pm", None),     # two dates
+    ("at 3pm or 4pm", None),                 # two times
+    ("Do you have rooms in Rome?", None),
+    ("I want to visit Bali in May", None),
+    ("", None),
+]
+
+
+def _expected_format(expected: Tuple[int, int, int, int, int]) -> str:
+    year, month, day, hour, minute = expected
+    return f"Hour: {hour:02d}, Minute: {minute:02d}, Day: {day:02d}, Month: {month:02d}, Year: {year}"
+
+
+def check_corpus() -> List[str]:
+    failures = []
+    for sentence, expected in CORPUS:
+        parsed = parse_appointment(sentence, now=NOW)
+        got = parsed.format() if parsed is not None else None
+        want = _expected_format(expected) if expected is not None else None
+        if got != want:
+            failures.append(f"{sentence!r}: expected {want}, got {got}")
+    return failures
+
+
+def time_parser(iterations: int) -> float:
+    sentences = [sentence for sentence, _ in CORPUS]
+    start = time.perf_counter()
+    for index in range(iterations):
+        parse_appointment(sentences[index % len(sentences)], now=NOW)
+    return (time.perf_counter() - start) / iterations * 1e6
+
+
+async def time_llm(calls: int) -> float:
+    """Mean latency of the single direct call chat_calendar makes when the rules give up."""
+    from langchain_core.messages import HumanMessage
+    from langchain_groq import ChatGroq
+
+    from agents.chat.property_agent import CALENDAR_PROMPT
+
+    llm = ChatGroq(model="llama-3.3-70b-versatile", temperature=0, api_key=os.getenv("GROQ_API_KEY"))
+    instructions = CALENDAR_PROMPT.format(
+        hour=NOW.strftime('%H'), minute=NOW.strftime('%M'), day_of_week=NOW.strftime('%A'),
+        day=NOW.strftime('%d'), month=NOW.strftime('%m'), year=NOW.strftime('%Y'),
+    )
+    sentences = [sentence for sentence, _ in CORPUS if sentence]
+    start = time.perf_counter()
+    for index in range(calls):
+        await llm.ainvoke([HumanMessage(content=f"{instructions} {sentences[index % len(sentences)]}")])
+    return (time.perf_counter() - start) / calls * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=2000, help="Parser calls to time")
+    parser.add_argument("--llm", type=int, default=0, help="Direct LLM calls to time (0 to skip)")
+    args = parser.parse_args()
+
+    failures = check_corpus()
+    parsed = sum(1 for sentence, _ in CORPUS if parse_appointment(sentence, now=NOW) is not None)
+    parser_us = time_parser(args.iterations)
+    report = {
+        "corpus": len(CORPUS),
+        "parsed_locally": parsed,
+        "llm_fallbacks": len(CORPUS) - parsed,
+        "failures": failures,
+        "parser_us_per_sentence": round(parser_us, 2),
+    }
+    if args.llm:
+        llm_us = asyncio.run(time_llm(args.llm))
+        report["llm_us_per_sentence"] = round(llm_us, 2)
+        report["speedup"] = round(llm_us / parser_us, 1) if parser_us else None
+    print(json.dumps(report, indent=2))
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
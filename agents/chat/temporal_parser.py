@@ -0,0 +1,244 @@
+import re
+import threading
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+import pytz
+
+CALENDAR_TIMEZONE = pytz.timezone('Asia/Singapore')
+
+WEEKDAYS = {
+    "monday": 0, "mon": 0,
+    "tuesday": 1, "tue": 1, "tues": 1,
+    "wednesday": 2, "wed": 2,
+    "thursday": 3, "thu": 3, "thur": 3, "thurs": 3,
+    "friday": 4, "fri": 4,
+    # "sat"/"sun" are left out: too often ordinary words
+    "saturday": 5, "sunday": 6,
+}
+MONTHS = {
+    "january": 1, "jan": 1, "february": 2, "feb": 2, "march": 3, "mar": 3,
+    "april": 4, "apr": 4, "may": 5, "june": 6, "jun": 6, "july": 7, "jul": 7,
+    "august": 8, "aug": 8, "september": 9, "sep": 9, "sept": 9,
+    "october": 10, "oct": 10, "november": 11, "nov": 11, "december": 12, "dec": 12,
+}
+_WEEKDAY = "|".join(sorted(WEEKDAYS, key=len, reverse=True))
+_MONTH = "|".join(sorted(MONTHS, key=len, reverse=True))
+
+# Relative offsets that fix both date and time
+_IN_DELTA = re.compile(r"\bin\s+(\d{1,3}|an?|one|two|three)\s+(minutes?|mins?|hours?|hrs?)\b")
+# Dates
+_RELATIVE_DAY = re.compile(r"\b(day after tomorrow|tomorrow|tmr|tmrw|today|tonight|this evening|this afternoon|this morning)\b")
+_IN_DAYS = re.compile(r"\bin\s+(\d{1,2}|one|two|three)\s+days?\b")
+_WEEKDAY_RE = re.compile(rf"\b(?:(next|this|coming)\s+)?({_WEEKDAY})\b")
+_DAY_MONTH = re.compile(rf"\b(\d{{1,2}})(?:st|nd|rd|th)?\s+(?:of\s+)?({_MONTH})\b(?:,?\s+(\d{{4}}))?")
+_MONTH_DAY = re.compile(rf"\b({_MONTH})\s+(\d{{1,2}})(?:st|nd|rd|th)?\b(?:,?\s+(\d{{4}}))?")
+_ISO_DATE = re.compile(r"\b(\d{4})-(\d{1,2})-(\d{1,2})\b")
+# Singapore writes day first: 25/12, 25/12/2026, 25/12/26
+_NUMERIC_DATE = re.compile(r"\b(\d{1,2})/(\d{1,2})(?:/(\d{2,4}))?\b")
+# Times
+_TIME_12H = re.compile(r"\b(\d{1,2})(?:[:.](\d{2}))?\s*(a\.?m\.?|p\.?m\.?)(?![a-z])")
+# Only hours that can't be 12h clock times: 0, 13-23 or a leading zero ("09:00"); "3:30" could be am or pm
+_TIME_24H = re.compile(r"\b(0\d?|1[3-9]|2[0-3])[:h]([0-5]\d)\b(?!\s*[ap]\.?m)")
+_TIME_WORD = re.compile(r"\b(noon|midday|midnight)\b")
+# Dates the rules don't resolve; a time next to them must not be read as today
+_VAGUE_DATE = re.compile(r"\b(next|this|coming)\s+(week|weekend|month|year)\b|\bweekend\b|\bend of\b")
+# An hour (and minutes) without am/pm, only resolved next to a part of the day: "tonight at 8", "this afternoon at 3:30"
+# It must land in that part's hours, so "this morning at 12" or "tonight at 1" go to the LLM
+_PART_OF_DAY_HOURS = {
+    "this morning": range(5, 12),
+    "this afternoon": range(12, 18),
+    "this evening": range(16, 24),
+    "tonight": range(17, 24),
+}
+_BARE_HOUR = re.compile(r"\bat\s+(\d{1,2})(?:[:.]([0-5]\d))?(?:\s*o'?clock)?\b(?!\s*[:/.\d])")
+
+_NUMBER_WORDS = {"a": 1, "an": 1, "one": 1, "two": 2, "three": 3}
+
+
+class ParsedAppointment(NamedTuple):
+    when: datetime
+    rule: str
+
+    def format(self) -> str:
+        """The answer format chat_calendar's prompt asks the LLM for."""
+        return (
+            f"Hour: {self.when.hour:02d}, Minute: {self.when.minute:02d}, "
+            f"Day: {self.when.day:02d}, Month: {self.when.month:02d}, Year: {self.when.year}"
+        )
+
+
+def _number(token: str) -> int:
+    return _NUMBER_WORDS[token] if token in _NUMBER_WORDS else int(token)
+
+
+def _only(matches: List) -> Optional[object]:
+    """The single distinct match; None when absent. Conflicting matches raise ValueError."""
+    distinct = list(dict.fromkeys(matches))
+    if len(distinct) > 1:
+        raise ValueError("ambiguous")
+    return distinct[0] if distinct else None
+
+
+def _future_year(now: datetime, month: int, day: int) -> int:
+    """A date written without a year means its next occurrence (29 Feb: in the next leap year)."""
+    year = now.year
+    while True:
+        try:
+            candidate = now.replace(year=year, month=month, day=day)
+        except ValueError:
+            if (month, day) != (2, 29):
+                raise
+            candidate = None
+        if candidate is not None and candidate.date() >= now.date():
+            return year
+        year += 1
+
+
+def _parse_date(text: str, now: datetime) -> Tuple[Optional[datetime], Optional[str], Optional[int]]:
+    """(date, rule, hours implied by a part of the day e.g. 'tonight')."""
+    found = []
+    for match in _RELATIVE_DAY.finditer(text):
+        word = match.group(1)
+        if word == "day after tomorrow":
+            found.append((now + timedelta(days=2), "day_after_tomorrow", None))
+        elif word in ("tomorrow", "tmr", "tmrw"):
+            found.append((now + timedelta(days=1), "tomorrow", None))
+        else:
+            found.append((now, "today", _PART_OF_DAY_HOURS.get(word)))
+    for match in _IN_DAYS.finditer(text):
+        found.append((now + timedelta(days=_number(match.group(1))), "in_days", None))
+    for match in _WEEKDAY_RE.finditer(text):
+        qualifier, name = match.group(1), match.group(2)
+        days_ahead = (WEEKDAYS[name] - now.weekday()) % 7
+        if days_ahead == 0:
+            if qualifier is None or qualifier == "this":
+                # "Friday" said on a Friday: today or in a week
+                raise ValueError("ambiguous weekday")
+            days_ahead = 7
+        found.append((now + timedelta(days=days_ahead), "weekday", None))
+    for match in _DAY_MONTH.finditer(text):
+        day, month = int(match.group(1)), MONTHS[match.group(2)]
+        year = int(match.group(3)) if match.group(3) else _future_year(now, month, day)
+        found.append((now.replace(year=year, month=month, day=day), "day_month", None))
+    for match in _MONTH_DAY.finditer(text):
+        month, day = MONTHS[match.group(1)], int(match.group(2))
+        year = int(match.group(3)) if match.group(3) else _future_year(now, month, day)
+        found.append((now.replace(year=year, month=month, day=day), "month_day", None))
+    for match in _ISO_DATE.finditer(text):
+        year, month, day = int(match.group(1)), int(match.group(2)), int(match.group(3))
+        found.append((now.replace(year=year, month=month, day=day), "iso_date", None))
+    for match in _NUMERIC_DATE.finditer(text):
+        day, month = int(match.group(1)), int(match.group(2))
+        if match.group(3):
+            year = int(match.group(3))
+            year = year + 2000 if year < 100 else year
+        else:
+            year = _future_year(now, month, day)
+        found.append((now.replace(year=year, month=month, day=day), "numeric_date", None))
+
+    if not found:
+        return None, None, None
+    dates = {date.date() for date, _, _ in found}
+    if len(dates) > 1:
+        raise ValueError("conflicting dates")
+    day_parts = {hours for _, _, hours in found if hours is not None}
+    date, rule, _ = found[0]
+    return date, rule, day_parts.pop() if len(day_parts) == 1 else None
+
+
+def _parse_time(text: str) -> Optional[Tuple[int, int]]:
+    times = []
+    for match in _TIME_12H.finditer(text):
+        hour, minute = int(match.group(1)), int(match.group(2) or 0)
+        if not 1 <= hour <= 12 or minute > 59:
+            raise ValueError("invalid 12h time")
+        is_pm = match.group(3).startswith("p")
+        times.append(((hour % 12) + (12 if is_pm else 0), minute))
+    for match in _TIME_24H.finditer(text):
+        times.append((int(match.group(1)), int(match.group(2))))
+    for match in _TIME_WORD.finditer(text):
+        times.append((0, 0) if match.group(1) == "midnight" else (12, 0))
+    return _only(times)
+
+
+def parse_appointment(text: str, now: Optional[datetime] = None) -> Optional[ParsedAppointment]:
+    """
+    Rule-based extraction of one appointment time from `text` (Asia/Singapore).
+    Returns None whenever the sentence is not parsed with confidence, so the caller can
+    fall back to the LLM: no date/time at all, conflicting mentions, an hour without am/pm
+    ("at 3", "at 3:30"), or a date without a time.
+    """
+    now = now or datetime.now(CALENDAR_TIMEZONE)
+    text = " ".join((text or "").lower().split())
+    if not text or _VAGUE_DATE.search(text):
+        return None
+    try:
+        deltas = [
+            timedelta(minutes=_number(amount)) if unit.startswith("m") else timedelta(hours=_number(amount))
+            for amount, unit in _IN_DELTA.findall(text)
+        ]
+        delta = _only(deltas)
+        date, date_rule, day_part = _parse_date(text, now)
+        time_of_day = _parse_time(text)
+    except (ValueError, KeyError):
+        return None
+
+    if delta is not None:
+        if date is not None or time_of_day is not None:
+            return None
+        return ParsedAppointment((now + delta).replace(second=0, microsecond=0), "in_delta")
+
+    if time_of_day is None:
+        bare = _BARE_HOUR.search(text)
+        if bare is None or day_part is None or not 1 <= int(bare.group(1)) <= 12:
+            return None
+        hour = int(bare.group(1)) % 12 + (12 if day_part.start >= 12 else 0)
+        if hour not in day_part:
+            return None
+        time_of_day = (hour, int(bare.group(2) or 0))
+
+    hour, minute = time_of_day
+    if date is None:
+        # A time on its own means its next occurrence
+        when = now.replace(hour=hour, minute=minute, second=0, microsecond=0)
+        if when <= now:
+            when += timedelta(days=1)
+        return ParsedAppointment(when, "time_only")
+
+    when = date.replace(hour=hour, minute=minute, second=0, microsecond=0)
+    return ParsedAppointment(when, date_rule)
+
+
+class TemporalParserStats:
+    """How often chat_calendar was answered by a rule versus the LLM fallback."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.rules: Counter = Counter()
+        self.fallbacks = 0
+
+    def record(self, parsed: Optional[ParsedAppointment]):
+        with self._lock:
+            if parsed is None:
+                self.fallbacks += 1
+            else:
+                self.rules[parsed.rule] += 1
+
+    def stats(self) -> Dict:
+        parsed = sum(self.rules.values())
+        total = parsed + self.fallbacks
+        return {
+            "parsed": parsed,
+            "llm_fallbacks": self.fallbacks,
+            "parse_rate": parsed / total if total else 0.0,
+            "rules": dict(self.rules),
+        }
+
+
+_temporal_parser_stats = TemporalParserStats()
+
+
+def get_temporal_parser_stats() -> TemporalParserStats:
+    return _temporal_parser_stats
@@ -220,7 +220,7 @@ async def setup():
     return agent
 
 async def run_chat(agent,config,input):
-    response = await agent.chat(input, config=config)
+    response, _ = await agent.chat(input, config=config)
     return response
 
 
@@ -0,0 +1,90 @@
+from datetime import datetime
+
+import pytest
+
+from agents.chat.temporal_parser import CALENDAR_TIMEZONE, _future_year, parse_appointment
+
+# Wednesday 14 October 2026, 10:00 in Singapore
+NOW = CALENDAR_TIMEZONE.localize(datetime(2026, 10, 14, 10, 0))
+
+
+def _parsed(text, now=NOW):
+    parsed = parse_appointment(text, now)
+    return None if parsed is None else (parsed.when.year, parsed.when.month, parsed.when.day, parsed.when.hour, parsed.when.minute)
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("25/12 at 3pm", (2026, 12, 25, 15, 0)),
+    ("3/11 at 10am", (2026, 11, 3, 10, 0)),
+    ("1/2/27 at 9am", (2027, 2, 1, 9, 0)),
+    ("5/10/2027 14:30", (2027, 10, 5, 14, 30)),
+    # Already past this year: next year's
+    ("1/10 at 9am", (2027, 10, 1, 9, 0)),
+])
+def test_numeric_dates_are_day_first(text, expected):
+    assert _parsed(text) == expected
+
+
+@pytest.mark.parametrize("text", ["13/25 at 3pm", "31/4 at 3pm"])
+def test_impossible_numeric_dates_go_to_the_llm(text):
+    assert _parsed(text) is None
+
+
+def test_future_year_of_a_date_later_this_year():
+    assert _future_year(NOW, 12, 25) == 2026
+    assert _future_year(NOW, 10, 14) == 2026
+    assert _future_year(NOW, 10, 13) == 2027
+
+
+def test_future_year_of_29_february_is_the_next_leap_year():
+    assert _future_year(NOW, 2, 29) == 2028
+    leap_day = CALENDAR_TIMEZONE.localize(datetime(2028, 2, 29, 10, 0))
+    assert _future_year(leap_day, 2, 29) == 2028
+    after_leap_day = CALENDAR_TIMEZONE.localize(datetime(2028, 3, 1, 10, 0))
+    assert _future_year(after_leap_day, 2, 29) == 2032
+    assert _parsed("29 feb at 3pm") == (2028, 2, 29, 15, 0)
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("tonight at 8", (2026, 10, 14, 20, 0)),
+    ("this afternoon at 12", (2026, 10, 14, 12, 0)),
+    ("this afternoon at 3:30", (2026, 10, 14, 15, 30)),
+    ("this morning at 11", (2026, 10, 14, 11, 0)),
+    ("this evening at 7 o'clock", (2026, 10, 14, 19, 0)),
+])
+def test_bare_hour_next_to_a_part_of_the_day(text, expected):
+    assert _parsed(text) == expected
+
+
+@pytest.mark.parametrize("text", [
+    # Not 00:00: ambiguous, left to the LLM
+    "this morning at 12",
+    "tonight at 12",
+    "tonight at 1",
+    "this afternoon at 7",
+    # No part of the day: am or pm is unknown
+    "tomorrow at 3",
+])
+def test_bare_hour_outside_the_part_of_the_day_goes_to_the_llm(text):
+    assert _parsed(text) is None
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("midnight", (2026, 10, 15, 0, 0)),
+    ("tomorrow at 12am", (2026, 10, 15, 0, 0)),
+    ("tomorrow at 12pm", (2026, 10, 15, 12, 0)),
+    ("tomorrow at noon", (2026, 10, 15, 12, 0)),
+])
+def test_midnight_and_noon(text, expected):
+    assert _parsed(text) == expected
+
+
+@pytest.mark.parametrize("text", [
+    "tomorrow or friday at 3pm",
+    "at 3pm or 4pm tomorrow",
+    "next week at 3pm",
+    "wednesday at 3pm",
+    "tomorrow",
+])
+def test_conflicting_or_incomplete_mentions_go_to_the_llm(text):
+    assert _parsed(text) is None
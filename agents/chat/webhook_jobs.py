@@ -0,0 +1,260 @@
+import asyncio
+import json
+import logging
+import os
+import socket
+import threading
+import time
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from database.db import database
+from dotenv import load_dotenv
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Acknowledge webhooks with 202 and answer them from the webhook_jobs queue
+WEBHOOK_ASYNC_MODE = os.getenv("WEBHOOK_ASYNC_MODE", "false").lower() == "true"
+WEBHOOK_WORKERS = int(os.getenv("WEBHOOK_WORKERS", "4"))
+WEBHOOK_JOB_POLL_INTERVAL_S = float(os.getenv("WEBHOOK_JOB_POLL_INTERVAL_S", "1"))
+WEBHOOK_JOB_MAX_ATTEMPTS = int(os.getenv("WEBHOOK_JOB_MAX_ATTEMPTS", "3"))
+WEBHOOK_JOB_RETRY_BACKOFF_S = float(os.getenv("WEBHOOK_JOB_RETRY_BACKOFF_S", "5"))
+# A running job not finished after this long is assumed lost with its replica and is claimed again
+WEBHOOK_JOB_LOCK_TIMEOUT_S = float(os.getenv("WEBHOOK_JOB_LOCK_TIMEOUT_S", "120"))
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+INSERT_JOB = """
+    INSERT INTO webhook_jobs (conversation_id, agent_id, client_id, message, callback_url, status, attempts, available_at, created_at, updated_at)
+    VALUES (:conversation_id, :agent_id, :client_id, :message, :callback_url, 'queued', 0, :now, :now, :now)
+    RETURNING id
+"""
+
+# SKIP LOCKED lets every worker of every replica claim a different row without blocking on the others
+CLAIM_JOBS = """
+    UPDATE webhook_jobs j
+    SET status = 'running', attempts = j.attempts + 1, locked_at = :now, locked_by = :worker, updated_at = :now
+    WHERE j.id IN (
+        SELECT id FROM webhook_jobs
+        WHERE (status = 'queued' AND available_at <= :now)
+           OR (status = 'running' AND locked_at < :stale_before)
+        ORDER BY available_at, id
+        LIMIT :limit
+        FOR UPDATE SKIP LOCKED
+    )
+    RETURNING j.*
+"""
+
+# Updates are guarded by locked_by so a worker whose job was reclaimed as stale can't overwrite the new owner
+SAVE_REPLY = """
+    UPDATE webhook_jobs SET reply = :reply, relevant_data = CAST(:relevant_data AS jsonb), updated_at = :now
+    WHERE id = :id AND locked_by = :worker
+"""
+
+COMPLETE_JOB = """
+    UPDATE webhook_jobs SET status = 'done', locked_at = NULL, error = NULL, updated_at = :now
+    WHERE id = :id AND locked_by = :worker
+"""
+
+RETRY_JOB = """
+    UPDATE webhook_jobs SET status = :status, available_at = :available_at, locked_at = NULL, error = :error, updated_at = :now
+    WHERE id = :id AND locked_by = :worker
+"""
+
+COUNT_JOBS = "SELECT status, count(*) AS jobs FROM webhook_jobs GROUP BY status"
+
+
+class WebhookJobStats:
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.enqueued = 0
+        self.claimed = 0
+        self.completed = 0
+        self.retried = 0
+        self.failed = 0
+        self.queue_waits: List[float] = []
+        self.run_times: List[float] = []
+
+    def record(self, field: str, seconds: Optional[float] = None, samples: Optional[List[float]] = None):
+        with self._lock:
+            setattr(self, field, getattr(self, field) + 1)
+            if samples is not None and seconds is not None:
+                samples.append(seconds)
+                del samples[:-1000]
+
+    @staticmethod
+    def _summary(samples: List[float]) -> Dict:
+        ordered = sorted(samples)
+        return {
+            "samples": len(ordered),
+            "avg_ms": sum(ordered) / len(ordered) * 1000 if ordered else 0.0,
+            "p95_ms": ordered[int(0.95 * (len(ordered) - 1))] * 1000 if ordered else 0.0,
+            "max_ms": ordered[-1] * 1000 if ordered else 0.0,
+        }
+
+    def stats(self) -> Dict:
+        return {
+            "async_mode": WEBHOOK_ASYNC_MODE,
+            "workers": WEBHOOK_WORKERS,
+            "enqueued": self.enqueued,
+            "claimed": self.claimed,
+            "completed": self.completed,
+            "retried": self.retried,
+            "failed": self.failed,
+            "queue_wait": self._summary(self.queue_waits),
+            "run_time": self._summary(self.run_times),
+        }
+
+
+class WebhookJobQueue:
+    """
+    Postgres-backed queue of webhook turns (webhook_jobs, docker_init/scripts_sql/initialize_webhook_jobs.sql).
+    Safe to share between replicas: claims use FOR UPDATE SKIP LOCKED and stale claims are taken over.
+    """
+
+    def __init__(
+            self,
+            max_attempts: int = WEBHOOK_JOB_MAX_ATTEMPTS,
+            retry_backoff_s: float = WEBHOOK_JOB_RETRY_BACKOFF_S,
+            lock_timeout_s: float = WEBHOOK_JOB_LOCK_TIMEOUT_S,
+        ):
+        self.max_attempts = max_attempts
+        self.retry_backoff_s = retry_backoff_s
+        self.lock_timeout_s = lock_timeout_s
+        self.worker_prefix = f"{socket.gethostname()}:{os.getpid()}"
+        self._stats = WebhookJobStats()
+        # Wakes this replica's idle workers on enqueue; other replicas find the job on their next poll
+        self._wakeup = asyncio.Event()
+
+    async def enqueue(self, conversation_id, agent_id: str, client_id: str, message: str, callback_url: Optional[str] = None) -> int:
+        row = await database.fetch_one(INSERT_JOB, values={
+            "conversation_id": int(conversation_id),
+            "agent_id": str(agent_id),
+            "client_id": str(client_id),
+            "message": message,
+            "callback_url": callback_url,
+            "now": time.time(),
+        })
+        self._stats.record("enqueued")
+        self._wakeup.set()
+        return row["id"]
+
+    async def claim(self, worker: str, limit: int = 1) -> List[Dict]:
+        now = time.time()
+        rows = await database.fetch_all(CLAIM_JOBS, values={
+            "now": now,
+            "worker": worker,
+            "stale_before": now - self.lock_timeout_s,
+            "limit": limit,
+        })
+        jobs = [dict(row) for row in rows]
+        for job in jobs:
+            self._stats.record("claimed", now - job["created_at"], self._stats.queue_waits)
+        return jobs
+
+    async def save_reply(self, job: Dict, reply: str, relevant_data: Dict):
+        """Keep the reply before delivering it, so a delivery retry doesn't run the agent again."""
+        await database.execute(SAVE_REPLY, values={
+            "id": job["id"],
+            "worker": job["locked_by"],
+            "reply": reply,
+            "relevant_data": json.dumps(relevant_data),
+            "now": time.time(),
+        })
+
+    async def complete(self, job: Dict, run_time: float):
+        await database.execute(COMPLETE_JOB, values={"id": job["id"], "worker": job["locked_by"], "now": time.time()})
+        self._stats.record("completed", run_time, self._stats.run_times)
+
+    async def retry(self, job: Dict, error: str):
+        """Requeue with exponential backoff, or mark failed once max_attempts is used up."""
+        now = time.time()
+        exhausted = job["attempts"] >= self.max_attempts
+        await database.execute(RETRY_JOB, values={
+            "id": job["id"],
+            "worker": job["locked_by"],
+            "status": FAILED if exhausted else QUEUED,
+            "available_at": now + self.retry_backoff_s * 2 ** (job["attempts"] - 1),
+            "error": error[:2000],
+            "now": now,
+        })
+        self._stats.record("failed" if exhausted else "retried")
+
+    async def wait_for_work(self, timeout: float):
+        try:
+            await asyncio.wait_for(self._wakeup.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        self._wakeup.clear()
+
+    async def counts(self) -> Dict[str, int]:
+        rows = await database.fetch_all(COUNT_JOBS)
+        return {row["status"]: row["jobs"] for row in rows}
+
+    def stats(self) -> Dict:
+        return self._stats.stats()
+
+
+_webhook_job_queue: Optional[WebhookJobQueue] = None
+
+
+def get_webhook_job_queue() -> WebhookJobQueue:
+    global _webhook_job_queue
+    if _webhook_job_queue is None:
+        _webhook_job_queue = WebhookJobQueue()
+    return _webhook_job_queue
+
+
+async def _run_worker(
+        queue: WebhookJobQueue,
+        worker: str,
+        handler: Callable[[Dict], Awaitable[None]],
+        ready: Callable[[], bool],
+        poll_interval_s: float,
+    ):
+    while True:
+        try:
+            # Leave jobs queued (for other replicas) while this one couldn't start an LLM call
+            jobs = await queue.claim(worker) if ready() else []
+        except Exception as e:
+            logger.warning(f"Webhook job claim failed: {e}")
+            jobs = []
+        if not jobs:
+            await queue.wait_for_work(poll_interval_s)
+            continue
+
+        job = jobs[0]
+        started = time.monotonic()
+        try:
+            if job["attempts"] > queue.max_attempts:
+                # Reclaimed after its replica died too many times; don't run it again
+                raise RuntimeError(f"gave up after {job['attempts'] - 1} attempts")
+            await handler(job)
+            await queue.complete(job, time.monotonic() - started)
+        except asyncio.CancelledError:
+            # Left as running; another worker takes it over after WEBHOOK_JOB_LOCK_TIMEOUT_S
+            raise
+        except Exception as e:
+            logger.warning(f"Webhook job {job['id']} failed (attempt {job['attempts']}): {e}")
+            try:
+                await queue.retry(job, f"{type(e).__name__}: {e}")
+            except Exception as retry_error:
+                logger.warning(f"Webhook job {job['id']} could not be requeued: {retry_error}")
+
+
+async def run_webhook_workers(
+        handler: Callable[[Dict], Awaitable[None]],
+        ready: Callable[[], bool] = lambda: True,
+        workers: int = WEBHOOK_WORKERS,
+        poll_interval_s: float = WEBHOOK_JOB_POLL_INTERVAL_S,
+    ):
+    """Background job started from the app lifespan: `workers` claim loops calling `handler(job)`; runs until cancelled."""
+    queue = get_webhook_job_queue()
+    await asyncio.gather(*(
+        _run_worker(queue, f"{queue.worker_prefix}:{index}", handler, ready, poll_interval_s)
+        for index in range(workers)
+    ))
@@ -0,0 +1,122 @@
+import asyncio
+import logging
+import os
+import time
+from collections import Counter
+from typing import Callable, Dict, List, Optional, Tuple
+
+from dotenv import load_dotenv
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+EMBEDDING_MICROBATCH_MAX_SIZE = int(os.getenv("EMBEDDING_MICROBATCH_MAX_SIZE", "32"))
+EMBEDDING_MICROBATCH_MAX_WAIT_MS = float(os.getenv("EMBEDDING_MICROBATCH_MAX_WAIT_MS", "5"))
+
+
+class EmbeddingBatcher:
+    """
+    Collects concurrent single-text encode requests for up to `max_wait_ms` (or until
+    `max_batch_size` requests are queued) and runs them as one batched forward pass.
+
+    The worker task is bound to the event loop of the first caller and restarted
+    transparently if that loop changes (e.g. between test runs or app reloads).
+    """
+
+    def __init__(
+            self,
+            encode_batch: Callable[[List[str]], List[List[float]]],
+            max_batch_size: int = EMBEDDING_MICROBATCH_MAX_SIZE,
+            max_wait_ms: float = EMBEDDING_MICROBATCH_MAX_WAIT_MS,
+        ):
+        self.encode_batch = encode_batch
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait_ms = max(0.0, max_wait_ms)
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+        self.requests = 0
+        self.batches = 0
+        self.failed_batches = 0
+        self.max_queue_depth = 0
+        self.total_queue_wait_ms = 0.0
+        self.total_encode_ms = 0.0
+        self.batch_sizes: Counter = Counter()
+
+    def _ensure_worker(self) -> asyncio.AbstractEventLoop:
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop or self._worker is None or self._worker.done():
+            self._loop = loop
+            self._queue = asyncio.Queue()
+            self._worker = loop.create_task(self._run())
+        return loop
+
+    async def encode(self, text: str) -> List[float]:
+        loop = self._ensure_worker()
+        future = loop.create_future()
+        self._queue.put_nowait((text, future, time.perf_counter()))
+        self.requests += 1
+        self.max_queue_depth = max(self.max_queue_depth, self._queue.qsize())
+        return await future
+
+    async def _collect(self) -> List[Tuple[str, asyncio.Future, float]]:
+        batch = [await self._queue.get()]
+        deadline = self._loop.time() + self.max_wait_ms / 1000
+        while len(batch) < self.max_batch_size:
+            if not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+                continue
+            remaining = deadline - self._loop.time()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self):
+        while True:
+            batch = await self._collect()
+            live = [entry for entry in batch if not entry[1].done()]
+            if not live:
+                continue
+
+            started = time.perf_counter()
+            for _, _, enqueued in live:
+                self.total_queue_wait_ms += (started - enqueued) * 1000
+            try:
+                vectors = await self._loop.run_in_executor(
+                    None, self.encode_batch, [text for text, _, _ in live]
+                )
+            except Exception as exc:
+                self.failed_batches += 1
+                logger.warning("Embedding micro-batch of %d failed: %s", len(live), exc)
+                for _, future, _ in live:
+                    if not future.done():
+                        future.set_exception(exc)
+                continue
+
+            self.total_encode_ms += (time.perf_counter() - started) * 1000
+            self.batches += 1
+            self.batch_sizes[len(live)] += 1
+            for (_, future, _), vector in zip(live, vectors):
+                if not future.done():
+                    future.set_result(vector)
+
+    def stats(self) -> Dict:
+        batched_items = sum(size * count for size, count in self.batch_sizes.items())
+        return {
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait_ms,
+            "queue_depth": self._queue.qsize() if self._queue is not None else 0,
+            "max_queue_depth": self.max_queue_depth,
+            "requests": self.requests,
+            "batches": self.batches,
+            "failed_batches": self.failed_batches,
+            "avg_batch_size": batched_items / self.batches if self.batches else 0.0,
+            "batch_size_histogram": {str(size): count for size, count in sorted(self.batch_sizes.items())},
+            "avg_queue_wait_ms": self.total_queue_wait_ms / batched_items if batched_items else 0.0,
+            "avg_encode_ms": self.total_encode_ms / self.batches if self.batches else 0.0,
+        }
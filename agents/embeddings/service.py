@@ -0,0 +1,140 @@
+import asyncio
+import logging
+import os
+import resource
+import sys
+import threading
+import time
+from typing import Dict, List, Optional
+
+from sentence_transformers import SentenceTransformer
+from agents.embeddings.batcher import EmbeddingBatcher
+from agents.embeddings.cache import QueryEmbeddingCache, get_query_embedding_cache
+from dotenv import load_dotenv
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+EMBEDDING_MODEL_NAME = os.getenv("EMBEDDING_MODEL_NAME", "all-distilroberta-v1")
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "32"))
+EMBEDDING_MICROBATCH_ENABLED = os.getenv("EMBEDDING_MICROBATCH_ENABLED", "true").lower() == "true"
+
+
+def _resident_memory_mb() -> Optional[float]:
+    """Current resident set size of this process in MB (peak RSS when psutil is unavailable)."""
+    try:
+        import psutil
+        return psutil.Process(os.getpid()).memory_info().rss / (1024 * 1024)
+    except ImportError:
+        pass
+    try:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss is reported in bytes on macOS and in kilobytes on Linux
+        return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+    except Exception:
+        return None
+
+
+class EmbeddingService:
+    """Owns a single SentenceTransformer instance shared by every caller in the process."""
+
+    def __init__(
+            self,
+            model_name: str = EMBEDDING_MODEL_NAME,
+            batch_size: int = EMBEDDING_BATCH_SIZE,
+            microbatch: bool = EMBEDDING_MICROBATCH_ENABLED,
+            query_cache: Optional[QueryEmbeddingCache] = None,
+        ):
+        self.model_name = model_name
+        self.batch_size = batch_size
+        # Single-text encodes are user queries and are served from the LRU cache when possible
+        self.query_cache = query_cache or get_query_embedding_cache()
+        # Concurrent aencode() calls are merged into one forward pass
+        self.batcher = EmbeddingBatcher(self.encode_batch) if microbatch else None
+        self._model: Optional[SentenceTransformer] = None
+        self._lock = threading.Lock()
+        self.load_seconds: Optional[float] = None
+        self.rss_before_load_mb: Optional[float] = None
+        self.rss_after_load_mb: Optional[float] = None
+
+    @property
+    def model(self) -> SentenceTransformer:
+        if self._model is None:
+            with self._lock:
+                if self._model is None:
+                    self._load()
+        return self._model
+
+    def _load(self):
+        self.rss_before_load_mb = _resident_memory_mb()
+        started = time.perf_counter()
+        self._model = SentenceTransformer(self.model_name)
+        self.load_seconds = time.perf_counter() - started
+        self.rss_after_load_mb = _resident_memory_mb()
+        logger.info(
+            "✓ Loaded embedding model %s in %.2fs (rss %.1f MB -> %.1f MB)",
+            self.model_name,
+            self.load_seconds,
+            self.rss_before_load_mb or 0.0,
+            self.rss_after_load_mb or 0.0,
+        )
+
+    def encode(self, text: str) -> List[float]:
+        vector = self.query_cache.get(self.model_name, text)
+        if vector is None:
+            vector = self.model.encode(text).tolist()
+            self.query_cache.put(self.model_name, text, vector)
+        return vector
+
+    def encode_batch(self, texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+        return self.model.encode(texts, batch_size=self.batch_size).tolist()
+
+    async def aencode(self, text: str) -> List[float]:
+        vector = self.query_cache.get(self.model_name, text)
+        if vector is not None:
+            return vector
+        if self.batcher is not None:
+            vector = await self.batcher.encode(text)
+        else:
+            loop = asyncio.get_running_loop()
+            vector = await loop.run_in_executor(None, lambda: self.model.encode(text).tolist())
+        self.query_cache.put(self.model_name, text, vector)
+        return vector
+
+    async def aencode_batch(self, texts: List[str]) -> List[List[float]]:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, self.encode_batch, texts)
+
+    def stats(self) -> Dict:
+        return {
+            "model_name": self.model_name,
+            "loaded": self._model is not None,
+            "load_seconds": self.load_seconds,
+            "rss_before_load_mb": self.rss_before_load_mb,
+            "rss_after_load_mb": self.rss_after_load_mb,
+            "rss_current_mb": _resident_memory_mb(),
+            "microbatch": self.batcher.stats() if self.batcher is not None else None,
+            "query_cache": self.query_cache.stats(),
+        }
+
+
+_services: Dict[str, EmbeddingService] = {}
+_services_lock = threading.Lock()
+
+
+def get_embedding_service(model_name: str = EMBEDDING_MODEL_NAME) -> EmbeddingService:
+    """Return the process-wide EmbeddingService for `model_name`, creating it on first use."""
+    service = _services.get(model_name)
+    if service is None:
+        with _services_lock:
+            service = _services.get(model_name)
+            if service is None:
+                service = EmbeddingService(model_name)
+                _services[model_name] = service
+    return service
+
+
+def embedding_stats() -> List[Dict]:
+    return [service.stats() for service in _services.values()]
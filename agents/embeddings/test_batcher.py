@@ -0,0 +1,81 @@
+import asyncio
+
+import pytest
+
+from agents.embeddings.batcher import EmbeddingBatcher
+
+
+def _fake_encode(calls):
+    def encode_batch(texts):
+        calls.append(list(texts))
+        return [[float(len(text))] for text in texts]
+    return encode_batch
+
+
+def test_concurrent_requests_share_one_batch_in_order():
+    calls = []
+    batcher = EmbeddingBatcher(_fake_encode(calls), max_batch_size=8, max_wait_ms=50)
+
+    async def run():
+        return await asyncio.gather(*(batcher.encode("x" * n) for n in range(1, 6)))
+
+    vectors = asyncio.run(run())
+    assert vectors == [[1.0], [2.0], [3.0], [4.0], [5.0]]
+    assert calls == [["x", "xx", "xxx", "xxxx", "xxxxx"]]
+    assert batcher.stats()["batches"] == 1
+
+
+def test_batches_are_capped_at_max_batch_size():
+    calls = []
+    batcher = EmbeddingBatcher(_fake_encode(calls), max_batch_size=2, max_wait_ms=50)
+
+    async def run():
+        return await asyncio.gather(*(batcher.encode(str(n)) for n in range(5)))
+
+    assert len(asyncio.run(run())) == 5
+    assert [len(batch) for batch in calls] == [2, 2, 1]
+
+
+def test_failed_batch_raises_in_every_caller_and_worker_keeps_running():
+    attempts = []
+
+    def encode_batch(texts):
+        attempts.append(list(texts))
+        if len(attempts) == 1:
+            raise RuntimeError("model crashed")
+        return [[0.0] for _ in texts]
+
+    batcher = EmbeddingBatcher(encode_batch, max_batch_size=8, max_wait_ms=20)
+
+    async def run():
+        results = await asyncio.gather(batcher.encode("a"), batcher.encode("b"), return_exceptions=True)
+        return results, await batcher.encode("c")
+
+    results, retried = asyncio.run(run())
+    assert all(isinstance(result, RuntimeError) for result in results)
+    assert retried == [0.0]
+    assert batcher.stats()["failed_batches"] == 1
+
+
+def test_worker_restarts_on_a_new_event_loop():
+    calls = []
+    batcher = EmbeddingBatcher(_fake_encode(calls), max_wait_ms=0)
+    assert asyncio.run(batcher.encode("one")) == [3.0]
+    assert asyncio.run(batcher.encode("three")) == [5.0]
+    assert calls == [["one"], ["three"]]
+
+
+def test_cancelled_request_is_not_encoded():
+    calls = []
+    batcher = EmbeddingBatcher(_fake_encode(calls), max_batch_size=8, max_wait_ms=30)
+
+    async def run():
+        cancelled = asyncio.ensure_future(batcher.encode("dropped"))
+        await asyncio.sleep(0)
+        cancelled.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await cancelled
+        return await batcher.encode("kept")
+
+    assert asyncio.run(run()) == [4.0]
+    assert calls == [["kept"]]
@@ -0,0 +1,61 @@
+from agents.embeddings import cache as cache_module
+from agents.embeddings.cache import QueryEmbeddingCache, normalize_query
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+
+def test_normalize_query_collapses_whitespace_but_keeps_case():
+    assert normalize_query("  Tours   in\tRome \n") == "Tours in Rome"
+    assert normalize_query("Rome") != normalize_query("rome")
+    assert normalize_query(None) == ""
+
+
+def test_hit_ignores_whitespace_and_is_per_model():
+    cache = QueryEmbeddingCache(max_size=4, ttl_seconds=0)
+    cache.put("model-a", "hotels in Rome", [1.0])
+    assert cache.get("model-a", " hotels  in Rome ") == [1.0]
+    assert cache.get("model-a", "Hotels in Rome") is None
+    assert cache.get("model-b", "hotels in Rome") is None
+    assert (cache.hits, cache.misses) == (1, 2)
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = QueryEmbeddingCache(max_size=2, ttl_seconds=0)
+    cache.put("m", "a", [1.0])
+    cache.put("m", "b", [2.0])
+    assert cache.get("m", "a") == [1.0]
+    cache.put("m", "c", [3.0])
+    assert cache.get("m", "b") is None
+    assert cache.get("m", "a") == [1.0]
+    assert cache.get("m", "c") == [3.0]
+    assert cache.evictions == 1
+
+
+def test_entries_expire_after_ttl(monkeypatch):
+    clock = _Clock()
+    monkeypatch.setattr(cache_module.time, "monotonic", clock.monotonic)
+    cache = QueryEmbeddingCache(max_size=4, ttl_seconds=10)
+    cache.put("m", "a", [1.0])
+    clock.now += 10
+    assert cache.get("m", "a") == [1.0]
+    clock.now += 0.5
+    assert cache.get("m", "a") is None
+    assert cache.expirations == 1
+    assert cache.stats()["size"] == 0
+
+
+def test_put_refreshes_the_ttl(monkeypatch):
+    clock = _Clock()
+    monkeypatch.setattr(cache_module.time, "monotonic", clock.monotonic)
+    cache = QueryEmbeddingCache(max_size=4, ttl_seconds=10)
+    cache.put("m", "a", [1.0])
+    clock.now += 8
+    cache.put("m", "a", [2.0])
+    clock.now += 8
+    assert cache.get("m", "a") == [2.0]
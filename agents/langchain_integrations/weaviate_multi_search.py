@@ -0,0 +1,104 @@
+import logging
+from typing import Dict, List, NamedTuple, Optional, Set
+
+import weaviate
+from langchain_core.documents import Document
+
+logger = logging.getLogger(__name__)
+
+WEAVIATE_CLASS_HOTELS = "Hotels"
+WEAVIATE_CLASS_TOURS = "Tours"
+WEAVIATE_CLASS_SUPPORT = "SupportAgent"
+VECTORSTORE_ATTRIBUTES = ["category", "content", "url", "doc_id", "chunk_id", "agentId"]
+
+
+class ClassSearch(NamedTuple):
+    """One class `Get` inside a combined query: its k and optional nearVector distance cutoff."""
+    class_name: str
+    limit: int
+    max_distance: Optional[float] = None
+
+
+class WeaviateMultiClassSearch:
+    """
+    Runs nearVector searches over several Weaviate classes in a single GraphQL request
+    (one `Get { Hotels {...} Tours {...} SupportAgent {...} }`) and returns the hits
+    tagged by class. Classes missing from the schema (read once, re-read after a failed
+    query) are left out of the request and come back empty.
+    """
+
+    def __init__(
+            self,
+            client: weaviate.Client,
+            attributes: Optional[List[str]] = None,
+            text_key: str = "content",
+        ):
+        self.client = client
+        self.attributes = attributes or VECTORSTORE_ATTRIBUTES
+        self.text_key = text_key
+        self._schema_classes: Optional[Set[str]] = None
+
+    def schema_classes(self) -> Optional[Set[str]]:
+        """Class names in the Weaviate schema, or None if it couldn't be read."""
+        if self._schema_classes is None:
+            try:
+                schema = self.client.schema.get()
+            except Exception as e:
+                logger.warning(f"Could not read the Weaviate schema: {e}")
+                return None
+            self._schema_classes = {entry["class"] for entry in schema.get("classes") or []}
+        return self._schema_classes
+
+    def existing_classes(self, classes: List[ClassSearch]) -> List[ClassSearch]:
+        known = self.schema_classes()
+        return list(classes) if known is None else [spec for spec in classes if spec.class_name in known]
+
+    def build_query(self, vector: List[float], classes: List[ClassSearch], agent_id: Optional[str] = None):
+        builders = []
+        for spec in classes:
+            near_vector = {"vector": vector}
+            if spec.max_distance is not None:
+                near_vector["distance"] = spec.max_distance
+            builder = (
+                self.client.query
+                .get(spec.class_name, self.attributes)
+                .with_near_vector(near_vector)
+                .with_limit(spec.limit)
+                .with_additional(["id", "distance"])
+            )
+            if agent_id is not None:
+                builder = builder.with_where({
+                    "path": ["agentId"],
+                    "operator": "Equal",
+                    "valueString": str(agent_id)
+                })
+            builders.append(builder)
+        return self.client.query.multi_get(builders)
+
+    def search_raw(self, vector: List[float], classes: List[ClassSearch], agent_id: Optional[str] = None) -> Dict[str, List[dict]]:
+        """Return the raw GraphQL records per class name. Raises if Weaviate reports errors."""
+        existing = self.existing_classes(classes)
+        data = {}
+        if existing:
+            response = self.build_query(vector, existing, agent_id).do()
+            if response.get("errors"):
+                # The schema may have changed since it was read
+                self._schema_classes = None
+                raise RuntimeError(f"Weaviate multi-class query failed: {response['errors']}")
+            data = response.get("data", {}).get("Get", {}) or {}
+        return {spec.class_name: data.get(spec.class_name) or [] for spec in classes}
+
+    def search(self, vector: List[float], classes: List[ClassSearch], agent_id: Optional[str] = None) -> Dict[str, List[Document]]:
+        raw = self.search_raw(vector, classes, agent_id)
+        return {
+            class_name: [self.to_document(class_name, record) for record in records]
+            for class_name, records in raw.items()
+        }
+
+    def to_document(self, class_name: str, record: dict) -> Document:
+        additional = record.get("_additional") or {}
+        metadata = {key: value for key, value in record.items() if key not in (self.text_key, "_additional")}
+        metadata["class"] = class_name
+        metadata["id"] = additional.get("id")
+        metadata["distance"] = additional.get("distance")
+        return Document(page_content=record.get(self.text_key) or "", metadata=metadata)
@@ -1,27 +1,82 @@
 
 
-from typing import List, Union
-from database.db import database
+from typing import Dict, List, Optional, Union
+from functools import partial
+from database.conversation_cache import conversation_cache
 from langchain.vectorstores import Weaviate
-from sentence_transformers import SentenceTransformer
+from agents.embeddings.service import EmbeddingService
+from agents.chat.deadline import current_deadline
+from agents.langchain_integrations.weaviate_multi_search import (
+    ClassSearch,
+    WeaviateMultiClassSearch,
+    WEAVIATE_CLASS_HOTELS,
+    WEAVIATE_CLASS_TOURS,
+    WEAVIATE_CLASS_SUPPORT,
+)
 
 from langchain_core.callbacks import CallbackManagerForRetrieverRun
 from langchain_core.documents import Document
 from langchain_core.retrievers import BaseRetriever
+from pydantic import Field
 import asyncio
 from dotenv import load_dotenv
 import os
 load_dotenv()
 
 key = os.getenv('KEY')
+RETRIEVER_CLASS_TIMEOUT_S = float(os.getenv("RETRIEVER_CLASS_TIMEOUT_S", "3"))
+RETRIEVER_INCLUDE_SUPPORT = os.getenv("RETRIEVER_INCLUDE_SUPPORT", "true").lower() == "true"
+
+
+def _env_distance(name: str) -> Optional[float]:
+    value = os.getenv(name)
+    return float(value) if value else None
+
+
+def default_class_searches() -> List[ClassSearch]:
+    """Per-class k and distance cutoff, overridable per deployment through the environment."""
+    return [
+        ClassSearch(
+            WEAVIATE_CLASS_HOTELS,
+            int(os.getenv("RETRIEVER_K_HOTELS", "3")),
+            _env_distance("RETRIEVER_MAX_DISTANCE_HOTELS"),
+        ),
+        ClassSearch(
+            WEAVIATE_CLASS_TOURS,
+            int(os.getenv("RETRIEVER_K_TOURS", "3")),
+            _env_distance("RETRIEVER_MAX_DISTANCE_TOURS"),
+        ),
+        ClassSearch(
+            WEAVIATE_CLASS_SUPPORT,
+            int(os.getenv("RETRIEVER_K_SUPPORT", "3")),
+            _env_distance("RETRIEVER_MAX_DISTANCE_SUPPORT"),
+        ),
+    ]
+
+
+def _distance_key(doc: Document) -> float:
+    distance = doc.metadata.get("distance")
+    return float(distance) if distance is not None else float("inf")
+
         
 class STretriever(BaseRetriever):
-    """Retriever that aggregates hotel and tour documents for itinerary generation."""
+    """
+    Tiered retriever over Hotels, Tours and the PDF SupportAgent collection.
+
+    Each class has its own k and distance cutoff (`class_searches`); the surviving hits
+    are merged by vector distance before the final `k` is taken.
+    """
 
     vectorstore_hotels: Weaviate
     vectorstore_tours: Weaviate
-    embedding_model: SentenceTransformer
+    vectorstore_support: Optional[Weaviate] = None
+    embedding_model: EmbeddingService
     k: int = 3
+    class_timeout: float = RETRIEVER_CLASS_TIMEOUT_S
+    class_searches: List[ClassSearch] = Field(default_factory=default_class_searches)
+    # When set, all classes are fetched with one multi-class GraphQL request
+    search_backend: Optional[WeaviateMultiClassSearch] = None
+    include_support: bool = RETRIEVER_INCLUDE_SUPPORT
 
     async def _get_relevant_documents(
         self, query: str, *, run_manager: CallbackManagerForRetrieverRun = None
@@ -35,54 +90,40 @@ class STretriever(BaseRetriever):
     ) -> List[Document]:
         print("query _get_relevant_documents", query)
         convesation_id = query.split(key)[1]
-        query_find = f"SELECT * FROM conversations WHERE id={convesation_id}"
-        results = await database.fetch_all(query=query_find)
-        agentid = dict(results[0])["agentid"]
+        # Filled by the webhook's conversation lookup, so this is normally a cache hit
+        conversation = await conversation_cache.get_or_fetch(convesation_id)
+        agentid = conversation["agentid"]
         query_after = query.split(key)[0]
         print("query _get_relevant_documents query_after ", query_after)
         
         # Run CPU-intensive encoding in threadpool
-        query_vector = await asyncio.get_event_loop().run_in_executor(
-            None, 
-            self.embedding_model.encode,
-            query_after
-        )
-        query_vector = query_vector.tolist()
+        query_vector = await self.embedding_model.aencode(query_after)
+
+        classes = self._active_classes()
+        results = None
+        if self.search_backend is not None:
+            results = await self._search_combined(query_vector, classes, agentid)
+        if results is None:
+            # Query every class concurrently off the event loop; a slow or missing class degrades to []
+            where_filter_agent = {
+                "path": "agentId",
+                "operator": "Equal",
+                "valueString": agentid
+            }
+            searched = self.search_backend.existing_classes(classes) if self.search_backend is not None else classes
+            per_class = await asyncio.gather(*[
+                self._search_class(spec, query_vector, where_filter_agent) for spec in searched
+            ])
+            results = {spec.class_name: docs for spec, docs in zip(searched, per_class)}
 
-        # Query from monetizable classes: hotels and tours
+        # Apply each class's distance cutoff, then merge all classes by distance
         all_docs = []
-        
-        where_filter_agent = {
-            "path": "agentId",
-            "operator": "Equal",
-            "valueString": agentid
-        }
-        
-        # Query from hotels (no agentId filter needed, hotels are global) - skip if class doesn't exist
-        try:
-            docs_hotels = self.vectorstore_hotels.similarity_search_by_vector(
-                embedding=query_vector,
-                k=self.k,
-                where_filter=where_filter_agent
-            )
-            all_docs.extend(docs_hotels)
-            print(f"✓ Retrieved {len(docs_hotels)} documents from hotels")
-        except Exception as e:
-            print(f"⚠ Warning: Could not query hotels class: {str(e)}")
-            # Continue with other classes
-        
-        # Query from tours (no agentId filter needed, tours are global) - skip if class doesn't exist
-        try:
-            docs_tours = self.vectorstore_tours.similarity_search_by_vector(
-                embedding=query_vector,
-                k=self.k,
-                where_filter=where_filter_agent
-            )
-            all_docs.extend(docs_tours)
-            print(f"✓ Retrieved {len(docs_tours)} documents from tours")
-        except Exception as e:
-            print(f"⚠ Warning: Could not query tours class: {str(e)}")
-            # Continue with other classes
+        for spec in classes:
+            docs = results.get(spec.class_name, [])
+            if spec.max_distance is not None:
+                docs = [doc for doc in docs if _distance_key(doc) <= spec.max_distance]
+            all_docs.extend(docs)
+        all_docs.sort(key=_distance_key)
         
         # Remove duplicates based on content and return top k
         seen_contents = set()
@@ -97,6 +138,77 @@ class STretriever(BaseRetriever):
         
         return unique_docs[:self.k]
 
+    def _timeout(self) -> float:
+        """class_timeout, shortened to what is left of the request deadline."""
+        deadline = current_deadline()
+        return deadline.timeout(self.class_timeout) if deadline is not None else self.class_timeout
+
+    def _active_classes(self) -> List[ClassSearch]:
+        return [
+            spec for spec in self.class_searches
+            if spec.class_name != WEAVIATE_CLASS_SUPPORT or self.include_support
+        ]
+
+    def _vectorstores(self) -> Dict[str, Weaviate]:
+        vectorstores = {
+            WEAVIATE_CLASS_HOTELS: self.vectorstore_hotels,
+            WEAVIATE_CLASS_TOURS: self.vectorstore_tours,
+        }
+        if self.vectorstore_support is not None:
+            vectorstores[WEAVIATE_CLASS_SUPPORT] = self.vectorstore_support
+        return vectorstores
+
+    async def _search_combined(
+        self, query_vector: List[float], classes: List[ClassSearch], agent_id: str
+    ) -> Optional[Dict[str, List[Document]]]:
+        """
+        One round trip for every class. Returns None when the combined query fails or
+        times out so the caller can fall back to per-class searches.
+        """
+        loop = asyncio.get_running_loop()
+        search = partial(self.search_backend.search, query_vector, classes, agent_id)
+        timeout = self._timeout()
+        try:
+            results = await asyncio.wait_for(loop.run_in_executor(None, search), timeout=timeout)
+            for class_name, docs in results.items():
+                print(f"✓ Retrieved {len(docs)} documents from {class_name}")
+            return results
+        except asyncio.TimeoutError:
+            print(f"⚠ Warning: combined search timed out after {timeout:.2f}s, querying classes separately")
+        except Exception as e:
+            print(f"⚠ Warning: combined search failed, querying classes separately: {str(e)}")
+        return None
+
+    async def _search_class(
+        self, spec: ClassSearch, query_vector: List[float], where_filter: dict
+    ) -> List[Document]:
+        vectorstore = self._vectorstores().get(spec.class_name)
+        if vectorstore is None:
+            return []
+        loop = asyncio.get_running_loop()
+        search = partial(
+            vectorstore.similarity_search_by_vector,
+            embedding=query_vector,
+            k=spec.limit,
+            where_filter=where_filter,
+            additional=["id", "distance"]
+        )
+        timeout = self._timeout()
+        try:
+            docs = await asyncio.wait_for(loop.run_in_executor(None, search), timeout=timeout)
+            for doc in docs:
+                additional = doc.metadata.pop("_additional", None) or {}
+                doc.metadata["class"] = spec.class_name
+                doc.metadata["id"] = additional.get("id")
+                doc.metadata["distance"] = additional.get("distance")
+            print(f"✓ Retrieved {len(docs)} documents from {spec.class_name}")
+            return docs
+        except asyncio.TimeoutError:
+            print(f"⚠ Warning: {spec.class_name} search timed out after {timeout:.2f}s")
+        except Exception as e:
+            print(f"⚠ Warning: Could not query {spec.class_name} class: {str(e)}")
+        return []
+
     # Optional: Provide a more efficient native implementation by overriding
     # _aget_relevant_documents
     # async def _aget_relevant_documents(
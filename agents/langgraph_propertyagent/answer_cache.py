@@ -0,0 +1,183 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, FrozenSet, Iterable, List, Optional, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+
+from dotenv import load_dotenv
+load_dotenv()
+
+SEMANTIC_ANSWER_CACHE_ENABLED = os.getenv("SEMANTIC_ANSWER_CACHE_ENABLED", "true").lower() == "true"
+SEMANTIC_ANSWER_CACHE_SIZE = int(os.getenv("SEMANTIC_ANSWER_CACHE_SIZE", "5000"))
+SEMANTIC_ANSWER_CACHE_TTL_S = float(os.getenv("SEMANTIC_ANSWER_CACHE_TTL_S", "21600"))
+# Cosine similarity between query embeddings required to reuse an answer
+SEMANTIC_ANSWER_CACHE_MIN_SIMILARITY = float(os.getenv("SEMANTIC_ANSWER_CACHE_MIN_SIMILARITY", "0.92"))
+
+DocKey = Tuple[str, str]
+
+
+def document_key(class_name: Optional[str], doc_id) -> DocKey:
+    """Identity of a catalog record as cited by a cached answer: (Weaviate class, doc_id)."""
+    return (str(class_name or ""), str(doc_id))
+
+
+def document_keys(documents: List[Document]) -> FrozenSet[DocKey]:
+    return frozenset(
+        document_key(doc.metadata.get("class"), doc.metadata.get("doc_id"))
+        for doc in documents or []
+    )
+
+
+class _AnswerEntry:
+    __slots__ = ("agent_id", "vector", "doc_keys", "reply", "stored_at")
+
+    def __init__(self, agent_id: str, vector: np.ndarray, doc_keys: FrozenSet[DocKey], reply: str):
+        self.agent_id = agent_id
+        self.vector = vector
+        self.doc_keys = doc_keys
+        self.reply = reply
+        self.stored_at = time.monotonic()
+
+
+class SemanticAnswerCache:
+    """
+    Per-agent cache of (query embedding, retrieved doc set, reply).
+
+    A lookup hits when a stored query of the same agent is within `min_similarity` and
+    retrieval for the new query returned exactly the same documents. Entries are shared by all
+    of an agent's conversations, so only replies generated without conversation history are stored.
+    """
+
+    def __init__(
+            self,
+            max_size: int = SEMANTIC_ANSWER_CACHE_SIZE,
+            ttl_seconds: float = SEMANTIC_ANSWER_CACHE_TTL_S,
+            min_similarity: float = SEMANTIC_ANSWER_CACHE_MIN_SIMILARITY,
+        ):
+        self.max_size = max(1, max_size)
+        self.ttl_seconds = ttl_seconds
+        self.min_similarity = min_similarity
+        self._entries: "OrderedDict[int, _AnswerEntry]" = OrderedDict()
+        self._by_agent: Dict[str, Dict[int, _AnswerEntry]] = {}
+        self._next_id = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.doc_set_mismatches = 0
+        self.expirations = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def _normalize(vector: List[float]) -> np.ndarray:
+        array = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(array)
+        return array / norm if norm else array
+
+    def _remove(self, entry_id: int):
+        entry = self._entries.pop(entry_id, None)
+        if entry is not None:
+            agent_entries = self._by_agent.get(entry.agent_id)
+            if agent_entries is not None:
+                agent_entries.pop(entry_id, None)
+                if not agent_entries:
+                    del self._by_agent[entry.agent_id]
+
+    def lookup(self, agent_id, vector: List[float], documents: List[Document]) -> Optional[str]:
+        agent_id = str(agent_id)
+        query = self._normalize(vector)
+        doc_keys = document_keys(documents)
+        now = time.monotonic()
+        with self._lock:
+            best_id, best_similarity = None, self.min_similarity
+            similar_but_changed = False
+            for entry_id, entry in list(self._by_agent.get(agent_id, {}).items()):
+                if self.ttl_seconds > 0 and now - entry.stored_at > self.ttl_seconds:
+                    self._remove(entry_id)
+                    self.expirations += 1
+                    continue
+                similarity = float(np.dot(query, entry.vector))
+                if similarity < best_similarity:
+                    continue
+                if entry.doc_keys != doc_keys:
+                    similar_but_changed = True
+                    continue
+                best_id, best_similarity = entry_id, similarity
+
+            if best_id is None:
+                self.misses += 1
+                if similar_but_changed:
+                    self.doc_set_mismatches += 1
+                return None
+            self._entries.move_to_end(best_id)
+            self.hits += 1
+            return self._entries[best_id].reply
+
+    def store(self, agent_id, vector: List[float], documents: List[Document], reply: str):
+        agent_id = str(agent_id)
+        entry = _AnswerEntry(agent_id, self._normalize(vector), document_keys(documents), reply)
+        with self._lock:
+            entry_id = self._next_id
+            self._next_id += 1
+            self._entries[entry_id] = entry
+            self._by_agent.setdefault(agent_id, {})[entry_id] = entry
+            while len(self._entries) > self.max_size:
+                oldest_id = next(iter(self._entries))
+                self._remove(oldest_id)
+                self.evictions += 1
+
+    def invalidate_documents(self, keys: Iterable[DocKey]) -> int:
+        """Drop every answer that cited one of `keys` (called by catalog ingestion)."""
+        keys = set(keys)
+        with self._lock:
+            stale = [entry_id for entry_id, entry in self._entries.items() if entry.doc_keys & keys]
+            for entry_id in stale:
+                self._remove(entry_id)
+            self.invalidations += len(stale)
+        return len(stale)
+
+    def invalidate_class(self, class_name: str) -> int:
+        """Drop every answer that cited any record of `class_name` (e.g. after a collection is rebuilt)."""
+        with self._lock:
+            stale = [
+                entry_id for entry_id, entry in self._entries.items()
+                if any(doc_class == class_name for doc_class, _ in entry.doc_keys)
+            ]
+            for entry_id in stale:
+                self._remove(entry_id)
+            self.invalidations += len(stale)
+        return len(stale)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._by_agent.clear()
+
+    def stats(self) -> Dict:
+        lookups = self.hits + self.misses
+        return {
+            "enabled": SEMANTIC_ANSWER_CACHE_ENABLED,
+            "size": len(self._entries),
+            "agents": len(self._by_agent),
+            "max_size": self.max_size,
+            "ttl_seconds": self.ttl_seconds,
+            "min_similarity": self.min_similarity,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "doc_set_mismatches": self.doc_set_mismatches,
+            "expirations": self.expirations,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+        }
+
+
+_semantic_answer_cache = SemanticAnswerCache()
+
+
+def get_semantic_answer_cache() -> SemanticAnswerCache:
+    """Process-wide cache shared by the graph and the ingestion endpoints."""
+    return _semantic_answer_cache
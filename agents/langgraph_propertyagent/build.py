@@ -4,6 +4,11 @@ from typing import Union, Optional
 from langgraph.graph import END, StateGraph, START
 
 from agents.langgraph_propertyagent.graph import graph_nodes, graph_edges, AgentState
+from agents.langgraph_propertyagent.routing import RelevanceRouter
+from agents.langgraph_propertyagent.speculation import SpeculativeExecutor
+from agents.langgraph_propertyagent.answer_cache import SemanticAnswerCache
+from agents.langgraph_propertyagent.intent import IntentRouter
+from agents.embeddings.service import EmbeddingService
 
 from langchain_core.retrievers import BaseRetriever
 from langchain_core.language_models.chat_models import BaseChatModel
@@ -18,16 +23,33 @@ class workflow():
             self,
             retriever: BaseRetriever,
             llm_model: BaseChatModel,
+            relevance_router: Optional[RelevanceRouter] = None,
+            speculation: Optional[SpeculativeExecutor] = None,
+            answer_cache: Optional[SemanticAnswerCache] = None,
+            embedding_model: Optional[EmbeddingService] = None,
+            intent_router: Optional[IntentRouter] = None,
         ):
         self.retriever = retriever
         self.llm_model = llm_model
+        self.relevance_router = relevance_router
+        self.speculation = speculation
+        self.answer_cache = answer_cache
+        self.embedding_model = embedding_model
+        self.intent_router = intent_router
 
 
 
     async def initialize_graph(self, checkpointer: Optional[Union[MemorySaver, PostgresSaver]] = None):
 
-        nodes = graph_nodes(retriever=self.retriever, llm_model=self.llm_model)
-        edges = graph_edges(llm_model=self.llm_model)
+        nodes = graph_nodes(
+            retriever=self.retriever,
+            llm_model=self.llm_model,
+            speculation=self.speculation,
+            answer_cache=self.answer_cache,
+            embedding_model=self.embedding_model,
+            intent_router=self.intent_router,
+        )
+        edges = graph_edges(llm_model=self.llm_model, router=self.relevance_router)
 
 
         # Define a new graph
@@ -48,7 +70,22 @@ class workflow():
         # Call agent node to decide to retrieve or not
 
 
-        workflow.add_edge(START, "retriever")
+        workflow.add_node(
+            "respond_cached", nodes.respond_cached
+        )  # Reply reused from the semantic answer cache
+
+
+        if self.intent_router is None:
+            workflow.add_edge(START, "retriever")
+        else:
+            # Greetings and small talk skip retrieval and grading
+            workflow.add_node("intent", nodes.classify_intent)
+            workflow.add_node("respond_canned", nodes.respond_canned)
+            workflow.add_node("respond_smalltalk", nodes.respond_smalltalk)
+            workflow.add_edge(START, "intent")
+            workflow.add_conditional_edges("intent", edges.route_intent)
+            workflow.add_edge("respond_canned", END)
+            workflow.add_edge("respond_smalltalk", END)
         
         # workflow.add_edge("evaluation_agent","retrieve")
         # Edges taken after the `action` node is called.
@@ -59,6 +96,7 @@ class workflow():
         )
         workflow.add_edge("respond_wContext", END)
         workflow.add_edge("respond_woContext", END)
+        workflow.add_edge("respond_cached", END)
 
         if checkpointer is None:
             # Compile
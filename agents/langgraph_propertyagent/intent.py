@@ -0,0 +1,186 @@
+import asyncio
+import os
+import re
+import threading
+import time
+from collections import Counter, defaultdict
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from agents.embeddings.service import EmbeddingService
+
+from dotenv import load_dotenv
+load_dotenv()
+
+# Classify every turn before retrieval; trivial intents skip the retriever and the grader
+INTENT_ROUTER_ENABLED = os.getenv("INTENT_ROUTER_ENABLED", "true").lower() == "true"
+# Nearest-centroid classifier over the (cached) query embedding, for messages the rules miss
+INTENT_CLASSIFIER_ENABLED = os.getenv("INTENT_CLASSIFIER_ENABLED", "false").lower() == "true"
+INTENT_CLASSIFIER_MIN_SIMILARITY = float(os.getenv("INTENT_CLASSIFIER_MIN_SIMILARITY", "0.75"))
+
+GREETING = "greeting"
+THANKS = "thanks"
+GOODBYE = "goodbye"
+SMALL_TALK = "smalltalk"
+TRAVEL = "travel"
+
+# Graph nodes the intents route to
+RETRIEVE_NODE = "retriever"
+CANNED_NODE = "respond_canned"
+SMALL_TALK_NODE = "respond_smalltalk"
+
+INTENT_NODES = {
+    GREETING: CANNED_NODE,
+    THANKS: CANNED_NODE,
+    GOODBYE: CANNED_NODE,
+    SMALL_TALK: SMALL_TALK_NODE,
+    TRAVEL: RETRIEVE_NODE,
+}
+
+# Whole-message patterns; anything longer than a pleasantry is left to retrieval. Bare answers
+# ("yes", "ok", "sure") are too: they usually reply to the assistant's last question.
+_RULES: List[Tuple[str, re.Pattern]] = [
+    (GREETING, re.compile(r"^(hi+|hey+|hello+|hiya|yo|howdy|greetings|good (morning|afternoon|evening)|xin chào|chào( bạn)?)( there| team| all)?$")),
+    (THANKS, re.compile(r"^((thanks?|thank you|thx|ty|cheers|many thanks|cảm ơn|cám ơn)( (so|very) much| a lot| again)?( (bạn|you))?|(ok(ay)?|great|perfect|awesome|cool|nice) ?(thanks?|thank you))$")),
+    (GOODBYE, re.compile(r"^(bye+|goodbye|bye bye|see (you|ya)( later| soon)?|good night|take care|talk (to you )?later|tạm biệt)$")),
+    (SMALL_TALK, re.compile(r"^(how are you( doing)?( today)?|how('s| is) it going|what'?s up|who are you|are you (a bot|a robot|human|real)|what can you do|lol|haha+)$")),
+]
+
+# Seed examples for the optional centroid classifier
+_SEEDS: Dict[str, List[str]] = {
+    GREETING: ["hi", "hello there", "good morning", "hey, anyone there?", "hello, nice to meet you"],
+    THANKS: ["thank you so much", "thanks for your help", "that was helpful, thanks", "appreciate it"],
+    GOODBYE: ["bye", "see you later", "have a good day, bye", "that's all for now, goodbye"],
+    SMALL_TALK: ["how are you?", "who are you?", "are you a bot?", "what can you do?", "tell me a joke"],
+    TRAVEL: [
+        "recommend a hotel near the Colosseum",
+        "what tours are available in Rome?",
+        "how much is a room per night?",
+        "best restaurants near the Vatican",
+        "book a walking tour for tomorrow",
+        "how do I get from the airport to the city centre?",
+    ],
+}
+
+CANNED_REPLIES: Dict[str, List[str]] = {
+    GREETING: [
+        "Ciao! 👋 I'm your VisitRome concierge. Are you looking for a hotel, a tour, or ideas for your trip?",
+        "Hello! How can I help you plan your time in Rome today?",
+    ],
+    THANKS: [
+        "You're very welcome! Let me know if there's anything else I can help with for your trip.",
+        "Happy to help! Just ask if you need more hotel or tour ideas.",
+    ],
+    GOODBYE: [
+        "Arrivederci! Enjoy your trip, and message me anytime you need help.",
+        "Goodbye! Have a wonderful time in Rome.",
+    ],
+}
+
+_PUNCTUATION = re.compile(r"[^\w\s']+")
+
+
+def normalize_message(text: str) -> str:
+    """Lowercase, drop punctuation and emoji, collapse whitespace."""
+    return " ".join(_PUNCTUATION.sub(" ", (text or "").lower()).split())
+
+
+class IntentRouter:
+    """
+    Classifies a turn with whole-message rules and, optionally, a nearest-centroid classifier
+    over the query embedding. Keeps per-intent counts and classification latency, plus the
+    mean retrieval time of routed turns to estimate the time saved by bypassed ones.
+    """
+
+    def __init__(
+            self,
+            embedding_model: Optional[EmbeddingService] = None,
+            min_similarity: float = INTENT_CLASSIFIER_MIN_SIMILARITY,
+        ):
+        self.embedding_model = embedding_model
+        self.min_similarity = min_similarity
+        self._centroids: Optional[Dict[str, np.ndarray]] = None
+        self._centroids_lock = asyncio.Lock()
+        self._lock = threading.Lock()
+        self.intents: Counter = Counter()
+        self.sources: Counter = Counter()
+        self.classify_seconds: Dict[str, float] = defaultdict(float)
+        self.retrievals = 0
+        self.retrieval_seconds = 0.0
+        self._canned_turns = 0
+
+    async def _load_centroids(self) -> Dict[str, np.ndarray]:
+        async with self._centroids_lock:
+            if self._centroids is None:
+                centroids = {}
+                for intent, examples in _SEEDS.items():
+                    vectors = np.asarray(await self.embedding_model.aencode_batch(examples), dtype=np.float32)
+                    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+                    centroid = vectors.mean(axis=0)
+                    centroids[intent] = centroid / np.linalg.norm(centroid)
+                self._centroids = centroids
+        return self._centroids
+
+    async def _classify_embedding(self, text: str) -> Optional[str]:
+        centroids = await self._load_centroids()
+        # The retriever encodes the same text next, so this warms the query-embedding cache
+        vector = np.asarray(await self.embedding_model.aencode(text), dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        if not norm:
+            return None
+        similarities = {intent: float(np.dot(vector / norm, centroid)) for intent, centroid in centroids.items()}
+        intent = max(similarities, key=similarities.get)
+        if intent == TRAVEL or similarities[intent] < self.min_similarity:
+            return None
+        return intent
+
+    async def classify(self, text: str) -> str:
+        started = time.perf_counter()
+        normalized = normalize_message(text)
+        intent, source = None, "rule"
+        for rule_intent, pattern in _RULES:
+            if pattern.match(normalized):
+                intent = rule_intent
+                break
+        if intent is None and self.embedding_model is not None and normalized:
+            intent, source = await self._classify_embedding(text), "classifier"
+        if intent is None:
+            intent, source = TRAVEL, "default"
+
+        with self._lock:
+            self.intents[intent] += 1
+            self.sources[source] += 1
+            self.classify_seconds[intent] += time.perf_counter() - started
+        return intent
+
+    def canned_reply(self, intent: str) -> str:
+        replies = CANNED_REPLIES[intent]
+        with self._lock:
+            self._canned_turns += 1
+            return replies[self._canned_turns % len(replies)]
+
+    def record_retrieval(self, seconds: float):
+        """Time spent by the retriever node on a turn that went through retrieval."""
+        with self._lock:
+            self.retrievals += 1
+            self.retrieval_seconds += seconds
+
+    def stats(self) -> Dict:
+        mean_retrieval = self.retrieval_seconds / self.retrievals if self.retrievals else 0.0
+        bypassed = sum(count for intent, count in self.intents.items() if intent != TRAVEL)
+        return {
+            "classifier": self.embedding_model is not None,
+            "sources": dict(self.sources),
+            "intents": {
+                intent: {
+                    "turns": count,
+                    "node": INTENT_NODES[intent],
+                    "avg_classify_ms": self.classify_seconds[intent] / count * 1000,
+                }
+                for intent, count in self.intents.items()
+            },
+            "bypassed_turns": bypassed,
+            "avg_retrieval_ms": mean_retrieval * 1000,
+            "estimated_retrieval_ms_saved": bypassed * mean_retrieval * 1000,
+        }
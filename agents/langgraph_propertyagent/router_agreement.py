@@ -0,0 +1,83 @@
+"""
+Offline harness comparing relevance routers on the same retrieved documents.
+
+    python -m agents.langgraph_propertyagent.router_agreement queries.txt \
+        --conversation-id 1 --routers score,cross_encoder,llm
+
+`queries.txt` holds one user message per line. Each query is retrieved once and
+then routed by every router; the output is the per-router with-context rate and
+the pairwise agreement matrix as JSON.
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import os
+from typing import Dict, List, Sequence, Tuple
+
+from langchain_core.documents import Document
+
+from agents.langgraph_propertyagent.routing import WITH_CONTEXT, RelevanceRouter, build_relevance_router
+
+key = os.getenv('KEY')
+
+
+async def compare_routers(
+        routers: Sequence[RelevanceRouter],
+        samples: Sequence[Tuple[str, List[Document]]],
+    ) -> Dict:
+    """Route every (query, documents) sample with each router and measure how often they agree."""
+    decisions: Dict[str, List[str]] = {router.name: [] for router in routers}
+    for query, documents in samples:
+        for router in routers:
+            decisions[router.name].append(await router.decide(query, documents))
+
+    total = len(samples)
+    agreement = {}
+    for left, right in itertools.combinations(decisions, 2):
+        same = sum(a == b for a, b in zip(decisions[left], decisions[right]))
+        agreement[f"{left} vs {right}"] = same / total if total else 0.0
+
+    return {
+        "samples": total,
+        "with_context_rate": {
+            name: (values.count(WITH_CONTEXT) / total if total else 0.0)
+            for name, values in decisions.items()
+        },
+        "agreement": agreement,
+        "decisions": decisions,
+    }
+
+
+async def main(path: str, conversation_id: str, router_names: List[str]):
+    from agents.chat.property_agent import graph
+    from database.db import database
+
+    with open(path, "r", encoding="utf-8") as f:
+        queries = [line.strip() for line in f if line.strip()]
+
+    await database.connect()
+    try:
+        agent = graph()
+        await agent.intialize_graph()
+        routers = [build_relevance_router(name, llm_model=agent.agent_chat) for name in router_names]
+
+        samples = []
+        for query in queries:
+            query_with_key = f"{query}{key}{conversation_id}"
+            samples.append((query_with_key, await agent.retriever.ainvoke(query_with_key)))
+
+        report = await compare_routers(routers, samples)
+        report["queries"] = queries
+        print(json.dumps(report, indent=2, ensure_ascii=False))
+    finally:
+        await database.disconnect()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare relevance routers on the same retrieval results")
+    parser.add_argument("queries", help="Text file with one query per line")
+    parser.add_argument("--conversation-id", default="1")
+    parser.add_argument("--routers", default="score,llm", help="Comma-separated router names")
+    args = parser.parse_args()
+    asyncio.run(main(args.queries, args.conversation_id, args.routers.split(",")))
@@ -0,0 +1,174 @@
+import asyncio
+import os
+import threading
+from collections import Counter
+from typing import Dict, List, Optional
+
+from langchain_core.documents import Document
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.prompts import PromptTemplate
+from pydantic import BaseModel, Field
+
+from agents.llm.cache import llm_cache_scope
+from agents.llm.token_budget import get_token_budgeter
+
+from dotenv import load_dotenv
+load_dotenv()
+
+key = os.getenv('KEY')
+
+RELEVANCE_ROUTER = os.getenv("RELEVANCE_ROUTER", "score")
+# Cosine distance (as returned by Weaviate nearVector) below which the context is considered relevant
+RELEVANCE_MAX_DISTANCE = float(os.getenv("RELEVANCE_MAX_DISTANCE", "0.55"))
+RELEVANCE_CROSS_ENCODER_MODEL = os.getenv("RELEVANCE_CROSS_ENCODER_MODEL", "cross-encoder/ms-marco-MiniLM-L-6-v2")
+RELEVANCE_CROSS_ENCODER_MIN_SCORE = float(os.getenv("RELEVANCE_CROSS_ENCODER_MIN_SCORE", "0.0"))
+
+WITH_CONTEXT = "respond_wContext"
+WITHOUT_CONTEXT = "respond_woContext"
+
+
+def _query_text(query: str) -> str:
+    """Strip the conversation-id suffix the webhook appends to the user message."""
+    return query.split(key)[0] if key and key in query else query
+
+
+class RelevanceRouter:
+    """Decides which responder follows the retriever node."""
+
+    name = "base"
+
+    def __init__(self):
+        self.decisions: Counter = Counter()
+
+    async def decide(self, query: str, documents: List[Document]) -> str:
+        decision = await self._decide(query, documents or [])
+        self.decisions[decision] += 1
+        return decision
+
+    async def _decide(self, query: str, documents: List[Document]) -> str:
+        raise NotImplementedError
+
+    def stats(self) -> Dict:
+        return {"router": self.name, "decisions": dict(self.decisions)}
+
+
+class ScoreThresholdRouter(RelevanceRouter):
+    """
+    Routes on the vector distances Weaviate already returned: context is used when the
+    closest document is within `max_distance`. Optionally confirms with a cross-encoder.
+    """
+
+    name = "score"
+
+    def __init__(self, max_distance: float = RELEVANCE_MAX_DISTANCE, cross_encoder: Optional["CrossEncoderRouter"] = None):
+        super().__init__()
+        self.max_distance = max_distance
+        self.cross_encoder = cross_encoder
+        if cross_encoder is not None:
+            self.name = "score+cross_encoder"
+
+    async def _decide(self, query: str, documents: List[Document]) -> str:
+        if not documents:
+            return WITHOUT_CONTEXT
+        distances = [doc.metadata.get("distance") for doc in documents if doc.metadata.get("distance") is not None]
+        # Without distances (e.g. a backend that doesn't report them) any hit counts as relevant
+        if distances and min(float(distance) for distance in distances) > self.max_distance:
+            return WITHOUT_CONTEXT
+        if self.cross_encoder is not None:
+            return await self.cross_encoder._decide(query, documents)
+        return WITH_CONTEXT
+
+
+class CrossEncoderRouter(RelevanceRouter):
+    """Scores (query, document) pairs with a small local CPU cross-encoder."""
+
+    name = "cross_encoder"
+
+    def __init__(self, model_name: str = RELEVANCE_CROSS_ENCODER_MODEL, min_score: float = RELEVANCE_CROSS_ENCODER_MIN_SCORE):
+        super().__init__()
+        self.model_name = model_name
+        self.min_score = min_score
+        self._model = None
+        self._lock = threading.Lock()
+
+    @property
+    def model(self):
+        if self._model is None:
+            with self._lock:
+                if self._model is None:
+                    from sentence_transformers import CrossEncoder
+                    self._model = CrossEncoder(self.model_name, device="cpu")
+        return self._model
+
+    def score(self, query: str, documents: List[Document]) -> List[float]:
+        pairs = [(_query_text(query), doc.page_content) for doc in documents]
+        return [float(score) for score in self.model.predict(pairs)]
+
+    async def _decide(self, query: str, documents: List[Document]) -> str:
+        if not documents:
+            return WITHOUT_CONTEXT
+        loop = asyncio.get_running_loop()
+        scores = await loop.run_in_executor(None, self.score, query, documents)
+        return WITH_CONTEXT if max(scores) >= self.min_score else WITHOUT_CONTEXT
+
+
+class LLMGraderRouter(RelevanceRouter):
+    """The original structured-output LLM grader (one extra LLM call per turn)."""
+
+    name = "llm"
+
+    def __init__(self, llm_model: BaseChatModel):
+        super().__init__()
+        self.llm_model = llm_model
+
+    async def _decide(self, query: str, documents: List[Document]) -> str:
+        from agents.langgraph_propertyagent.graph import format_documents
+
+        # Data model
+        class grade(BaseModel):
+            """Binary score for relevance check."""
+
+            binary_score: str = Field(description="Relevance score 'yes' or 'no'")
+
+        # LLM with tool and validation
+        llm_with_tool = self.llm_model.with_structured_output(grade)
+
+        # Prompt
+        prompt = PromptTemplate(
+            template="""You are a grader assessing relevance of the retrieved documents to a user query. \n
+            Here is the retrieved document: \n\n {context} \n\n
+            Here is the user query: {query} \n
+            If the document contains keyword(s) or semantic meaning related to the user question, grade it as relevant. \n
+            Give a binary score 'yes' or 'no' score to indicate whether the document is relevant to the question.""",
+            input_variables=["context", "query"],
+        )
+
+        # Chain
+        chain = prompt | llm_with_tool
+
+        budget = get_token_budgeter()
+        prompt_inputs = {
+            "context": format_documents(documents, max_tokens=budget.context_tokens),
+            "query": budget.truncate(_query_text(query), budget.query_tokens)
+        }
+        budget.record("evaluate_retrieved", prompt.format(**prompt_inputs))
+        with llm_cache_scope("evaluate_retrieved"):
+            scored_result = await chain.ainvoke(prompt_inputs)
+        return WITH_CONTEXT if scored_result.binary_score == "yes" else WITHOUT_CONTEXT
+
+
+def build_relevance_router(name: str = RELEVANCE_ROUTER, llm_model: Optional[BaseChatModel] = None) -> RelevanceRouter:
+    """
+    'score' (default), 'score+cross_encoder', 'cross_encoder' or 'llm'.
+    """
+    if name == "score":
+        return ScoreThresholdRouter()
+    if name == "score+cross_encoder":
+        return ScoreThresholdRouter(cross_encoder=CrossEncoderRouter())
+    if name == "cross_encoder":
+        return CrossEncoderRouter()
+    if name == "llm":
+        if llm_model is None:
+            raise ValueError("The 'llm' relevance router needs an llm_model")
+        return LLMGraderRouter(llm_model)
+    raise ValueError(f"Unknown relevance router: {name}")
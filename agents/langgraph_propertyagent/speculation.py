@@ -0,0 +1,92 @@
+import asyncio
+import logging
+import os
+from typing import Awaitable, Callable, Dict, Optional
+
+from dotenv import load_dotenv
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Start the no-context answer alongside retrieval and routing
+SPECULATIVE_NO_CONTEXT = os.getenv("SPECULATIVE_NO_CONTEXT", "false").lower() == "true"
+
+
+class TokenCounter:
+    """Counts streamed chunks; Groq streams roughly one token per chunk."""
+
+    def __init__(self):
+        self.tokens = 0
+
+    def add(self, count: int = 1):
+        self.tokens += count
+
+
+class _Speculation:
+    def __init__(self, task: asyncio.Task, counter: TokenCounter):
+        self.task = task
+        self.counter = counter
+
+
+class SpeculativeExecutor:
+    """
+    Runs a speculative generation per turn (keyed by the turn's human message id) and
+    either hands its result to the node that needs it or cancels it.
+
+    hits: speculative answer used; misses: discarded because the router chose context;
+    wasted_tokens: tokens generated by discarded speculations.
+    """
+
+    def __init__(self):
+        self._inflight: Dict[str, _Speculation] = {}
+        self.started = 0
+        self.hits = 0
+        self.misses = 0
+        self.failures = 0
+        self.used_tokens = 0
+        self.wasted_tokens = 0
+
+    def start(self, key: str, generate: Callable[[TokenCounter], Awaitable[str]]):
+        if key in self._inflight:
+            return
+        counter = TokenCounter()
+        task = asyncio.create_task(generate(counter))
+        self._inflight[key] = _Speculation(task, counter)
+        self.started += 1
+
+    async def take(self, key: str) -> Optional[str]:
+        """Await the speculative answer for `key`; None if there is none or it failed."""
+        speculation = self._inflight.pop(key, None)
+        if speculation is None:
+            return None
+        try:
+            result = await speculation.task
+        except Exception as e:
+            self.failures += 1
+            logger.warning(f"Speculative generation failed, answering normally: {e}")
+            return None
+        self.hits += 1
+        self.used_tokens += speculation.counter.tokens
+        return result
+
+    def discard(self, key: str):
+        speculation = self._inflight.pop(key, None)
+        if speculation is None:
+            return
+        speculation.task.cancel()
+        self.misses += 1
+        self.wasted_tokens += speculation.counter.tokens
+
+    def stats(self) -> Dict:
+        decided = self.hits + self.misses
+        return {
+            "enabled": True,
+            "in_flight": len(self._inflight),
+            "started": self.started,
+            "hits": self.hits,
+            "misses": self.misses,
+            "failures": self.failures,
+            "hit_rate": self.hits / decided if decided else 0.0,
+            "used_tokens": self.used_tokens,
+            "wasted_tokens": self.wasted_tokens,
+        }
@@ -0,0 +1,272 @@
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import time
+from collections import Counter, OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Optional, Tuple
+
+from langchain_core.caches import RETURN_VAL_TYPE, BaseCache
+from langchain_core.load import dumps, loads
+
+import psycopg
+
+from database.db import DATABASE_URL, database
+from dotenv import load_dotenv
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# "memory", "postgres" (shared between replicas) or "none"
+LLM_CACHE_BACKEND = os.getenv("LLM_CACHE_BACKEND", "memory")
+LLM_CACHE_SIZE = int(os.getenv("LLM_CACHE_SIZE", "2048"))
+LLM_CACHE_TTL_S = float(os.getenv("LLM_CACHE_TTL_S", "86400"))
+# The Postgres backend deletes expired rows once every this many writes
+LLM_CACHE_PURGE_EVERY = int(os.getenv("LLM_CACHE_PURGE_EVERY", "500"))
+
+# `:name` placeholders of the `databases` queries, rewritten to psycopg's `%(name)s` for sync calls
+_SQL_PARAM = re.compile(r"(?<!:):(\w+)")
+
+UNSCOPED_CHAIN = "unscoped"
+_current_chain: ContextVar[str] = ContextVar("llm_cache_chain", default=UNSCOPED_CHAIN)
+
+
+@contextmanager
+def llm_cache_scope(chain_name: str):
+    """Attribute the LLM cache lookups made inside this block to `chain_name`."""
+    token = _current_chain.set(chain_name)
+    try:
+        yield
+    finally:
+        _current_chain.reset(token)
+
+
+# generation_info flag of generations that must not be stored under the calling model's key
+# (e.g. a hedged call answered by the fallback model)
+SKIP_CACHE = "skip_llm_cache"
+
+
+def mark_uncacheable(generations) -> None:
+    for generation in generations:
+        generation.generation_info = {**(generation.generation_info or {}), SKIP_CACHE: True}
+
+
+def _cacheable(return_val: RETURN_VAL_TYPE) -> bool:
+    return not any((generation.generation_info or {}).get(SKIP_CACHE) for generation in return_val)
+
+
+def cache_key(prompt: str, llm_string: str) -> str:
+    """sha256 of the rendered prompt and the model parameters (model, temperature, tools, ...)."""
+    digest = hashlib.sha256()
+    digest.update(llm_string.encode("utf-8"))
+    digest.update(b"\x00")
+    digest.update(prompt.encode("utf-8"))
+    return digest.hexdigest()
+
+
+class CountingLLMCache(BaseCache):
+    """Shared TTL handling and per-chain hit / miss counters for the LLM cache backends."""
+
+    backend = "base"
+
+    def __init__(self, ttl_seconds: float = LLM_CACHE_TTL_S):
+        self.ttl_seconds = ttl_seconds
+        self.hits: Counter = Counter()
+        self.misses: Counter = Counter()
+        self.updates: Counter = Counter()
+        self.errors = 0
+
+    def _record(self, result: Optional[RETURN_VAL_TYPE]) -> Optional[RETURN_VAL_TYPE]:
+        chain = _current_chain.get()
+        if result is None:
+            self.misses[chain] += 1
+        else:
+            self.hits[chain] += 1
+        return result
+
+    def stats(self) -> Dict:
+        chains = sorted(set(self.hits) | set(self.misses))
+        per_chain = {}
+        for chain in chains:
+            lookups = self.hits[chain] + self.misses[chain]
+            per_chain[chain] = {
+                "hits": self.hits[chain],
+                "misses": self.misses[chain],
+                "updates": self.updates[chain],
+                "hit_rate": self.hits[chain] / lookups if lookups else 0.0,
+            }
+        hits, misses = sum(self.hits.values()), sum(self.misses.values())
+        return {
+            "backend": self.backend,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": hits / (hits + misses) if hits + misses else 0.0,
+            "errors": self.errors,
+            "chains": per_chain,
+        }
+
+
+class InMemoryLRULLMCache(CountingLLMCache):
+    """Per-process LRU of LLM generations."""
+
+    backend = "memory"
+
+    def __init__(self, max_size: int = LLM_CACHE_SIZE, ttl_seconds: float = LLM_CACHE_TTL_S):
+        super().__init__(ttl_seconds)
+        self.max_size = max(1, max_size)
+        self._entries: "OrderedDict[str, Tuple[float, RETURN_VAL_TYPE]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def lookup(self, prompt: str, llm_string: str) -> Optional[RETURN_VAL_TYPE]:
+        key = cache_key(prompt, llm_string)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self.ttl_seconds > 0 and time.monotonic() - entry[0] > self.ttl_seconds:
+                del self._entries[key]
+                entry = None
+            if entry is not None:
+                self._entries.move_to_end(key)
+        return self._record(entry[1] if entry is not None else None)
+
+    def update(self, prompt: str, llm_string: str, return_val: RETURN_VAL_TYPE) -> None:
+        if not _cacheable(return_val):
+            return
+        key = cache_key(prompt, llm_string)
+        with self._lock:
+            self._entries[key] = (time.monotonic(), return_val)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+        self.updates[_current_chain.get()] += 1
+
+    def clear(self, **kwargs: Any) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    async def alookup(self, prompt: str, llm_string: str) -> Optional[RETURN_VAL_TYPE]:
+        return self.lookup(prompt, llm_string)
+
+    async def aupdate(self, prompt: str, llm_string: str, return_val: RETURN_VAL_TYPE) -> None:
+        self.update(prompt, llm_string, return_val)
+
+    async def aclear(self, **kwargs: Any) -> None:
+        self.clear()
+
+    def stats(self) -> Dict:
+        stats = super().stats()
+        stats.update({"size": len(self._entries), "max_size": self.max_size})
+        return stats
+
+
+class PostgresLLMCache(CountingLLMCache):
+    """
+    LLM generations in the `llm_cache` table (docker_init/scripts_sql/initialize_llm_cache.sql),
+    so every replica shares hits. The async API uses the app's connection pool; the sync one
+    opens a connection per call, which is fine for offline scripts but not for the request path.
+    """
+
+    backend = "postgres"
+
+    SELECT = """
+        SELECT response FROM llm_cache
+        WHERE key = :key AND (:ttl <= 0 OR created_at > EXTRACT(EPOCH FROM NOW()) - :ttl)
+    """
+    UPSERT = """
+        INSERT INTO llm_cache (key, response, created_at)
+        VALUES (:key, :response, EXTRACT(EPOCH FROM NOW()))
+        ON CONFLICT (key) DO UPDATE SET response = EXCLUDED.response, created_at = EXCLUDED.created_at
+    """
+    PURGE = "DELETE FROM llm_cache WHERE created_at < EXTRACT(EPOCH FROM NOW()) - :ttl"
+    CLEAR = "DELETE FROM llm_cache"
+
+    def __init__(self, ttl_seconds: float = LLM_CACHE_TTL_S, purge_every: int = LLM_CACHE_PURGE_EVERY):
+        super().__init__(ttl_seconds)
+        self.purge_every = max(1, purge_every)
+        self._writes = 0
+
+    def _sync_execute(self, query: str, values: Dict, fetch: bool = False):
+        # Sync callers (offline scripts) get a short-lived psycopg connection; the app uses the async pool
+        with psycopg.connect(DATABASE_URL, autocommit=True) as conn:
+            cursor = conn.execute(_SQL_PARAM.sub(r"%(\1)s", query), values)
+            return cursor.fetchone() if fetch else None
+
+    def _count_write(self) -> bool:
+        """Record a write; True when expired rows are due to be purged."""
+        self.updates[_current_chain.get()] += 1
+        self._writes += 1
+        return self.ttl_seconds > 0 and self._writes % self.purge_every == 0
+
+    def _decode(self, response: Optional[str]) -> Optional[RETURN_VAL_TYPE]:
+        return [loads(generation) for generation in json.loads(response)] if response is not None else None
+
+    def _upsert_values(self, prompt: str, llm_string: str, return_val: RETURN_VAL_TYPE) -> Dict:
+        return {
+            "key": cache_key(prompt, llm_string),
+            "response": json.dumps([dumps(generation) for generation in return_val]),
+        }
+
+    def lookup(self, prompt: str, llm_string: str) -> Optional[RETURN_VAL_TYPE]:
+        try:
+            row = self._sync_execute(self.SELECT, {"key": cache_key(prompt, llm_string), "ttl": self.ttl_seconds}, fetch=True)
+        except Exception as e:
+            self.errors += 1
+            logger.warning(f"LLM cache lookup failed: {e}")
+            return None
+        return self._record(self._decode(row[0] if row is not None else None))
+
+    def update(self, prompt: str, llm_string: str, return_val: RETURN_VAL_TYPE) -> None:
+        if not _cacheable(return_val):
+            return
+        try:
+            self._sync_execute(self.UPSERT, self._upsert_values(prompt, llm_string, return_val))
+            if self._count_write():
+                self._sync_execute(self.PURGE, {"ttl": self.ttl_seconds})
+        except Exception as e:
+            self.errors += 1
+            logger.warning(f"LLM cache update failed: {e}")
+
+    def clear(self, **kwargs: Any) -> None:
+        self._sync_execute(self.CLEAR, {})
+
+    async def alookup(self, prompt: str, llm_string: str) -> Optional[RETURN_VAL_TYPE]:
+        try:
+            row = await database.fetch_one(
+                query=self.SELECT,
+                values={"key": cache_key(prompt, llm_string), "ttl": self.ttl_seconds},
+            )
+        except Exception as e:
+            # A cache outage must never fail the turn
+            self.errors += 1
+            logger.warning(f"LLM cache lookup failed: {e}")
+            return None
+        return self._record(self._decode(row["response"] if row is not None else None))
+
+    async def aupdate(self, prompt: str, llm_string: str, return_val: RETURN_VAL_TYPE) -> None:
+        if not _cacheable(return_val):
+            return
+        try:
+            await database.execute(query=self.UPSERT, values=self._upsert_values(prompt, llm_string, return_val))
+            if self._count_write():
+                await database.execute(query=self.PURGE, values={"ttl": self.ttl_seconds})
+        except Exception as e:
+            self.errors += 1
+            logger.warning(f"LLM cache update failed: {e}")
+
+    async def aclear(self, **kwargs: Any) -> None:
+        await database.execute(query=self.CLEAR)
+
+
+def build_llm_cache(backend: str = LLM_CACHE_BACKEND) -> Optional[CountingLLMCache]:
+    """'memory' (default), 'postgres' or 'none'."""
+    if backend == "memory":
+        return InMemoryLRULLMCache()
+    if backend == "postgres":
+        return PostgresLLMCache()
+    if backend == "none":
+        return None
+    raise ValueError(f"Unknown LLM cache backend: {backend}")
@@ -0,0 +1,80 @@
+import asyncio
+import random
+import time
+from typing import Any, Dict, List, Optional
+
+from langchain_core.callbacks import AsyncCallbackManagerForLLMRun, CallbackManagerForLLMRun
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from pydantic import ConfigDict, Field
+
+
+class FakeProviderError(Exception):
+    """Stands in for a provider 5xx; retryable by the LLM gateway."""
+
+    status_code = 503
+
+
+class FakeLatencyChatModel(BaseChatModel):
+    """
+    Local chat model with injected latency for exercising the LLM gateway and hedging:
+    replies `reply` after `latency_s`, or `tail_latency_s` with probability `tail_probability`.
+    Counts calls and how many were cancelled mid-flight.
+    """
+
+    model_name: str = "fake-latency"
+    reply: str = "ok"
+    latency_s: float = 0.05
+    tail_latency_s: float = 1.0
+    tail_probability: float = 0.0
+    failure_probability: float = 0.0
+    rng: random.Random = Field(default_factory=random.Random)
+    calls: int = 0
+    cancelled: int = 0
+
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-latency"
+
+    @property
+    def _identifying_params(self) -> Dict[str, Any]:
+        return {"model_name": self.model_name, "latency_s": self.latency_s, "tail_latency_s": self.tail_latency_s}
+
+    def _sample(self) -> float:
+        self.calls += 1
+        return self.tail_latency_s if self.rng.random() < self.tail_probability else self.latency_s
+
+    def _result(self) -> ChatResult:
+        if self.rng.random() < self.failure_probability:
+            raise FakeProviderError(f"{self.model_name} failed")
+        return ChatResult(
+            generations=[ChatGeneration(message=AIMessage(content=self.reply))],
+            llm_output={"model_name": self.model_name, "token_usage": {"total_tokens": len(self.reply.split())}},
+        )
+
+    def _generate(
+            self,
+            messages: List[BaseMessage],
+            stop: Optional[List[str]] = None,
+            run_manager: Optional[CallbackManagerForLLMRun] = None,
+            **kwargs: Any,
+        ) -> ChatResult:
+        time.sleep(self._sample())
+        return self._result()
+
+    async def _agenerate(
+            self,
+            messages: List[BaseMessage],
+            stop: Optional[List[str]] = None,
+            run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+            **kwargs: Any,
+        ) -> ChatResult:
+        try:
+            await asyncio.sleep(self._sample())
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        return self._result()
@@ -0,0 +1,538 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import os
+import random
+import threading
+import time
+from collections import Counter, defaultdict, deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, AsyncIterator, Deque, Dict, List, Optional, Sequence
+
+from langchain_core.callbacks import AsyncCallbackManagerForLLMRun, CallbackManagerForLLMRun
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import BaseMessage
+from langchain_core.outputs import ChatGenerationChunk, ChatResult
+from pydantic import ConfigDict
+
+from agents.chat.deadline import current_deadline
+from agents.llm.cache import mark_uncacheable
+from agents.llm.token_budget import get_token_budgeter
+
+from dotenv import load_dotenv
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+LLM_GATEWAY_MAX_CONCURRENCY = int(os.getenv("LLM_GATEWAY_MAX_CONCURRENCY", "4"))
+# Provider-side tokens per minute (prompt + completion) this process may spend; 0 disables the budget
+LLM_GATEWAY_TOKENS_PER_MINUTE = int(os.getenv("LLM_GATEWAY_TOKENS_PER_MINUTE", "12000"))
+# Completion size assumed when reserving budget; corrected from the reported usage afterwards
+LLM_GATEWAY_COMPLETION_TOKENS = int(os.getenv("LLM_GATEWAY_COMPLETION_TOKENS", "256"))
+# Calls allowed to wait for a slot; beyond this new calls are rejected (backpressure)
+LLM_GATEWAY_MAX_QUEUE = int(os.getenv("LLM_GATEWAY_MAX_QUEUE", "32"))
+LLM_GATEWAY_QUEUE_TIMEOUT_S = float(os.getenv("LLM_GATEWAY_QUEUE_TIMEOUT_S", "30"))
+LLM_GATEWAY_MAX_RETRIES = int(os.getenv("LLM_GATEWAY_MAX_RETRIES", "3"))
+LLM_GATEWAY_RETRY_BASE_S = float(os.getenv("LLM_GATEWAY_RETRY_BASE_S", "0.5"))
+LLM_GATEWAY_RETRY_MAX_S = float(os.getenv("LLM_GATEWAY_RETRY_MAX_S", "8"))
+
+# Hedging: a slow primary call is raced against the fallback model
+LLM_HEDGE_ENABLED = os.getenv("LLM_HEDGE_ENABLED", "false").lower() == "true"
+LLM_HEDGE_FALLBACK_MODEL = os.getenv("LLM_HEDGE_FALLBACK_MODEL", "llama-3.1-8b-instant")
+# The hedge fires once the primary has run longer than this percentile of recent primary latencies
+LLM_HEDGE_PERCENTILE = float(os.getenv("LLM_HEDGE_PERCENTILE", "95"))
+# Delay used until LLM_HEDGE_MIN_SAMPLES latencies have been seen
+LLM_HEDGE_INITIAL_DELAY_S = float(os.getenv("LLM_HEDGE_INITIAL_DELAY_S", "2.0"))
+LLM_HEDGE_MIN_SAMPLES = int(os.getenv("LLM_HEDGE_MIN_SAMPLES", "20"))
+# Hedges earned per primary call, and how many may be saved up for a burst
+LLM_HEDGE_BUDGET_RATIO = float(os.getenv("LLM_HEDGE_BUDGET_RATIO", "0.1"))
+LLM_HEDGE_BUDGET_BURST = float(os.getenv("LLM_HEDGE_BUDGET_BURST", "3"))
+
+# Lower value is served first
+INTERACTIVE = 0
+BACKGROUND = 1
+BATCH = 2
+PRIORITY_NAMES = {INTERACTIVE: "interactive", BACKGROUND: "background", BATCH: "batch"}
+
+_current_priority: ContextVar[int] = ContextVar("llm_priority", default=INTERACTIVE)
+
+
+@contextmanager
+def llm_priority(priority: int):
+    """Queue the LLM calls made inside this block at `priority` (INTERACTIVE, BACKGROUND or BATCH)."""
+    token = _current_priority.set(priority)
+    try:
+        yield
+    finally:
+        _current_priority.reset(token)
+
+
+class LLMGatewayBusy(Exception):
+    """The gateway queue is full or a call waited longer than the queue timeout."""
+
+
+def _status_code(error: BaseException) -> Optional[int]:
+    status = getattr(error, "status_code", None)
+    if status is None:
+        status = getattr(getattr(error, "response", None), "status_code", None)
+    return status if isinstance(status, int) else None
+
+
+def is_retryable(error: BaseException) -> bool:
+    """Rate limits, provider 5xx and connection / timeout errors."""
+    status = _status_code(error)
+    if status is not None:
+        return status == 429 or status >= 500
+    return isinstance(error, (asyncio.TimeoutError, ConnectionError)) or type(error).__name__ in ("APIConnectionError", "APITimeoutError")
+
+
+def _retry_after(error: BaseException) -> Optional[float]:
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+class TokenBucket:
+    """
+    Tokens-per-minute budget. Calls reserve their estimate up front (the balance may go
+    negative) and sleep until it is paid back, so concurrent callers queue in reservation order.
+    """
+
+    def __init__(self, tokens_per_minute: int):
+        self.capacity = float(tokens_per_minute)
+        self.rate = tokens_per_minute / 60.0
+        self._available = self.capacity
+        self._updated = time.monotonic()
+        # Also used by synchronous calls from other threads (LLMGateway.generate_sync)
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._available = min(self.capacity, self._available + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def reserve(self, tokens: int) -> float:
+        """Take `tokens` and return the seconds to wait before using them."""
+        with self._lock:
+            self._refill()
+            self._available -= min(tokens, self.capacity)
+            return max(0.0, -self._available / self.rate)
+
+    def adjust(self, tokens: int):
+        """Correct a reservation once the real usage is known (positive: used more than reserved)."""
+        with self._lock:
+            self._refill()
+            self._available = min(self.capacity, self._available - tokens)
+
+
+class LLMGateway:
+    """
+    Process-wide governor for provider calls: at most `max_concurrency` in flight, served by
+    priority then arrival, a tokens-per-minute budget, a bounded wait queue and retries with
+    full-jitter exponential backoff. The queue belongs to a single event loop; synchronous
+    calls (generate_sync) share the budget and retries but are limited by their own semaphore.
+    """
+
+    def __init__(
+            self,
+            max_concurrency: int = LLM_GATEWAY_MAX_CONCURRENCY,
+            tokens_per_minute: int = LLM_GATEWAY_TOKENS_PER_MINUTE,
+            max_queue: int = LLM_GATEWAY_MAX_QUEUE,
+            queue_timeout_s: float = LLM_GATEWAY_QUEUE_TIMEOUT_S,
+            max_retries: int = LLM_GATEWAY_MAX_RETRIES,
+            retry_base_s: float = LLM_GATEWAY_RETRY_BASE_S,
+            retry_max_s: float = LLM_GATEWAY_RETRY_MAX_S,
+            completion_tokens: int = LLM_GATEWAY_COMPLETION_TOKENS,
+        ):
+        self.max_concurrency = max(1, max_concurrency)
+        self.bucket = TokenBucket(tokens_per_minute) if tokens_per_minute > 0 else None
+        self.max_queue = max(0, max_queue)
+        self.queue_timeout_s = queue_timeout_s
+        self.max_retries = max(0, max_retries)
+        self.retry_base_s = retry_base_s
+        self.retry_max_s = retry_max_s
+        self.completion_tokens = completion_tokens
+        self._active = 0
+        self._waiters: List[list] = []  # heap of [priority, seq, future]
+        self._seq = itertools.count()
+        self._sync_slots = threading.BoundedSemaphore(self.max_concurrency)
+        self.calls: Counter = Counter()
+        self.retries = 0
+        self.failures = 0
+        self.rejected = 0
+        self.queue_timeouts = 0
+        self.tokens_reserved = 0
+        self.rate_limit_wait_seconds = 0.0
+        self._queue_waits: Dict[int, Deque[float]] = defaultdict(lambda: deque(maxlen=1000))
+
+    @property
+    def queued(self) -> int:
+        return len(self._waiters)
+
+    def has_free_slot(self) -> bool:
+        return self._active < self.max_concurrency and not self._waiters
+
+    def saturated(self) -> bool:
+        """True when new calls would be rejected; the webhook answers 503 instead of starting a turn."""
+        return self._active >= self.max_concurrency and self.queued >= self.max_queue
+
+    async def _acquire(self, priority: int):
+        started = time.monotonic()
+        # Never wait for a slot past the request deadline
+        deadline = current_deadline()
+        queue_timeout = deadline.timeout(self.queue_timeout_s) if deadline is not None else self.queue_timeout_s
+        if self._active < self.max_concurrency and not self._waiters:
+            self._active += 1
+            self._queue_waits[priority].append(0.0)
+            return
+        if self.queued >= self.max_queue:
+            self.rejected += 1
+            raise LLMGatewayBusy(f"LLM queue full ({self.queued} waiting)")
+
+        future = asyncio.get_running_loop().create_future()
+        entry = [priority, next(self._seq), future]
+        heapq.heappush(self._waiters, entry)
+        try:
+            await asyncio.wait_for(future, queue_timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            granted = future.done() and not future.cancelled()
+            if entry in self._waiters:
+                self._waiters.remove(entry)
+                heapq.heapify(self._waiters)
+            if isinstance(e, asyncio.CancelledError):
+                if granted:
+                    self._release()
+                raise
+            if not granted:
+                self.queue_timeouts += 1
+                raise LLMGatewayBusy(f"Waited over {queue_timeout:.2f}s for an LLM slot")
+        self._queue_waits[priority].append(time.monotonic() - started)
+
+    def _release(self):
+        # Hand the slot straight to the best waiter so newcomers can't overtake the queue
+        while self._waiters:
+            _, _, future = heapq.heappop(self._waiters)
+            if not future.done():
+                future.set_result(None)
+                return
+        self._active -= 1
+
+    async def _reserve_tokens(self, tokens: int):
+        if self.bucket is None:
+            return
+        self.tokens_reserved += tokens
+        wait = self.bucket.reserve(tokens)
+        if wait > 0:
+            self.rate_limit_wait_seconds += wait
+            await asyncio.sleep(wait)
+
+    def _settle_tokens(self, reserved: int, used: Optional[int]):
+        if self.bucket is not None and used is not None:
+            self.bucket.adjust(used - reserved)
+
+    def _backoff(self, attempt: int, error: BaseException) -> float:
+        retry_after = _retry_after(error)
+        if retry_after is not None:
+            return min(retry_after, self.retry_max_s)
+        return random.uniform(0, min(self.retry_max_s, self.retry_base_s * 2 ** attempt))
+
+    def estimate_tokens(self, messages: Sequence[BaseMessage]) -> int:
+        budget = get_token_budgeter()
+        return sum(budget.count(str(message.content)) for message in messages) + self.completion_tokens
+
+    async def generate(self, model: BaseChatModel, messages: List[BaseMessage], stop=None, **kwargs) -> ChatResult:
+        """One `model._agenerate` call through the queue, retried on rate limits and transient errors."""
+        priority = _current_priority.get()
+        deadline = current_deadline()
+        tokens = self.estimate_tokens(messages)
+        self.calls[PRIORITY_NAMES.get(priority, str(priority))] += 1
+        for attempt in range(self.max_retries + 1):
+            await self._acquire(priority)
+            try:
+                await self._reserve_tokens(tokens)
+                call = model._agenerate(messages, stop=stop, **kwargs)
+                result = await (asyncio.wait_for(call, deadline.remaining()) if deadline is not None else call)
+            except Exception as e:
+                # A rate-limited request was not charged by the provider
+                self._settle_tokens(tokens, 0 if _status_code(e) == 429 else None)
+                if attempt >= self.max_retries or not is_retryable(e):
+                    self.failures += 1
+                    raise
+                delay = self._backoff(attempt, e)
+                if deadline is not None and delay >= deadline.remaining():
+                    self.failures += 1
+                    raise
+                logger.warning(f"LLM call failed ({type(e).__name__}: {e}); retry {attempt + 1}/{self.max_retries} in {delay:.2f}s")
+            else:
+                usage = (result.llm_output or {}).get("token_usage") or {}
+                self._settle_tokens(tokens, usage.get("total_tokens"))
+                return result
+            finally:
+                self._release()
+            # Back off without holding a slot
+            self.retries += 1
+            await asyncio.sleep(delay)
+
+    def generate_sync(self, model: BaseChatModel, messages: List[BaseMessage], stop=None, **kwargs) -> ChatResult:
+        """`model._generate` with the same token budget and retries, for sync callers (possibly inside a running loop)."""
+        priority = _current_priority.get()
+        tokens = self.estimate_tokens(messages)
+        self.calls[PRIORITY_NAMES.get(priority, str(priority))] += 1
+        for attempt in range(self.max_retries + 1):
+            with self._sync_slots:
+                if self.bucket is not None:
+                    self.tokens_reserved += tokens
+                    wait = self.bucket.reserve(tokens)
+                    if wait > 0:
+                        self.rate_limit_wait_seconds += wait
+                        time.sleep(wait)
+                try:
+                    result = model._generate(messages, stop=stop, **kwargs)
+                except Exception as e:
+                    self._settle_tokens(tokens, 0 if _status_code(e) == 429 else None)
+                    if attempt >= self.max_retries or not is_retryable(e):
+                        self.failures += 1
+                        raise
+                    delay = self._backoff(attempt, e)
+                    logger.warning(f"LLM call failed ({type(e).__name__}: {e}); retry {attempt + 1}/{self.max_retries} in {delay:.2f}s")
+                else:
+                    usage = (result.llm_output or {}).get("token_usage") or {}
+                    self._settle_tokens(tokens, usage.get("total_tokens"))
+                    return result
+            self.retries += 1
+            time.sleep(delay)
+
+    async def stream(self, model: BaseChatModel, messages: List[BaseMessage], stop=None, **kwargs) -> AsyncIterator[ChatGenerationChunk]:
+        """`model._astream` through the queue; only retried while nothing has been yielded yet."""
+        priority = _current_priority.get()
+        deadline = current_deadline()
+        tokens = self.estimate_tokens(messages)
+        self.calls[PRIORITY_NAMES.get(priority, str(priority))] += 1
+        for attempt in range(self.max_retries + 1):
+            await self._acquire(priority)
+            yielded = False
+            try:
+                await self._reserve_tokens(tokens)
+                async for chunk in model._astream(messages, stop=stop, **kwargs):
+                    yielded = True
+                    yield chunk
+            except Exception as e:
+                delay = self._backoff(attempt, e)
+                if yielded or attempt >= self.max_retries or not is_retryable(e) or (deadline is not None and delay >= deadline.remaining()):
+                    self.failures += 1
+                    raise
+                logger.warning(f"LLM stream failed ({type(e).__name__}: {e}); retry {attempt + 1}/{self.max_retries} in {delay:.2f}s")
+            else:
+                return
+            finally:
+                self._release()
+            self.retries += 1
+            await asyncio.sleep(delay)
+
+    def stats(self) -> Dict:
+        queue_wait = {}
+        for priority, waits in self._queue_waits.items():
+            ordered = sorted(waits)
+            queue_wait[PRIORITY_NAMES.get(priority, str(priority))] = {
+                "samples": len(ordered),
+                "avg_ms": sum(ordered) / len(ordered) * 1000 if ordered else 0.0,
+                "p95_ms": ordered[int(0.95 * (len(ordered) - 1))] * 1000 if ordered else 0.0,
+                "max_ms": ordered[-1] * 1000 if ordered else 0.0,
+            }
+        return {
+            "max_concurrency": self.max_concurrency,
+            "in_flight": self._active,
+            "queued": self.queued,
+            "max_queue": self.max_queue,
+            "tokens_per_minute": int(self.bucket.capacity) if self.bucket is not None else None,
+            "tokens_reserved": self.tokens_reserved,
+            "rate_limit_wait_seconds": self.rate_limit_wait_seconds,
+            "calls": dict(self.calls),
+            "retries": self.retries,
+            "failures": self.failures,
+            "rejected": self.rejected,
+            "queue_timeouts": self.queue_timeouts,
+            "queue_wait": queue_wait,
+        }
+
+
+class HedgePolicy:
+    """
+    When to fire a hedge: after the LLM_HEDGE_PERCENTILE of recent primary latencies, and
+    only while the budget allows (each primary call earns `budget_ratio` hedges, capped at
+    `budget_burst`). Cancelled primaries count with their elapsed time, a lower bound.
+    """
+
+    def __init__(
+            self,
+            percentile: float = LLM_HEDGE_PERCENTILE,
+            initial_delay_s: float = LLM_HEDGE_INITIAL_DELAY_S,
+            min_samples: int = LLM_HEDGE_MIN_SAMPLES,
+            budget_ratio: float = LLM_HEDGE_BUDGET_RATIO,
+            budget_burst: float = LLM_HEDGE_BUDGET_BURST,
+            window: int = 500,
+        ):
+        self.percentile = percentile
+        self.initial_delay_s = initial_delay_s
+        self.min_samples = min_samples
+        self.budget_ratio = budget_ratio
+        self.budget_burst = budget_burst
+        self._latencies: Deque[float] = deque(maxlen=window)
+        self._credit = budget_burst
+        self.calls = 0
+        self.hedged = 0
+        self.hedge_wins = 0
+        self.primary_wins = 0
+        self.over_budget = 0
+        self.no_slot = 0
+
+    def delay(self) -> float:
+        if len(self._latencies) < self.min_samples:
+            return self.initial_delay_s
+        ordered = sorted(self._latencies)
+        return ordered[min(len(ordered) - 1, int(self.percentile / 100 * len(ordered)))]
+
+    def start_call(self):
+        self.calls += 1
+        self._credit = min(self.budget_burst, self._credit + self.budget_ratio)
+
+    def record_primary(self, seconds: float):
+        self._latencies.append(seconds)
+
+    def try_hedge(self) -> bool:
+        if self._credit < 1:
+            self.over_budget += 1
+            return False
+        self._credit -= 1
+        self.hedged += 1
+        return True
+
+    def stats(self) -> Dict:
+        return {
+            "percentile": self.percentile,
+            "delay_ms": self.delay() * 1000,
+            "calls": self.calls,
+            "hedged": self.hedged,
+            "hedge_rate": self.hedged / self.calls if self.calls else 0.0,
+            "hedge_wins": self.hedge_wins,
+            "primary_wins": self.primary_wins,
+            "skipped_over_budget": self.over_budget,
+            "skipped_no_slot": self.no_slot,
+        }
+
+
+class GatewayChatModel(BaseChatModel):
+    """
+    Chat model that sends every provider call of `model` through an LLMGateway. Caching
+    belongs on this wrapper (not on `model`) so cache hits never wait for a slot.
+
+    With `fallback_model` and `hedge`, a non-streaming call still running after the hedge
+    delay is raced against the fallback model and the loser is cancelled. The fallback gets
+    the same bound kwargs (tools), so it should be a model of the same provider.
+    """
+
+    model: BaseChatModel
+    gateway: LLMGateway
+    fallback_model: Optional[BaseChatModel] = None
+    hedge: Optional[HedgePolicy] = None
+
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    @property
+    def _llm_type(self) -> str:
+        return f"gateway-{self.model._llm_type}"
+
+    @property
+    def _identifying_params(self) -> Dict[str, Any]:
+        return self.model._identifying_params
+
+    def bind_tools(self, tools, **kwargs):
+        # Let the wrapped model format the tools, then bind them here so calls still go through the gateway
+        return self.bind(**self.model.bind_tools(tools, **kwargs).kwargs)
+
+    def _generate(
+            self,
+            messages: List[BaseMessage],
+            stop: Optional[List[str]] = None,
+            run_manager: Optional[CallbackManagerForLLMRun] = None,
+            **kwargs: Any,
+        ) -> ChatResult:
+        # Sync invoke may happen inside a running event loop (sync chains, LangChain fallbacks), so no asyncio.run here
+        return self.gateway.generate_sync(self.model, messages, stop=stop, **kwargs)
+
+    async def _agenerate(
+            self,
+            messages: List[BaseMessage],
+            stop: Optional[List[str]] = None,
+            run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+            **kwargs: Any,
+        ) -> ChatResult:
+        if self.hedge is None or self.fallback_model is None:
+            return await self.gateway.generate(self.model, messages, stop=stop, **kwargs)
+        return await self._hedged_generate(messages, stop=stop, **kwargs)
+
+    async def _hedged_generate(self, messages: List[BaseMessage], stop=None, **kwargs) -> ChatResult:
+        hedge = self.hedge
+        hedge.start_call()
+        started = time.monotonic()
+        primary = asyncio.create_task(self.gateway.generate(self.model, messages, stop=stop, **kwargs))
+        primary.add_done_callback(lambda _: hedge.record_primary(time.monotonic() - started))
+        secondary = None
+        try:
+            done, _ = await asyncio.wait({primary}, timeout=hedge.delay())
+            if done:
+                return primary.result()
+            # A hedge must not queue behind other calls or exceed its budget
+            if not self.gateway.has_free_slot():
+                hedge.no_slot += 1
+                return await primary
+            if not hedge.try_hedge():
+                return await primary
+
+            secondary = asyncio.create_task(self.gateway.generate(self.fallback_model, messages, stop=stop, **kwargs))
+            pending = {primary, secondary}
+            while True:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                succeeded = [task for task in done if task.exception() is None]
+                if not succeeded and pending:
+                    # The other request may still succeed
+                    continue
+                winner = primary if primary in succeeded or not succeeded else secondary
+                if winner is primary:
+                    hedge.primary_wins += 1
+                    return winner.result()
+                hedge.hedge_wins += 1
+                # The LLM cache keys on the primary model; don't store the fallback's answer under it
+                result = winner.result()
+                mark_uncacheable(result.generations)
+                return result
+        finally:
+            for task in (primary, secondary):
+                if task is not None and not task.done():
+                    task.cancel()
+
+    async def _astream(
+            self,
+            messages: List[BaseMessage],
+            stop: Optional[List[str]] = None,
+            run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+            **kwargs: Any,
+        ) -> AsyncIterator[ChatGenerationChunk]:
+        # Token callbacks are fired by BaseChatModel for the chunks yielded here
+        async for chunk in self.gateway.stream(self.model, messages, stop=stop, **kwargs):
+            yield chunk
+
+
+_llm_gateway: Optional[LLMGateway] = None
+
+
+def get_llm_gateway() -> LLMGateway:
+    """Process-wide gateway shared by the graph, the grader and the summarizer."""
+    global _llm_gateway
+    if _llm_gateway is None:
+        _llm_gateway = LLMGateway()
+    return _llm_gateway
@@ -0,0 +1,104 @@
+"""
+Tail latency of LLM calls through the gateway with and without hedging, on local fake
+models with injected latency (no provider calls).
+
+    python -m agents.llm.hedge_benchmark --calls 400 --concurrency 4
+"""
+import argparse
+import asyncio
+import json
+import random
+import sys
+import time
+from typing import Dict, List, Optional
+
+from langchain_core.messages import HumanMessage
+
+from agents.llm.fake import FakeLatencyChatModel
+from agents.llm.gateway import GatewayChatModel, HedgePolicy, LLMGateway
+
+
+def _percentiles(latencies: List[float]) -> Dict[str, float]:
+    ordered = sorted(latencies)
+    pick = lambda p: ordered[min(len(ordered) - 1, int(p / 100 * len(ordered)))] * 1000
+    return {"p50_ms": round(pick(50), 1), "p95_ms": round(pick(95), 1), "p99_ms": round(pick(99), 1)}
+
+
+async def run(args, hedge: Optional[HedgePolicy]) -> Dict:
+    primary = FakeLatencyChatModel(
+        model_name="primary",
+        latency_s=args.latency,
+        tail_latency_s=args.tail_latency,
+        tail_probability=args.tail_probability,
+        rng=random.Random(args.seed),
+    )
+    fallback = FakeLatencyChatModel(model_name="fallback", latency_s=args.fallback_latency, rng=random.Random(args.seed + 1))
+    model = GatewayChatModel(
+        model=primary,
+        gateway=LLMGateway(max_concurrency=args.concurrency * 2, tokens_per_minute=0, max_queue=args.calls),
+        fallback_model=fallback if hedge is not None else None,
+        hedge=hedge,
+    )
+
+    latencies = []
+    semaphore = asyncio.Semaphore(args.concurrency)
+
+    async def call(index: int):
+        async with semaphore:
+            started = time.perf_counter()
+            await model.ainvoke([HumanMessage(content=f"question {index}")])
+            latencies.append(time.perf_counter() - started)
+
+    await asyncio.gather(*(call(index) for index in range(args.calls)))
+    # Let cancelled losers unwind before reading the counters
+    await asyncio.sleep(0)
+    report = {**_percentiles(latencies), "primary_calls": primary.calls, "fallback_calls": fallback.calls}
+    if hedge is not None:
+        report["hedge"] = hedge.stats()
+        report["cancelled_losers"] = primary.cancelled + fallback.cancelled
+    return report
+
+
+def check(args, hedged: Dict) -> List[str]:
+    failures = []
+    stats = hedged["hedge"]
+    if stats["hedged"] > args.calls * args.budget_ratio + args.budget_burst:
+        failures.append(f"hedged {stats['hedged']} calls, over the budget")
+    if stats["hedge_wins"] + stats["primary_wins"] != stats["hedged"]:
+        failures.append("a hedged call finished without a winner")
+    # A loser still running when the winner returns must be cancelled, never left in flight
+    if hedged["cancelled_losers"] > stats["hedged"]:
+        failures.append(f"{hedged['cancelled_losers']} cancelled calls for {stats['hedged']} hedges")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--calls", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--latency", type=float, default=0.05, help="Usual primary latency (s)")
+    parser.add_argument("--tail-latency", type=float, default=1.0, help="Slow primary latency (s)")
+    parser.add_argument("--tail-probability", type=float, default=0.03)
+    parser.add_argument("--fallback-latency", type=float, default=0.08)
+    parser.add_argument("--percentile", type=float, default=95)
+    parser.add_argument("--budget-ratio", type=float, default=0.1)
+    parser.add_argument("--budget-burst", type=float, default=3)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    baseline = asyncio.run(run(args, hedge=None))
+    hedge = HedgePolicy(
+        percentile=args.percentile,
+        initial_delay_s=args.latency * 3,
+        min_samples=20,
+        budget_ratio=args.budget_ratio,
+        budget_burst=args.budget_burst,
+    )
+    hedged = asyncio.run(run(args, hedge=hedge))
+    failures = check(args, hedged)
+    print(json.dumps({"baseline": baseline, "hedged": hedged, "failures": failures}, indent=2))
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
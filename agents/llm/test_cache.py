@@ -0,0 +1,86 @@
+from langchain_core.outputs import Generation
+
+from agents.llm import cache as cache_module
+from agents.llm.cache import (
+    UNSCOPED_CHAIN, InMemoryLRULLMCache, _SQL_PARAM, cache_key, llm_cache_scope, mark_uncacheable,
+)
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+
+def _reply(text):
+    return [Generation(text=text)]
+
+
+def test_cache_key_depends_on_prompt_and_model_parameters():
+    key = cache_key("hello", "model=a temperature=0")
+    assert key == cache_key("hello", "model=a temperature=0")
+    assert len(key) == 64
+    assert key != cache_key("hello", "model=a temperature=1")
+    assert key != cache_key("hello!", "model=a temperature=0")
+    # The separator keeps the two fields from running into each other
+    assert cache_key("b", "a") != cache_key("", "ab")
+
+
+def test_lookup_returns_the_stored_generations():
+    cache = InMemoryLRULLMCache(max_size=4, ttl_seconds=0)
+    cache.update("prompt", "llm", _reply("answer"))
+    assert cache.lookup("prompt", "llm")[0].text == "answer"
+    assert cache.lookup("prompt", "other-llm") is None
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = InMemoryLRULLMCache(max_size=2, ttl_seconds=0)
+    cache.update("a", "llm", _reply("a"))
+    cache.update("b", "llm", _reply("b"))
+    assert cache.lookup("a", "llm") is not None
+    cache.update("c", "llm", _reply("c"))
+    assert cache.lookup("b", "llm") is None
+    assert cache.lookup("a", "llm") is not None
+    assert cache.stats()["size"] == 2
+
+
+def test_entries_expire_after_ttl(monkeypatch):
+    clock = _Clock()
+    monkeypatch.setattr(cache_module.time, "monotonic", clock.monotonic)
+    cache = InMemoryLRULLMCache(max_size=4, ttl_seconds=60)
+    cache.update("prompt", "llm", _reply("answer"))
+    clock.now += 60
+    assert cache.lookup("prompt", "llm") is not None
+    clock.now += 1
+    assert cache.lookup("prompt", "llm") is None
+    assert cache.stats()["size"] == 0
+
+
+def test_uncacheable_generations_are_not_stored():
+    cache = InMemoryLRULLMCache(max_size=4, ttl_seconds=0)
+    reply = _reply("from the fallback model")
+    mark_uncacheable(reply)
+    cache.update("prompt", "llm", reply)
+    assert cache.lookup("prompt", "llm") is None
+    assert sum(cache.updates.values()) == 0
+
+
+def test_hits_and_misses_are_counted_per_chain():
+    cache = InMemoryLRULLMCache(max_size=4, ttl_seconds=0)
+    with llm_cache_scope("respond_wContext"):
+        cache.lookup("prompt", "llm")
+        cache.update("prompt", "llm", _reply("answer"))
+        cache.lookup("prompt", "llm")
+    cache.lookup("prompt", "llm")
+    chains = cache.stats()["chains"]
+    assert chains["respond_wContext"] == {"hits": 1, "misses": 1, "updates": 1, "hit_rate": 0.5}
+    assert chains[UNSCOPED_CHAIN]["hits"] == 1
+
+
+def test_named_parameters_are_rewritten_for_psycopg_but_casts_are_kept():
+    query = "SELECT response FROM llm_cache WHERE key = :key AND created_at > :now - :ttl AND x = y::text"
+    assert _SQL_PARAM.sub(r"%(\1)s", query) == (
+        "SELECT response FROM llm_cache WHERE key = %(key)s AND created_at > %(now)s - %(ttl)s AND x = y::text"
+    )
@@ -0,0 +1,141 @@
+import asyncio
+
+import pytest
+from langchain_core.messages import AIMessage, HumanMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+
+from agents.llm.gateway import (
+    BACKGROUND, BATCH, INTERACTIVE, LLMGateway, LLMGatewayBusy, TokenBucket, llm_priority,
+)
+
+
+class _RateLimited(Exception):
+    status_code = 429
+
+
+class _Model:
+    """Stands in for a chat model: records the order calls start in and answers with the prompt."""
+
+    def __init__(self, release: asyncio.Event = None, failures: int = 0):
+        self.release = release
+        self.failures = failures
+        self.started = []
+
+    def _result(self, messages):
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=messages[-1].content))])
+
+    async def _agenerate(self, messages, stop=None, **kwargs):
+        self.started.append(messages[-1].content)
+        if self.release is not None:
+            await self.release.wait()
+        if self.failures:
+            self.failures -= 1
+            raise _RateLimited("slow down")
+        return self._result(messages)
+
+    def _generate(self, messages, stop=None, **kwargs):
+        self.started.append(messages[-1].content)
+        if self.failures:
+            self.failures -= 1
+            raise _RateLimited("slow down")
+        return self._result(messages)
+
+
+def _gateway(**kwargs):
+    options = {"max_concurrency": 1, "tokens_per_minute": 0, "retry_base_s": 0, "retry_max_s": 0}
+    options.update(kwargs)
+    return LLMGateway(**options)
+
+
+def test_waiters_are_served_by_priority_then_arrival():
+    async def run():
+        gateway = _gateway(max_queue=10)
+        release = asyncio.Event()
+        model = _Model(release)
+
+        async def call(name, priority):
+            with llm_priority(priority):
+                return await gateway.generate(model, [HumanMessage(content=name)])
+
+        tasks = [asyncio.create_task(call("first", BATCH))]
+        await asyncio.sleep(0)
+        for name, priority in [("batch", BATCH), ("background", BACKGROUND), ("interactive-1", INTERACTIVE), ("interactive-2", INTERACTIVE)]:
+            tasks.append(asyncio.create_task(call(name, priority)))
+            await asyncio.sleep(0)
+        assert gateway.queued == 4
+        release.set()
+        await asyncio.gather(*tasks)
+        return model.started, gateway
+
+    started, gateway = asyncio.run(run())
+    assert started == ["first", "interactive-1", "interactive-2", "background", "batch"]
+    assert gateway.calls == {"batch": 2, "background": 1, "interactive": 2}
+    assert gateway._active == 0
+
+
+def test_full_queue_rejects_new_calls():
+    async def run():
+        gateway = _gateway(max_queue=1)
+        release = asyncio.Event()
+        model = _Model(release)
+        running = asyncio.create_task(gateway.generate(model, [HumanMessage(content="a")]))
+        waiting = asyncio.create_task(gateway.generate(model, [HumanMessage(content="b")]))
+        await asyncio.sleep(0)
+        assert gateway.saturated()
+        with pytest.raises(LLMGatewayBusy):
+            await gateway.generate(model, [HumanMessage(content="c")])
+        release.set()
+        await asyncio.gather(running, waiting)
+        return gateway
+
+    gateway = asyncio.run(run())
+    assert gateway.rejected == 1
+    assert not gateway.saturated()
+
+
+def test_queue_timeout_gives_up_the_place_in_line():
+    async def run():
+        gateway = _gateway(max_queue=5, queue_timeout_s=0.01)
+        release = asyncio.Event()
+        model = _Model(release)
+        running = asyncio.create_task(gateway.generate(model, [HumanMessage(content="a")]))
+        await asyncio.sleep(0)
+        with pytest.raises(LLMGatewayBusy):
+            await gateway.generate(model, [HumanMessage(content="b")])
+        release.set()
+        await running
+        return gateway
+
+    gateway = asyncio.run(run())
+    assert gateway.queue_timeouts == 1
+    assert gateway.queued == 0
+    assert gateway._active == 0
+
+
+def test_rate_limited_calls_are_retried():
+    gateway = _gateway(max_retries=2)
+    model = _Model(failures=2)
+    result = asyncio.run(gateway.generate(model, [HumanMessage(content="hi")]))
+    assert result.generations[0].message.content == "hi"
+    assert gateway.retries == 2
+    assert gateway._active == 0
+
+
+def test_sync_generate_works_inside_a_running_loop():
+    gateway = _gateway(max_retries=1)
+    model = _Model(failures=1)
+
+    async def run():
+        return gateway.generate_sync(model, [HumanMessage(content="hi")])
+
+    result = asyncio.run(run())
+    assert result.generations[0].message.content == "hi"
+    assert gateway.retries == 1
+
+
+def test_token_bucket_waits_once_the_budget_is_spent():
+    bucket = TokenBucket(tokens_per_minute=600)
+    assert bucket.reserve(600) == 0.0
+    assert bucket.reserve(60) == pytest.approx(6.0, abs=0.05)
+    bucket.adjust(-60)
+    assert bucket.reserve(0) == pytest.approx(0.0, abs=0.05)
@@ -0,0 +1,170 @@
+import logging
+import os
+import threading
+from collections import defaultdict
+from typing import Dict, List, Optional
+
+from dotenv import load_dotenv
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Local approximation of the Groq model's tokenizer; falls back to ~4 characters per token
+PROMPT_TOKENIZER_ENCODING = os.getenv("PROMPT_TOKENIZER_ENCODING", "cl100k_base")
+PROMPT_BUDGET_SYSTEM_TOKENS = int(os.getenv("PROMPT_BUDGET_SYSTEM_TOKENS", "600"))
+PROMPT_BUDGET_HISTORY_TOKENS = int(os.getenv("PROMPT_BUDGET_HISTORY_TOKENS", "800"))
+PROMPT_BUDGET_CONTEXT_TOKENS = int(os.getenv("PROMPT_BUDGET_CONTEXT_TOKENS", "2000"))
+PROMPT_BUDGET_QUERY_TOKENS = int(os.getenv("PROMPT_BUDGET_QUERY_TOKENS", "300"))
+# A block is only truncated into the remaining space when at least this many tokens are left
+PROMPT_BUDGET_MIN_TRUNCATED_TOKENS = int(os.getenv("PROMPT_BUDGET_MIN_TRUNCATED_TOKENS", "48"))
+
+_CHARS_PER_TOKEN = 4
+TRUNCATION_MARKER = " …"
+
+
+class TokenBudgeter:
+    """
+    Counts tokens locally and fits prompt sections to fixed budgets: blocks are given
+    best-first and the tail is truncated or dropped; history keeps the newest turns.
+    """
+
+    def __init__(
+            self,
+            system_tokens: int = PROMPT_BUDGET_SYSTEM_TOKENS,
+            history_tokens: int = PROMPT_BUDGET_HISTORY_TOKENS,
+            context_tokens: int = PROMPT_BUDGET_CONTEXT_TOKENS,
+            query_tokens: int = PROMPT_BUDGET_QUERY_TOKENS,
+            min_truncated_tokens: int = PROMPT_BUDGET_MIN_TRUNCATED_TOKENS,
+            encoding_name: str = PROMPT_TOKENIZER_ENCODING,
+        ):
+        self.system_tokens = system_tokens
+        self.history_tokens = history_tokens
+        self.context_tokens = context_tokens
+        self.query_tokens = query_tokens
+        self.min_truncated_tokens = min_truncated_tokens
+        self.encoding_name = encoding_name
+        self._encoding = None
+        self._encoding_loaded = False
+        self._lock = threading.Lock()
+        self._calls: Dict[str, List[int]] = defaultdict(lambda: [0, 0, 0, 0])  # calls, total, last, max
+        self._system_prompt_tokens: Dict[str, int] = {}
+        self.dropped_blocks = 0
+        self.truncated_blocks = 0
+
+    @property
+    def encoding(self):
+        if not self._encoding_loaded:
+            with self._lock:
+                if not self._encoding_loaded:
+                    try:
+                        import tiktoken
+                        self._encoding = tiktoken.get_encoding(self.encoding_name)
+                    except Exception as e:
+                        logger.warning(f"tiktoken unavailable ({e}); estimating tokens from characters")
+                    self._encoding_loaded = True
+        return self._encoding
+
+    @property
+    def tokenizer(self) -> str:
+        return self.encoding_name if self.encoding is not None else "chars/4"
+
+    def count(self, text: str) -> int:
+        if not text:
+            return 0
+        if self.encoding is not None:
+            return len(self.encoding.encode(text, disallowed_special=()))
+        return -(-len(text) // _CHARS_PER_TOKEN)
+
+    def truncate(self, text: str, max_tokens: int) -> str:
+        if max_tokens <= 0:
+            return ""
+        if self.count(text) <= max_tokens:
+            return text
+        with self._lock:
+            self.truncated_blocks += 1
+        if self.encoding is not None:
+            tokens = self.encoding.encode(text, disallowed_special=())
+            return self.encoding.decode(tokens[:max_tokens]) + TRUNCATION_MARKER
+        return text[:max_tokens * _CHARS_PER_TOKEN] + TRUNCATION_MARKER
+
+    def fit_blocks(self, blocks: List[str], max_tokens: int) -> List[str]:
+        """Keep blocks in order (best first) while they fit; truncate the first one that doesn't, drop the rest."""
+        kept, remaining = [], max_tokens
+        for block in blocks:
+            tokens = self.count(block)
+            if tokens <= remaining:
+                kept.append(block)
+                remaining -= tokens
+                continue
+            if remaining >= self.min_truncated_tokens:
+                kept.append(self.truncate(block, remaining))
+            with self._lock:
+                self.dropped_blocks += len(blocks) - len(kept)
+            break
+        return kept
+
+    def fit_history(self, summary: Optional[str], turns: List[str], max_tokens: Optional[int] = None) -> List[str]:
+        """
+        `turns` oldest first. The summary may use up to half the budget; the newest turns
+        fill the rest and the oldest are dropped first. Returns the lines to render, oldest first.
+        """
+        budget = self.history_tokens if max_tokens is None else max_tokens
+        lines = []
+        if summary:
+            summary = self.truncate(summary, budget // 2)
+            lines.append(summary)
+            budget -= self.count(summary)
+        newest_first = self.fit_blocks(list(reversed(turns)), budget)
+        return lines + list(reversed(newest_first))
+
+    def check_system_prompt(self, chain: str, template: str) -> int:
+        """Measure a chain's fixed instructions once and warn when they exceed the system budget."""
+        tokens = self._system_prompt_tokens.get(chain)
+        if tokens is None:
+            tokens = self._system_prompt_tokens[chain] = self.count(template)
+            if tokens > self.system_tokens:
+                logger.warning(f"{chain} prompt template uses {tokens} tokens, over the {self.system_tokens} system budget")
+        return tokens
+
+    def record(self, chain: str, prompt_text: str) -> int:
+        """Count the final rendered prompt of one LLM call and keep per-chain totals."""
+        tokens = self.count(prompt_text)
+        with self._lock:
+            stats = self._calls[chain]
+            stats[0] += 1
+            stats[1] += tokens
+            stats[2] = tokens
+            stats[3] = max(stats[3], tokens)
+        logger.debug(f"Prompt tokens {chain}: {tokens}")
+        return tokens
+
+    def stats(self) -> Dict:
+        return {
+            "tokenizer": self.tokenizer,
+            "budgets": {
+                "system": self.system_tokens,
+                "history": self.history_tokens,
+                "context": self.context_tokens,
+                "query": self.query_tokens,
+            },
+            "system_prompt_tokens": dict(self._system_prompt_tokens),
+            "dropped_blocks": self.dropped_blocks,
+            "truncated_blocks": self.truncated_blocks,
+            "chains": {
+                chain: {
+                    "calls": calls,
+                    "avg_tokens": total / calls if calls else 0.0,
+                    "last_tokens": last,
+                    "max_tokens": largest,
+                }
+                for chain, (calls, total, last, largest) in self._calls.items()
+            },
+        }
+
+
+_token_budgeter = TokenBudgeter()
+
+
+def get_token_budgeter() -> TokenBudgeter:
+    """Process-wide budgeter shared by the responders and the grader."""
+    return _token_budgeter
@@ -1,7 +1,7 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from .config import load_env_variables, intialize_logs
-from .routers import whatsapp, pdf_upload, database_management, rules
+from .routers import whatsapp, pdf_upload, database_management, rules, metrics
 from database.db import database
 
 API_PREFIX = "/api"
@@ -42,5 +42,6 @@ def create_app():
     app.include_router(pdf_upload.router, prefix=API_PREFIX)
     app.include_router(database_management.router, prefix=API_PREFIX)
     app.include_router(rules.router, prefix=API_PREFIX)
+    app.include_router(metrics.router, prefix=API_PREFIX)
 
     return app
@@ -4,10 +4,12 @@ import logging
 import traceback
 import sys
 from datetime import datetime
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse
 from fastapi import  Depends, Request, Query, responses, HTTPException
 from database.db import database
-from app.utils.whatsapp.message_inbound import is_valid_whatsapp_message, process_whatsapp_message
+from database.conversation_cache import conversation_cache
+from database.processed_messages import DONE, processed_messages
+from app.utils.whatsapp.message_inbound import is_valid_whatsapp_message, process_whatsapp_message, get_inbound_message_id
 from app.utils.whatsapp.status import is_valid_whatsapp_status
 from app.config import get_settings
 from app.utils.whatsapp.message_outbound import send_whatsapp_text
@@ -17,8 +19,13 @@ import base64
 import time 
 import asyncio
 
-import weaviate
-from sentence_transformers import SentenceTransformer
+from agents.langgraph_propertyagent.graph import extract_travel_data
+from agents.chat.checkpoint_compaction import conversation_thread_id
+from agents.llm.gateway import LLMGatewayBusy
+from agents.chat.deadline import (
+    ANSWER, DEADLINE_GRACE_S, DEADLINE_MIN_RELEVANT_DATA_S, FALLBACK_REPLY, RELEVANT_DATA, Deadline, deadline_from_headers, deadline_scope,
+)
+from agents.chat.webhook_jobs import WEBHOOK_ASYNC_MODE, get_webhook_job_queue
 
 load_dotenv()
 key = os.getenv('KEY')
@@ -32,120 +39,212 @@ credentials = f"{username}:{password}"
 # Base64 encode the credentials
 encoded_credentials = base64.b64encode(credentials.encode('utf-8')).decode('utf-8')
 
-WEAVIATE_URL = os.getenv("WEAVIATE_URL", "http://weaviate:8080")
-_travel_embedding_model = SentenceTransformer('all-distilroberta-v1')
-_weaviate_client = weaviate.Client(WEAVIATE_URL)
-_TRAVEL_VECTOR_FIELDS = ["category", "content", "url", "doc_id", "chunk_id", "agentId"]
-_TRAVEL_CLASS_HOTELS = "Hotels"
-_TRAVEL_CLASS_TOURS = "Tours"
+# Connect/read timeout of every Calendly API call
+CALENDLY_TIMEOUT_S = float(os.getenv("CALENDLY_TIMEOUT_S", "10"))
+# Timeout of the POST delivering an asynchronously answered turn to its callback URL
+WEBHOOK_CALLBACK_TIMEOUT_S = float(os.getenv("WEBHOOK_CALLBACK_TIMEOUT_S", "10"))
+# Comma-separated URLs asynchronous replies may be POSTed to; the first is used when the payload names none.
+# /api/webhook is unauthenticated, so a callback_url from the payload is only accepted if it is listed here.
+WEBHOOK_CALLBACK_URLS = [url.strip() for url in os.getenv("WEBHOOK_CALLBACK_URLS", "").split(",") if url.strip()]
+# Hotels and tours each returned in a response's relevant_data
+RELEVANT_DATA_PER_CLASS = int(os.getenv("RELEVANT_DATA_PER_CLASS", "3"))
+
+
+async def _get_or_create_conversation(agentId: str, client_id: str, error_details: dict):
+    """
+    Resolve the two-member conversation between agent and client, creating it if needed.
+    Returns the conversation id, or None when it could not be created.
+    """
+    conversation = conversation_cache.find_by_members([agentId, client_id])
+    if conversation is not None:
+        error_details["database_queries"] = {"conversation_cache": "hit"}
+        error_details["conversation_id"] = conversation["id"]
+        return conversation["id"]
+
+    query_find = f"SELECT * FROM conversations WHERE members @> ARRAY['{agentId}', '{client_id}'] AND array_length(members, 1) = 2"
+    error_details["database_queries"] = {"find_query": query_find}
+
+    results = await database.fetch_all(query=query_find)
+    print("finish first query", results)
+    error_details["database_queries"]["find_results"] = str(results)
+
+    if len(results) < 1:
+        query = f"INSERT INTO conversations (members, created_at, updated_at, agentid) VALUES (ARRAY['{agentId}', '{client_id}'], EXTRACT(EPOCH FROM CURRENT_TIMESTAMP), EXTRACT(EPOCH FROM CURRENT_TIMESTAMP),{agentId})"
+        error_details["database_queries"]["insert_query"] = query
+
+        await database.fetch_one(query)
+        conversation_cache.invalidate(members=[agentId, client_id])
+        print("inserted con")
+
+        results = await database.fetch_all(query=query_find)
+        error_details["database_queries"]["insert_results"] = str(results)
+
+        if len(results) < 1:
+            error_details["database_error"] = "Failed to retrieve conversation after insert"
+            return None
+
+    conversation_id = conversation_cache.put(results[0])["id"]
+    error_details["conversation_id"] = conversation_id
+    return conversation_id
+
+
+async def _insert_message(conversation_id, sender, content: str, from_ai: bool):
+    query = """
+        INSERT INTO messages (conversation_id, sender, content, type, from_ai, created_at, updated_at, is_summarized)
+        VALUES (:conversation_id, :sender, :content, 'text', :from_ai, EXTRACT(EPOCH FROM NOW()), EXTRACT(EPOCH FROM NOW()), 0)
+    """
+    params = {
+        "conversation_id": conversation_id,
+        "sender": sender,
+        "content": content,
+        "from_ai": 1 if from_ai else 0,
+    }
+    await database.fetch_one(query, values=params)
 
 
-def _parse_travel_content(raw_content: str):
-    try:
-        parsed = json.loads(raw_content)
-        if isinstance(parsed, str):
-            parsed = json.loads(parsed)
-        if isinstance(parsed, dict):
-            return parsed
-    except Exception:
-        pass
-    return {}
-
-
-def _format_hotel_record(record: dict) -> dict:
-    payload = _parse_travel_content(record.get("content", ""))
-    metadata = {
-        "score": record.get("_additional", {}).get("score"),
-        "distance": record.get("_additional", {}).get("distance"),
-    }
-    return {
-        "id": payload.get("id") or payload.get("hotel_id") or record.get("doc_id"),
-        "name": payload.get("name"),
-        "city": payload.get("city"),
-        "country": payload.get("country"),
-        "price_range": payload.get("price_range") or payload.get("price"),
-        "description": payload.get("des") or payload.get("description"),
-        "link": payload.get("link") or record.get("url"),
-        "metadata": metadata,
-    }
+# --------------------------------------------------------------
+# INBOUND MESSAGE HANDLER
+# --------------------------------------------------------------
 
+def _busy_response() -> JSONResponse:
+    """503 while the LLM gateway queue is full; clients should retry after a short delay."""
+    return JSONResponse(
+        content={"status": "error", "message": "The assistant is busy, please retry shortly."},
+        status_code=503,
+        headers={"Retry-After": "5"}
+    )
 
-def _format_tour_record(record: dict) -> dict:
-    payload = _parse_travel_content(record.get("content", ""))
-    provider = payload.get("provider") or {}
-    items = payload.get("items", [])
-    metadata = {
-        "score": record.get("_additional", {}).get("score"),
-        "distance": record.get("_additional", {}).get("distance"),
-    }
-    return {
-        "id": payload.get("tour_id") or payload.get("id") or record.get("doc_id"),
-        "name": payload.get("tour_name") or payload.get("name"),
-        "city": payload.get("city"),
-        "country": payload.get("country"),
-        "provider": provider.get("name"),
-        "link": provider.get("website") or record.get("url"),
-        "highlights": [item.get("location_name") or item.get("description") for item in items if isinstance(item, dict)],
-        "metadata": metadata,
-    }
 
+async def _chat_within_deadline(agent, input_message_with_key: str, config: dict, deadline):
+    """agent.chat, cut off shortly after the deadline if a stage didn't degrade in time."""
+    try:
+        return await asyncio.wait_for(
+            agent.chat(input=input_message_with_key, config=config),
+            deadline.remaining() + DEADLINE_GRACE_S
+        )
+    except asyncio.TimeoutError:
+        deadline.degrade(ANSWER)
+        return FALLBACK_REPLY, []
 
-def _query_travel_class(class_name: str, vector: list, agent_id: str, limit: int):
-    normalized_class = _TRAVEL_CLASS_HOTELS if class_name.lower().startswith("hotel") else (
-        _TRAVEL_CLASS_TOURS if class_name.lower().startswith("tour") else class_name
+
+def _relevant_data_within_deadline(documents, deadline) -> dict:
+    if not deadline.allows(DEADLINE_MIN_RELEVANT_DATA_S):
+        deadline.degrade(RELEVANT_DATA)
+        return {"hotels": [], "tours": []}
+    return extract_travel_data(documents, limit=RELEVANT_DATA_PER_CLASS)
+
+
+def _callback_url(payload: dict):
+    """The configured callback URL an async turn's reply goes to, or None if the payload's isn't allowed."""
+    requested = payload.get("callback_url")
+    if requested is None:
+        return WEBHOOK_CALLBACK_URLS[0] if WEBHOOK_CALLBACK_URLS else None
+    return requested if requested in WEBHOOK_CALLBACK_URLS else None
+
+
+def _deliver_reply(job: dict, reply: str, relevant_data: dict):
+    """POST the reply to the job's callback URL."""
+    # Checked again here: the allowlist may have changed since the job was queued
+    if job["callback_url"] not in WEBHOOK_CALLBACK_URLS:
+        raise RuntimeError(f"Callback URL not allowed: {job['callback_url']}")
+    response = requests.post(
+        job["callback_url"],
+        json={
+            "status": "ok",
+            "job_id": job["id"],
+            "conversation_id": job["conversation_id"],
+            "client_id": job["client_id"],
+            "reply": reply,
+            "relevant_data": relevant_data,
+        },
+        timeout=WEBHOOK_CALLBACK_TIMEOUT_S
     )
-    response = (
-        _weaviate_client.query
-        .get(normalized_class, _TRAVEL_VECTOR_FIELDS)
-        .with_where({
-            "path": ["agentId"],
-            "operator": "Equal",
-            "valueString": agent_id
-        })
-        .with_limit(limit)
-        .with_additional(["score", "distance"])
-        .with_near_vector({"vector": vector})
-        .do()
+    if response is None or response.status_code >= 300:
+        raise RuntimeError(f"Reply delivery failed: {getattr(response, 'status_code', 'no response')}")
+
+
+async def process_webhook_job(job: dict, agent):
+    """Answer one queued webhook turn (see WEBHOOK_ASYNC_MODE) and deliver the reply."""
+    conversation_id = job["conversation_id"]
+    reply = job["reply"]
+    if reply is None:
+        # Nobody waits on the HTTP response, but the turn still gets the usual time budget
+        deadline = Deadline()
+        with deadline_scope(deadline):
+            input_message_with_key = f"{job['message']}{key}{conversation_id}"
+            config = {"configurable": {"thread_id": conversation_thread_id(conversation_id)}}
+            reply, documents = await _chat_within_deadline(agent, input_message_with_key, config, deadline)
+            relevant_data = _relevant_data_within_deadline(documents, deadline)
+        await get_webhook_job_queue().save_reply(job, reply, relevant_data)
+        await _insert_message(conversation_id, job["agent_id"], reply, from_ai=True)
+    else:
+        # Delivery retry: the agent already answered this job
+        relevant_data = job["relevant_data"]
+        if isinstance(relevant_data, str):
+            relevant_data = json.loads(relevant_data)
+
+    loop = asyncio.get_running_loop()
+    await loop.run_in_executor(None, lambda: _deliver_reply(job, reply, relevant_data or {}))
+
+
+def _duplicate_response(message_id: str, record: dict) -> JSONResponse:
+    """The response stored for the first delivery of `message_id`, or 202 while that one is still running."""
+    headers = {"X-Duplicate-Message": message_id}
+    if record["status"] == DONE:
+        return JSONResponse(content=json.loads(record["response"]), status_code=record["status_code"], headers=headers)
+    return JSONResponse(
+        content={"status": "accepted", "message": "Message is already being processed"},
+        status_code=202,
+        headers=headers
     )
-    return response.get("data", {}).get("Get", {}).get(normalized_class, []) or []
 
 
-def _fetch_relevant_travel_data_sync(text: str, agent_id: str = "1", limit: int = 3) -> dict:
-    if not text:
-        return {"hotels": [], "tours": []}
+def _is_final_response(response) -> bool:
+    """A success without degraded stages; a degraded reply (e.g. FALLBACK_REPLY) must not be replayed to retries."""
+    if response is None or response.status_code >= 300:
+        return False
+    return not json.loads(response.body).get("degraded")
 
-    try:
-        vector = _travel_embedding_model.encode(text).tolist()
-    except Exception as exc:
-        logging.warning("Failed to encode travel text: %s", exc)
-        return {"hotels": [], "tours": []}
 
-    relevant = {"hotels": [], "tours": []}
+async def handle_webhook(request:Request):
+    """
+    Idempotent on the inbound message id: a retried delivery of a message gets the stored
+    response of the first one instead of another agent run. Only complete success responses
+    are kept, so a retry after an error or a deadline-degraded reply is processed again.
+    """
     try:
-        hotel_hits = _query_travel_class("hotels", vector, agent_id, limit)
-        relevant["hotels"] = [_format_hotel_record(hit) for hit in hotel_hits]
-    except Exception as exc:
-        logging.warning("Hotel relevance lookup failed: %s", exc)
+        message_id = get_inbound_message_id(await request.json())
+    except json.JSONDecodeError:
+        message_id = None
+    if message_id is None:
+        return await _handle_webhook(request)
 
     try:
-        tour_hits = _query_travel_class("tours", vector, agent_id, limit)
-        relevant["tours"] = [_format_tour_record(hit) for hit in tour_hits]
-    except Exception as exc:
-        logging.warning("Tour relevance lookup failed: %s", exc)
-
-    return relevant
-
+        record = await processed_messages.claim(message_id)
+    except Exception as e:
+        # Without the table we'd rather risk a duplicate run than drop the message
+        logging.warning(f"Idempotency check failed for {message_id}: {e}")
+        return await _handle_webhook(request)
+    if record is not None:
+        return _duplicate_response(message_id, record)
 
-async def get_relevant_travel_data(text: str, agent_id: str = "1", limit: int = 3) -> dict:
-    loop = asyncio.get_running_loop()
-    return await loop.run_in_executor(None, lambda: _fetch_relevant_travel_data_sync(text, agent_id, limit))
+    response = None
+    try:
+        response = await _handle_webhook(request)
+        return response
+    finally:
+        try:
+            if _is_final_response(response):
+                await processed_messages.finish(message_id, response.status_code, response.body.decode("utf-8"))
+            else:
+                await processed_messages.release(message_id)
+        except Exception as e:
+            logging.warning(f"Failed to record processed message {message_id}: {e}")
 
 
-# --------------------------------------------------------------
-# INBOUND MESSAGE HANDLER
-# --------------------------------------------------------------
-
-async def handle_webhook(request:Request):
+async def _handle_webhook(request:Request):
+    # Time budget of the whole turn; the graph stages degrade to stay within it
+    deadline = deadline_from_headers(request.headers)
     error_details = {
         "timestamp": datetime.now().isoformat(),
         "request_info": {
@@ -197,6 +296,24 @@ async def handle_webhook(request:Request):
                     status_code=400
                 )
             
+            # Acknowledge with 202 and answer from the job queue; a payload "async" flag overrides WEBHOOK_ASYNC_MODE
+            async_mode = bool(payload.get("async", WEBHOOK_ASYNC_MODE))
+            callback_url = _callback_url(payload) if async_mode else None
+            if async_mode and callback_url is None:
+                error_details["validation_error"] = "Async reply needs a callback_url listed in WEBHOOK_CALLBACK_URLS"
+                return JSONResponse(
+                    content={
+                        "status": "error",
+                        "message": "Async reply needs a callback_url listed in WEBHOOK_CALLBACK_URLS",
+                        "error_details": error_details
+                    },
+                    status_code=400
+                )
+
+            # Backpressure: don't start a turn the LLM gateway would reject (queued turns wait for a worker instead)
+            if not async_mode and agent.llm_gateway.saturated():
+                return _busy_response()
+
             try:
                 agentId = "1"
                 client_id = payload["client_id"]
@@ -207,77 +324,47 @@ async def handle_webhook(request:Request):
                 }
                 
                 print("start query")
-                query_find = f"SELECT * FROM conversations WHERE members @> ARRAY['{agentId}', '{client_id}'] AND array_length(members, 1) = 2"
-                error_details["database_queries"] = {"find_query": query_find}
-                
-                results = await database.fetch_all(query=query_find)
-                print("finish first query", results)
-                error_details["database_queries"]["find_results"] = str(results)
-                
-                if len(results) < 1:
-                    query = f"INSERT INTO conversations (members, created_at, updated_at, agentid) VALUES (ARRAY['{agentId}', '{client_id}'], EXTRACT(EPOCH FROM CURRENT_TIMESTAMP), EXTRACT(EPOCH FROM CURRENT_TIMESTAMP),{agentId})"
-                    error_details["database_queries"]["insert_query"] = query
-                    
-                    await database.fetch_one(query)
-                    print("inserted con")
-                    
-                    results = await database.fetch_all(query=query_find)
-                    error_details["database_queries"]["insert_results"] = str(results)
-                    
-                    if len(results) > 0:
-                        conversation_id = dict(results[0])["id"]
-                        error_details["conversation_id"] = conversation_id
-                    else:
-                        error_details["database_error"] = "Failed to retrieve conversation after insert"
-                        logging.error("Error inserting conversation.")
-                        return JSONResponse(
-                            content={
-                                "status": "error", 
-                                "message": "Error inserting conversation.",
-                                "error_details": error_details
-                            }, 
-                            status_code=400
-                        )
-                else:
-                    conversation_id = dict(results[0])["id"]
-                    error_details["conversation_id"] = conversation_id
+                conversation_id = await _get_or_create_conversation(agentId, client_id, error_details)
+                if conversation_id is None:
+                    logging.error("Error inserting conversation.")
+                    return JSONResponse(
+                        content={
+                            "status": "error", 
+                            "message": "Error inserting conversation.",
+                            "error_details": error_details
+                        }, 
+                        status_code=400
+                    )
                 
                 input_message_with_key = f"{input_message}{key}{conversation_id}"
                 print(f"Input message: {input_message_with_key}")
                 error_details["processed_message"] = input_message_with_key
-                query = """
-                    INSERT INTO messages (conversation_id, sender, content, type, from_ai, created_at, updated_at, is_summarized)
-                    VALUES (:conversation_id, :sender, :content, 'text', 0, EXTRACT(EPOCH FROM NOW()), EXTRACT(EPOCH FROM NOW()), 0)
-                """
-                params = {
-                    "conversation_id": conversation_id,
-                    "sender": client_id,
-                    "content": payload['message'],
-                }
-                await database.fetch_one(query, values=params)
+                await _insert_message(conversation_id, client_id, payload['message'], from_ai=False)
+                if async_mode:
+                    job_id = await get_webhook_job_queue().enqueue(
+                        conversation_id, agentId, client_id, input_message, callback_url=callback_url
+                    )
+                    return JSONResponse(
+                        content={"status": "accepted", "job_id": job_id, "conversation_id": conversation_id},
+                        status_code=202
+                    )
                 # Call to agent
-                reply = await agent.chat(input=input_message_with_key, config={"configurable": {"thread_id": "10"}})
-                print("reply", reply)
-                query = """
-                    INSERT INTO messages (conversation_id, sender, content, type, from_ai, created_at, updated_at, is_summarized)
-                    VALUES (:conversation_id, :sender, :content, 'text', 1, EXTRACT(EPOCH FROM NOW()), EXTRACT(EPOCH FROM NOW()), 0)
-                """
-                params = {
-                    "conversation_id": conversation_id,
-                    "sender": agentId,
-                    "content": reply,
-                }
-                await database.fetch_one(query, values=params)
-                error_details["agent_reply"] = str(reply)
-
-                relevant_data = await get_relevant_travel_data(input_message, agentId)
+                with deadline_scope(deadline):
+                    config = {"configurable": {"thread_id": conversation_thread_id(conversation_id)}}
+                    reply, documents = await _chat_within_deadline(agent, input_message_with_key, config, deadline)
+                    print("reply", reply)
+                    await _insert_message(conversation_id, agentId, reply, from_ai=True)
+                    error_details["agent_reply"] = str(reply)
+
+                    # Built from the documents the graph already retrieved (no second embed / Weaviate round trip)
+                    relevant_data = _relevant_data_within_deadline(documents, deadline)
                 error_details["relevant_data_preview"] = {
                     "hotels": len(relevant_data.get("hotels", [])),
                     "tours": len(relevant_data.get("tours", []))
                 }
                 
                 return JSONResponse(
-                    content={"status": "ok", "reply": reply, "relevant_data": relevant_data},
+                    content={"status": "ok", "reply": reply, "relevant_data": relevant_data, "degraded": deadline.degraded},
                     status_code=200
                 )
                 
@@ -296,6 +383,9 @@ async def handle_webhook(request:Request):
                     },
                     status_code=400
                 )
+            except LLMGatewayBusy as e:
+                logging.warning(f"LLM gateway busy: {str(e)}")
+                return _busy_response()
             except Exception as e:
                 error_details["processing_error"] = {
                     "type": type(e).__name__,
@@ -356,6 +446,89 @@ async def handle_webhook(request:Request):
             status_code=500
         )
 
+# --------------------------------------------------------------
+# STREAMING INBOUND MESSAGE HANDLER (SSE)
+# --------------------------------------------------------------
+def _sse(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+async def handle_webhook_stream(request: Request):
+    """
+    Simple JSON messages only ({"message": ..., "client_id": ...}). Streams the reply as
+    Server-Sent Events: `token` frames while the responder generates, then one `done`
+    frame with the full reply and relevant_data. The AI message is stored once the stream completes.
+    """
+    error_details = {"timestamp": datetime.now().isoformat()}
+    deadline = deadline_from_headers(request.headers)
+    try:
+        payload = await request.json()
+        input_message = payload.get("message", payload.get("text", ""))
+        if not input_message:
+            return JSONResponse(
+                content={"status": "error", "message": "No message found in payload"},
+                status_code=400
+            )
+        agent = request.state.agent
+        if agent.llm_gateway.saturated():
+            return _busy_response()
+        agentId = "1"
+        client_id = payload["client_id"]
+
+        conversation_id = await _get_or_create_conversation(agentId, client_id, error_details)
+        if conversation_id is None:
+            return JSONResponse(
+                content={
+                    "status": "error",
+                    "message": "Error inserting conversation.",
+                    "error_details": error_details
+                },
+                status_code=400
+            )
+        await _insert_message(conversation_id, client_id, input_message, from_ai=False)
+    except KeyError as e:
+        return JSONResponse(
+            content={"status": "error", "message": f"Missing required field: {str(e)}"},
+            status_code=400
+        )
+    except Exception as e:
+        traceback.print_exc()
+        return JSONResponse(
+            content={"status": "error", "message": f"Internal server error: {str(e)}"},
+            status_code=500
+        )
+
+    input_message_with_key = f"{input_message}{key}{conversation_id}"
+    config = {"configurable": {"thread_id": conversation_thread_id(conversation_id)}}
+
+    async def event_stream():
+        try:
+            with deadline_scope(deadline):
+                async for event in agent.astream_chat(input=input_message_with_key, config=config):
+                    if event["type"] == "token":
+                        yield _sse("token", {"content": event["content"]})
+                        continue
+                    reply = event["reply"]
+                    await _insert_message(conversation_id, agentId, reply, from_ai=True)
+                    yield _sse("done", {
+                        "status": "ok",
+                        "conversation_id": conversation_id,
+                        "reply": reply,
+                        "relevant_data": _relevant_data_within_deadline(event["documents"], deadline),
+                        "degraded": deadline.degraded,
+                    })
+        except Exception as e:
+            traceback.print_exc()
+            logging.error(f"Error streaming reply: {str(e)}")
+            yield _sse("error", {"status": "error", "message": str(e)})
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        # Keep proxies from buffering the stream
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
 # --------------------------------------------------------------
 # Endpoint verification
 # --------------------------------------------------------------
@@ -547,7 +720,7 @@ async def handle_get_accesstoken(phone_agent: str,authorization_code:str, settin
                 'grant_type': 'refresh_token',
                 'refresh_token': token_data['refresh_token'] 
             }
-            response = requests.post(url, data=data_refresh, headers=headers)
+            response = requests.post(url, data=data_refresh, headers=headers, timeout=CALENDLY_TIMEOUT_S)
             # Check if the response is successful
             if response.status_code != 200:
                 raise HTTPException(status_code=response.status_code, detail=f"Error from Calendly API: {response.text}")
@@ -571,7 +744,7 @@ async def handle_get_accesstoken(phone_agent: str,authorization_code:str, settin
             return {"status": "ok", "token": eval(token_json)}
         else:
             # Sending the POST request
-            response = requests.post(url, data=data, headers=headers)
+            response = requests.post(url, data=data, headers=headers, timeout=CALENDLY_TIMEOUT_S)
 
             # Check if the response is successful
             if response.status_code != 200:
@@ -628,7 +801,7 @@ async def handle_get_events(phone_agent: str,min_start_time,max_start_time, sett
                     'grant_type': 'refresh_token',
                     'refresh_token': token_data['refresh_token'] 
                 }
-                response = requests.post(url, data=data_refresh, headers=headers)
+                response = requests.post(url, data=data_refresh, headers=headers, timeout=CALENDLY_TIMEOUT_S)
                 # Check if the response is successful
                 if response.status_code != 200:
                     raise HTTPException(status_code=response.status_code, detail=f"Error from Calendly API: {response.text}")
@@ -659,7 +832,7 @@ async def handle_get_events(phone_agent: str,min_start_time,max_start_time, sett
                 'Authorization': f'Bearer {token_data["access_token"]}'
             }
             # Make the GET request to the Calendly API
-            response = requests.get(url_me, headers=headers)
+            response = requests.get(url_me, headers=headers, timeout=CALENDLY_TIMEOUT_S)
             user_data = response.json()
             user_data = user_data["resource"]
             
@@ -671,7 +844,7 @@ async def handle_get_events(phone_agent: str,min_start_time,max_start_time, sett
                 url_event = f"{url_event}&max_start_time={max_start_time}"
                 
             print("url_event",url_event)
-            response = requests.get(url_event, headers=headers)
+            response = requests.get(url_event, headers=headers, timeout=CALENDLY_TIMEOUT_S)
             events_data = response.json()
             
             return {"status":"ok","token":token_data, "user_data":user_data, "events_data":events_data }   
@@ -705,7 +878,7 @@ async def handle_get_user_availability_schedules(phone_agent: str, settings=Depe
                     'grant_type': 'refresh_token',
                     'refresh_token': token_data['refresh_token'] 
                 }
-                response = requests.post(url, data=data_refresh, headers=headers)
+                response = requests.post(url, data=data_refresh, headers=headers, timeout=CALENDLY_TIMEOUT_S)
                 # Check if the response is successful
                 if response.status_code != 200:
                     raise HTTPException(status_code=response.status_code, detail=f"Error from Calendly API: {response.text}")
@@ -736,7 +909,7 @@ async def handle_get_user_availability_schedules(phone_agent: str, settings=Depe
                 'Authorization': f'Bearer {token_data["access_token"]}'
             }
             # Make the GET request to the Calendly API
-            response = requests.get(url_me, headers=headers)
+            response = requests.get(url_me, headers=headers, timeout=CALENDLY_TIMEOUT_S)
             user_data = response.json()
             user_data = user_data["resource"]
             
@@ -745,7 +918,7 @@ async def handle_get_user_availability_schedules(phone_agent: str, settings=Depe
          
                 
             print("url_availability",url_availability)
-            response = requests.get(url_availability, headers=headers)
+            response = requests.get(url_availability, headers=headers, timeout=CALENDLY_TIMEOUT_S)
             availability_data = response.json()
             
             return {"status":"ok","token":token_data, "user_data":user_data, "availability_data":availability_data }   
@@ -779,7 +952,7 @@ async def handle_get_event_types(phone_agent: str, settings=Depends(get_settings
                     'grant_type': 'refresh_token',
                     'refresh_token': token_data['refresh_token'] 
                 }
-                response = requests.post(url, data=data_refresh, headers=headers)
+                response = requests.post(url, data=data_refresh, headers=headers, timeout=CALENDLY_TIMEOUT_S)
                 # Check if the response is successful
                 if response.status_code != 200:
                     raise HTTPException(status_code=response.status_code, detail=f"Error from Calendly API: {response.text}")
@@ -810,14 +983,14 @@ async def handle_get_event_types(phone_agent: str, settings=Depends(get_settings
                 'Authorization': f'Bearer {token_data["access_token"]}'
             }
             # Make the GET request to the Calendly API
-            response = requests.get(url_me, headers=headers)
+            response = requests.get(url_me, headers=headers, timeout=CALENDLY_TIMEOUT_S)
             user_data = response.json()
             user_data = user_data["resource"]
             
             # list event 
             url_event_types = f"https://api.calendly.com/event_types?active=true&organization={user_data['current_organization']}"     
             # print("event_types",url_event_types)
-            response = requests.get(url_event_types, headers=headers)
+            response = requests.get(url_event_types, headers=headers, timeout=CALENDLY_TIMEOUT_S)
             event_types_data = response.json()
             
             return {"status":"ok","token":token_data, "user_data":user_data, "event_types":event_types_data }   
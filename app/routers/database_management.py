@@ -8,7 +8,9 @@ from typing import List, Dict, Optional
 from databases import Database
 from dotenv import load_dotenv
 import weaviate
-from sentence_transformers import SentenceTransformer
+from agents.embeddings.service import get_embedding_service
+from agents.chat.checkpoint_compaction import compact_checkpoints, CHECKPOINT_KEEP_LAST
+from agents.langgraph_propertyagent.answer_cache import document_key, get_semantic_answer_cache
 import logging
 
 load_dotenv()
@@ -20,7 +22,7 @@ router = APIRouter(prefix="/database", tags=["Database Management"])
 WEAVIATE_URL = os.getenv("WEAVIATE_URL", "http://weaviate:8080")
 WEAVIATE_DEFAULT_PROPERTIES = ["category", "content", "url", "doc_id", "chunk_id", "agentId"]
 WEAVIATE_BATCH_SIZE = 100
-WEAVIATE_EMBEDDING_MODEL = SentenceTransformer('all-distilroberta-v1')
+WEAVIATE_EMBEDDING_SERVICE = get_embedding_service()
 WEAVIATE_CLASS_HOTELS = "Hotels"
 WEAVIATE_CLASS_TOURS = "Tours"
 
@@ -115,6 +117,7 @@ def format_weaviate_record(record: Dict) -> Dict:
     payload = record.get("content")
     parsed_content = None
     if payload:
+        # Parsed here rather than through the catalog record cache: admin listings would evict the hot search entries
         try:
             parsed_content = json.loads(payload)
             if isinstance(parsed_content, str):
@@ -655,6 +658,7 @@ async def delete_weaviate_class(class_name: str):
             )
 
         client.schema.delete_class(class_name)
+        get_semantic_answer_cache().invalidate_class(class_name)
 
         return JSONResponse(
             status_code=200,
@@ -855,6 +859,47 @@ async def get_checkpointer_status():
             }
         )
 
+@router.post("/compact-checkpoints")
+async def compact_checkpoints_now(keep_last: int = CHECKPOINT_KEEP_LAST):
+    """
+    Keep only the newest `keep_last` LangGraph checkpoints per thread and remove
+    orphaned checkpoint_writes / checkpoint_blobs rows
+    """
+    try:
+        from psycopg_pool import AsyncConnectionPool
+
+        async with AsyncConnectionPool(
+            conninfo=DATABASE_URL,
+            min_size=1,
+            max_size=1,
+            kwargs={"autocommit": True, "prepare_threshold": 0}
+        ) as pool:
+            stats = await compact_checkpoints(pool, keep_last)
+
+        return JSONResponse(
+            status_code=200,
+            content={
+                "success": True,
+                "message": "Checkpoint compaction completed successfully",
+                "data": stats
+            }
+        )
+
+    except Exception as e:
+        return JSONResponse(
+            status_code=500,
+            content={
+                "success": False,
+                "message": f"Failed to compact checkpoints: {str(e)}",
+                "error": str(e)
+            }
+        )
+
+def _hotel_embedding_text(hotel: Dict) -> str:
+    """Combine the searchable hotel fields into the text used for its embedding."""
+    return f"{hotel.get('name', '')}. {hotel.get('des', '')}. Located in {hotel.get('city', '')}, {hotel.get('country', '')}. Price: {hotel.get('price_range', '')}"
+
+
 @router.post("/insert-hotels")
 async def insert_hotels_to_weaviate(hotels: List[Dict] = Body(...)):
     """
@@ -869,34 +914,33 @@ async def insert_hotels_to_weaviate(hotels: List[Dict] = Body(...)):
         weaviate_client = weaviate.Client("http://weaviate:8080")
         logger.info("✓ Connected to Weaviate")
         
-        # Initialize embedding model
-        embedding_model = SentenceTransformer('all-distilroberta-v1')
-        logger.info("✓ Loaded embedding model")
-        
-        # Insert hotels
         inserted_count = 0
         failed_count = 0
         errors = []
         
+        # Build the embedding texts first; a malformed hotel is counted as failed instead of failing the batch
+        prepared = []
         for hotel in hotels:
+            try:
+                prepared.append((hotel, _hotel_embedding_text(hotel)))
+            except Exception as e:
+                failed_count += 1
+                error_msg = f"Failed to insert hotel {hotel.get('id', 'unknown')}: {str(e)}"
+                errors.append(error_msg)
+                logger.warning(error_msg)
+        
+        # Encode all hotels in one batched pass on the shared embedding model
+        vectors = await WEAVIATE_EMBEDDING_SERVICE.aencode_batch([text for _, text in prepared])
+        
+        # Insert hotels
+        for (hotel, _), vector in zip(prepared, vectors):
             try:
                 # Prepare hotel data with defaults
                 hotel_id = hotel.get('id', 'unknown')
-                city = hotel.get('city', '')
-                country = hotel.get('country', '')
-                name = hotel.get('name', '')
-                price_range = hotel.get('price_range', '')
-                description = hotel.get('des', '')
                 
                 # Stringify the entire hotel JSON and save to "content" field
                 hotel_json_string = json.dumps(hotel, ensure_ascii=False)
                 
-                # Create content string for embedding (combine all fields for better search)
-                content_for_embedding = f"{name}. {description}. Located in {city}, {country}. Price: {price_range}"
-                
-                # Generate embedding from content
-                vector = embedding_model.encode(content_for_embedding)
-                
                 # Prepare properties following the class structure: category, content, url, doc_id, chunk_id, agentId
                 properties = {
                     "category": "hotel",  # Default category
@@ -911,7 +955,7 @@ async def insert_hotels_to_weaviate(hotels: List[Dict] = Body(...)):
                 weaviate_client.data_object.create(
                     data_object=properties,
                     class_name=WEAVIATE_CLASS_HOTELS,
-                    vector=vector.tolist()
+                    vector=vector
                 )
                 print("inserted_count", inserted_count)
                 
@@ -926,6 +970,11 @@ async def insert_hotels_to_weaviate(hotels: List[Dict] = Body(...)):
                 errors.append(error_msg)
                 logger.warning(error_msg)
         
+        # Cached chat answers that cited these hotels may now be stale
+        get_semantic_answer_cache().invalidate_documents(
+            document_key(WEAVIATE_CLASS_HOTELS, hotel.get('id', 'unknown')) for hotel, _ in prepared
+        )
+        
         return JSONResponse(
             status_code=200,
             content={
@@ -948,6 +997,15 @@ async def insert_hotels_to_weaviate(hotels: List[Dict] = Body(...)):
             detail=f"Error inserting hotels to Weaviate: {str(e)}"
         )
 
+def _tour_embedding_text(tour: Dict) -> str:
+    """Combine the searchable tour fields into the text used for its embedding."""
+    provider = tour.get('provider', {})
+    provider_name = provider.get('name', '') if isinstance(provider, dict) else ''
+    items = tour.get('items', [])
+    items_summary = ', '.join([item.get('location_name', '') for item in items if isinstance(item, dict)])
+    return f"{tour.get('tour_name', '')}. {provider_name}. Located in {tour.get('city', '')}, {tour.get('country', '')}. Locations: {items_summary}"
+
+
 @router.post("/insert-tours")
 async def insert_tours_to_weaviate(tours: List[Dict] = Body(...)):
     """
@@ -962,37 +1020,35 @@ async def insert_tours_to_weaviate(tours: List[Dict] = Body(...)):
         weaviate_client = weaviate.Client("http://weaviate:8080")
         logger.info("✓ Connected to Weaviate")
         
-        # Initialize embedding model
-        embedding_model = SentenceTransformer('all-distilroberta-v1')
-        logger.info("✓ Loaded embedding model")
-        
-        # Insert tours
         inserted_count = 0
         failed_count = 0
         errors = []
         
+        # Build the embedding texts first; a malformed tour is counted as failed instead of failing the batch
+        prepared = []
         for tour in tours:
+            try:
+                prepared.append((tour, _tour_embedding_text(tour)))
+            except Exception as e:
+                failed_count += 1
+                error_msg = f"Failed to insert tour {tour.get('tour_id', 'unknown')}: {str(e)}"
+                errors.append(error_msg)
+                logger.warning(error_msg)
+        
+        # Encode all tours in one batched pass on the shared embedding model
+        vectors = await WEAVIATE_EMBEDDING_SERVICE.aencode_batch([text for _, text in prepared])
+        
+        # Insert tours
+        for (tour, _), vector in zip(prepared, vectors):
             try:
                 # Prepare tour data with defaults
                 tour_id = tour.get('tour_id', 'unknown')
-                tour_name = tour.get('tour_name', '')
-                city = tour.get('city', '')
-                country = tour.get('country', '')
                 provider = tour.get('provider', {})
-                provider_name = provider.get('name', '') if isinstance(provider, dict) else ''
                 provider_website = provider.get('website', '') if isinstance(provider, dict) else ''
-                items = tour.get('items', [])
                 
                 # Stringify the entire tour JSON and save to "content" field
                 tour_json_string = json.dumps(tour, ensure_ascii=False)
                 
-                # Create content string for embedding (combine all fields for better search)
-                items_summary = ', '.join([item.get('location_name', '') for item in items if isinstance(item, dict)])
-                content_for_embedding = f"{tour_name}. {provider_name}. Located in {city}, {country}. Locations: {items_summary}"
-                
-                # Generate embedding from content
-                vector = embedding_model.encode(content_for_embedding)
-                
                 # Prepare properties following the class structure: category, content, url, doc_id, chunk_id, agentId
                 properties = {
                     "category": "tour",  # Default category
@@ -1007,7 +1063,7 @@ async def insert_tours_to_weaviate(tours: List[Dict] = Body(...)):
                 weaviate_client.data_object.create(
                     data_object=properties,
                     class_name=WEAVIATE_CLASS_TOURS,
-                    vector=vector.tolist()
+                    vector=vector
                 )
                 
                 inserted_count += 1
@@ -1021,6 +1077,11 @@ async def insert_tours_to_weaviate(tours: List[Dict] = Body(...)):
                 errors.append(error_msg)
                 logger.warning(error_msg)
         
+        # Cached chat answers that cited these tours may now be stale
+        get_semantic_answer_cache().invalidate_documents(
+            document_key(WEAVIATE_CLASS_TOURS, tour.get('tour_id', 'unknown')) for tour, _ in prepared
+        )
+        
         return JSONResponse(
             status_code=200,
             content={
@@ -0,0 +1,254 @@
+from fastapi import APIRouter, Request
+from fastapi.responses import JSONResponse
+import logging
+
+from agents.embeddings.service import embedding_stats
+from database.conversation_cache import conversation_cache
+from database.processed_messages import processed_messages
+from agents.langgraph_propertyagent.answer_cache import get_semantic_answer_cache
+from agents.llm.token_budget import get_token_budgeter
+from agents.catalog.renderers import get_catalog_renderer
+from agents.catalog.records import get_catalog_records
+from agents.chat.temporal_parser import get_temporal_parser_stats
+from agents.chat.deadline import get_deadline_stats
+from agents.chat.webhook_jobs import get_webhook_job_queue
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(prefix="/metrics", tags=["Metrics"])
+
+
+@router.get("/embedding")
+async def get_embedding_metrics():
+    """
+    Report load time and resident memory of the shared embedding model(s)
+    """
+    return JSONResponse(
+        status_code=200,
+        content={
+            "success": True,
+            "message": "Embedding metrics retrieved successfully",
+            "data": {
+                "services": embedding_stats(),
+            }
+        }
+    )
+
+
+@router.get("/conversation-cache")
+async def get_conversation_cache_metrics():
+    """
+    Report size and hit rate of the per-process conversation metadata cache
+    """
+    return JSONResponse(
+        status_code=200,
+        content={
+            "success": True,
+            "message": "Conversation cache metrics retrieved successfully",
+            "data": conversation_cache.stats()
+        }
+    )
+
+
+@router.get("/routing")
+async def get_routing_metrics(request: Request):
+    """
+    Report which relevance router is active and how often it chose each responder
+    """
+    agent = request.state.agent
+    return JSONResponse(
+        status_code=200,
+        content={
+            "success": True,
+            "message": "Routing metrics retrieved successfully",
+            "data": agent.relevance_router.stats()
+        }
+    )
+
+
+@router.get("/speculation")
+async def get_speculation_metrics(request: Request):
+    """
+    Report hit rate and wasted tokens of speculative no-context generation
+    """
+    agent = request.state.agent
+    data = agent.speculation.stats() if agent.speculation is not None else {"enabled": False}
+    return JSONResponse(
+        status_code=200,
+        content={
+            "success": True,
+            "message": "Speculation metrics retrieved successfully",
+            "data": data
+        }
+    )
+
+
+@router.get("/answer-cache")
+async def get_answer_cache_metrics():
+    """
+    Report size, hit rate and invalidations of the semantic answer cache
+    """
+    return JSONResponse(
+        status_code=200,
+        content={
+            "success": True,
+            "message": "Answer cache metrics retrieved successfully",
+            "data": get_semantic_answer_cache().stats()
+        }
+    )
+
+
+@router.get("/llm-cache")
+async def get_llm_cache_metrics(request: Request):
+    """
+    Report per-chain hit rates of the exact-match LLM result cache
+    """
+    agent = request.state.agent
+    data = agent.llm_cache.stats() if agent.llm_cache is not None else {"backend": "none"}
+    return JSONResponse(
+        status_code=200,
+        content={
+            "success": True,
+            "message": "LLM cache metrics retrieved successfully",
+            "data": data
+        }
+    )
+
+
+@router.get("/prompt-tokens")
+async def get_prompt_token_metrics():
+    """
+    Report prompt token budgets and the final prompt size per LLM chain
+    """
+    return JSONResponse(
+        status_code=200,
+        content={
+            "success": True,
+            "message": "Prompt token metrics retrieved successfully",
+            "data": get_token_budgeter().stats()
+        }
+    )
+
+
+@router.get("/catalog-rendering")
+async def get_catalog_rendering_metrics():
+    """
+    Report prompt token reduction of the hotel/tour renderers and the catalog record cache hit rate
+    """
+    return JSONResponse(
+        status_code=200,
+        content={
+            "success": True,
+            "message": "Catalog rendering metrics retrieved successfully",
+            "data": {
+                **get_catalog_renderer().stats(),
+                "record_cache": get_catalog_records().stats(),
+            }
+        }
+    )
+
+
+@router.get("/calendar-parser")
+async def get_calendar_parser_metrics():
+    """
+    Report how many appointment sentences were parsed locally versus sent to the LLM
+    """
+    return JSONResponse(
+        status_code=200,
+        content={
+            "success": True,
+            "message": "Calendar parser metrics retrieved successfully",
+            "data": get_temporal_parser_stats().stats()
+        }
+    )
+
+
+@router.get("/intents")
+async def get_intent_metrics(request: Request):
+    """
+    Report per-intent turn counts, classification latency and the retrieval time saved by bypassed turns
+    """
+    agent = request.state.agent
+    data = agent.intent_router.stats() if agent.intent_router is not None else {"enabled": False}
+    return JSONResponse(
+        status_code=200,
+        content={
+            "success": True,
+            "message": "Intent metrics retrieved successfully",
+            "data": data
+        }
+    )
+
+
+@router.get("/llm-gateway")
+async def get_llm_gateway_metrics(request: Request):
+    """
+    Report in-flight and queued LLM calls, queue wait time per priority, retries, rejections and hedging
+    """
+    agent = request.state.agent
+    hedge = agent.agent_chat.hedge
+    return JSONResponse(
+        status_code=200,
+        content={
+            "success": True,
+            "message": "LLM gateway metrics retrieved successfully",
+            "data": {
+                **agent.llm_gateway.stats(),
+                "hedge": hedge.stats() if hedge is not None else {"enabled": False},
+            }
+        }
+    )
+
+
+@router.get("/deadlines")
+async def get_deadline_metrics():
+    """
+    Report how many webhook turns had stages degraded to meet the request deadline, per stage
+    """
+    return JSONResponse(
+        status_code=200,
+        content={
+            "success": True,
+            "message": "Deadline metrics retrieved successfully",
+            "data": get_deadline_stats().stats()
+        }
+    )
+
+
+@router.get("/webhook-jobs")
+async def get_webhook_job_metrics():
+    """
+    Report this replica's webhook job workers (claims, retries, queue wait) and the shared queue's jobs per status
+    """
+    queue = get_webhook_job_queue()
+    try:
+        jobs_by_status = await queue.counts()
+    except Exception as e:
+        logger.warning(f"Webhook job count failed: {e}")
+        jobs_by_status = {}
+    return JSONResponse(
+        status_code=200,
+        content={
+            "success": True,
+            "message": "Webhook job metrics retrieved successfully",
+            "data": {
+                **queue.stats(),
+                "jobs_by_status": jobs_by_status,
+            }
+        }
+    )
+
+
+@router.get("/idempotency")
+async def get_idempotency_metrics():
+    """
+    Report how many inbound webhook messages were duplicates answered from the processed_messages record
+    """
+    return JSONResponse(
+        status_code=200,
+        content={
+            "success": True,
+            "message": "Idempotency metrics retrieved successfully",
+            "data": processed_messages.stats()
+        }
+    )
@@ -7,7 +7,8 @@ from pathlib import Path
 from typing import List, Dict
 import re
 import weaviate
-from sentence_transformers import SentenceTransformer
+from agents.embeddings.service import get_embedding_service
+from agents.langgraph_propertyagent.answer_cache import get_semantic_answer_cache
 from pypdf import PdfReader
 import logging
 
@@ -188,6 +189,8 @@ def clear_weaviate_collection(collection_name: str = WEAVIATE_COLLECTION):
         # Create the new collection
         weaviate_client.schema.create_class(class_obj)
         logger.info(f"✓ Recreated collection: {collection_name}")
+        # Every cached chat answer citing the old documents is stale now
+        get_semantic_answer_cache().invalidate_class(collection_name)
         
     except Exception as e:
         logger.error(f"Error recreating Weaviate collection: {e}")
@@ -207,17 +210,13 @@ def insert_to_weaviate(chunked_data: List[Dict], collection_name: str = WEAVIATE
         weaviate_client = weaviate.Client("http://weaviate:8080")
         logger.info("✓ Connected to Weaviate")
         
-        # Initialize embedding model
-        embedding_model = SentenceTransformer('all-distilroberta-v1')
-        logger.info("✓ Loaded embedding model")
+        # Encode every chunk in one batched pass on the shared embedding model
+        vectors = get_embedding_service().encode_batch([item['content'] for item in chunked_data])
         
         # Insert data
         inserted_count = 0
-        for item in chunked_data:
+        for item, vector in zip(chunked_data, vectors):
             try:
-                # Generate embedding
-                vector = embedding_model.encode(item['content'])
-                
                 # Prepare properties
                 properties = {
                     "doc_id": str(item['id']),  # Convert to string
@@ -232,7 +231,7 @@ def insert_to_weaviate(chunked_data: List[Dict], collection_name: str = WEAVIATE
                 weaviate_client.data_object.create(
                     data_object=properties,
                     class_name=collection_name,
-                    vector=vector.tolist()
+                    vector=vector
                 )
                 inserted_count += 1
                 
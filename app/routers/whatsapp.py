@@ -9,23 +9,26 @@ import base64
 
 import os, json
 import logging
+import asyncio
 
 from app.config import get_settings
 from app.utils.whatsapp.status import is_valid_whatsapp_status
 from app.utils.whatsapp.message_inbound import is_valid_whatsapp_message, process_whatsapp_message
 from app.utils.whatsapp.message_outbound import send_whatsapp_text
-from app.controllers.whatsapp import handle_get_event_types, handle_get_user_availability_schedules,handle_get_events, handle_get_accesstoken, handle_webhook, handle_verify, handle_get_messages, handle_get_conversations 
+from app.controllers.whatsapp import handle_get_event_types, handle_get_user_availability_schedules,handle_get_events, handle_get_accesstoken, handle_webhook, handle_webhook_stream, handle_verify, handle_get_messages, handle_get_conversations, process_webhook_job
 from app.decorators.security import signature_required
 
 from collections.abc import AsyncIterator
 from contextlib import asynccontextmanager
 from typing import Any, TypedDict, cast
 
-from langgraph.checkpoint.postgres.aio import AsyncPostgresSaver
 from psycopg_pool import AsyncConnectionPool
 
 
 from agents.chat.property_agent import graph
+from agents.chat.checkpoint_compaction import CompactionSafePostgresSaver, run_compaction_loop
+from agents.chat.conversation_history import ConversationSummarizer, run_summarizer_loop
+from agents.chat.webhook_jobs import run_webhook_workers
 from dotenv import load_dotenv
 load_dotenv()
 
@@ -69,13 +72,25 @@ async def lifespan(app: FastAPI)-> AsyncIterator[State]:
     ) as pool:
          
          # code to execute when app is loading
-        checkpointer = AsyncPostgresSaver(pool)
+        checkpointer = CompactionSafePostgresSaver(pool)
         # await checkpointer.setup() # NOTE: you need to call .setup() the first time you're using your checkpointer (to initialize the tables in DB)
 
         agent=graph()
         await agent.intialize_graph(checkpointer=checkpointer)
         print("agent",agent)
+        # Trim per-thread checkpoint history in the background
+        compaction_task = asyncio.create_task(run_compaction_loop(pool))
+        # Fold older messages of long conversations into conversation_summaries
+        summarizer_task = asyncio.create_task(run_summarizer_loop(ConversationSummarizer(agent.agent_chat)))
+        # Answer turns acknowledged with 202 (WEBHOOK_ASYNC_MODE); claims only while the LLM gateway has a free slot
+        webhook_workers_task = asyncio.create_task(run_webhook_workers(
+            lambda job: process_webhook_job(job, agent),
+            ready=agent.llm_gateway.has_free_slot,
+        ))
         yield {"agent": agent, "db_pool": pool}
+        compaction_task.cancel()
+        summarizer_task.cancel()
+        webhook_workers_task.cancel()
         # await pool.close()
 
 templates = Jinja2Templates(directory="app/views")
@@ -109,6 +124,11 @@ async def verify(
 async def webhook(request: Request):
     return await handle_webhook(request)
 
+# Same as the webhook above for simple JSON messages, with the reply streamed as Server-Sent Events
+@router.post("/stream")
+async def webhook_stream(request: Request):
+    return await handle_webhook_stream(request)
+
 @router.get("/conversations")
 async def get_conversations(settings=Depends(get_settings)):
     return await handle_get_conversations()
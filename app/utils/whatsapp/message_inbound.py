@@ -32,6 +32,17 @@ def is_valid_whatsapp_message(payload):
     )
 
 
+def get_inbound_message_id(payload):
+    """
+    The "message_id" of a simple JSON message (e.g. the wamid a relay received), or None.
+    WhatsApp-format events are rejected by the webhook before any processing, so they are not keyed.
+    """
+    if not isinstance(payload, dict):
+        return None
+    message_id = payload.get("message_id")
+    return str(message_id) if message_id else None
+
+
 
 def process_text_for_whatsapp(text):
     # Remove brackets
@@ -0,0 +1,95 @@
+import os
+from collections import OrderedDict
+from typing import Dict, Iterable, Optional, Tuple
+
+from database.db import database
+from dotenv import load_dotenv
+load_dotenv()
+
+CONVERSATION_CACHE_SIZE = int(os.getenv("CONVERSATION_CACHE_SIZE", "10000"))
+
+
+def _members_key(members: Iterable) -> Tuple[str, ...]:
+    # `members @> ARRAY[...]` is order-insensitive, so the cache key is too
+    return tuple(sorted(str(member) for member in members or []))
+
+
+class ConversationCache:
+    """
+    Per-process LRU of conversation metadata (id -> agentid, members).
+
+    Filled when the webhook looks a conversation up and read by the retriever, so the
+    hot path doesn't SELECT the same row again on every turn.
+    """
+
+    def __init__(self, max_size: int = CONVERSATION_CACHE_SIZE):
+        self.max_size = max(1, max_size)
+        self._by_id: "OrderedDict[int, Dict]" = OrderedDict()
+        self._by_members: Dict[Tuple[str, ...], int] = {}
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def put(self, row) -> Dict:
+        row = dict(row)
+        entry = {
+            "id": int(row["id"]),
+            "agentid": row.get("agentid"),
+            "members": list(row.get("members") or []),
+        }
+        self._by_id[entry["id"]] = entry
+        self._by_id.move_to_end(entry["id"])
+        self._by_members[_members_key(entry["members"])] = entry["id"]
+        while len(self._by_id) > self.max_size:
+            _, evicted = self._by_id.popitem(last=False)
+            self._by_members.pop(_members_key(evicted["members"]), None)
+        return entry
+
+    def get(self, conversation_id) -> Optional[Dict]:
+        entry = self._by_id.get(int(conversation_id))
+        if entry is None:
+            self.misses += 1
+            return None
+        self._by_id.move_to_end(entry["id"])
+        self.hits += 1
+        return entry
+
+    def find_by_members(self, members: Iterable) -> Optional[Dict]:
+        conversation_id = self._by_members.get(_members_key(members))
+        if conversation_id is None:
+            self.misses += 1
+            return None
+        return self.get(conversation_id)
+
+    def invalidate(self, conversation_id=None, members: Optional[Iterable] = None):
+        if members is not None:
+            conversation_id = self._by_members.pop(_members_key(members), conversation_id)
+        if conversation_id is not None:
+            entry = self._by_id.pop(int(conversation_id), None)
+            if entry is not None:
+                self._by_members.pop(_members_key(entry["members"]), None)
+        self.invalidations += 1
+
+    async def get_or_fetch(self, conversation_id) -> Optional[Dict]:
+        entry = self.get(conversation_id)
+        if entry is not None:
+            return entry
+        row = await database.fetch_one(
+            query="SELECT id, agentid, members FROM conversations WHERE id = :id",
+            values={"id": int(conversation_id)},
+        )
+        return self.put(row) if row is not None else None
+
+    def stats(self) -> Dict:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._by_id),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "invalidations": self.invalidations,
+        }
+
+
+conversation_cache = ConversationCache()
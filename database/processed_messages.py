@@ -0,0 +1,123 @@
+import os
+import time
+from collections import OrderedDict
+from typing import Dict, Optional
+
+from database.db import database
+from dotenv import load_dotenv
+load_dotenv()
+
+PROCESSED_MESSAGES_CACHE_SIZE = int(os.getenv("PROCESSED_MESSAGES_CACHE_SIZE", "10000"))
+# A message still marked processing after this long is assumed lost with its replica and may be handled again
+PROCESSED_MESSAGES_PROCESSING_TIMEOUT_S = float(os.getenv("PROCESSED_MESSAGES_PROCESSING_TIMEOUT_S", "300"))
+
+PROCESSING = "processing"
+DONE = "done"
+
+# Claims the message id; a row only comes back when this call inserted it (or took over a stale claim)
+CLAIM_MESSAGE = """
+    INSERT INTO processed_messages (message_id, status, created_at, updated_at)
+    VALUES (:message_id, 'processing', :now, :now)
+    ON CONFLICT (message_id) DO UPDATE SET updated_at = EXCLUDED.updated_at
+    WHERE processed_messages.status = 'processing' AND processed_messages.updated_at < :stale_before
+    RETURNING message_id
+"""
+
+SELECT_MESSAGE = "SELECT status, status_code, response FROM processed_messages WHERE message_id = :message_id"
+
+FINISH_MESSAGE = """
+    UPDATE processed_messages SET status = 'done', status_code = :status_code, response = :response, updated_at = :now
+    WHERE message_id = :message_id
+"""
+
+RELEASE_MESSAGE = "DELETE FROM processed_messages WHERE message_id = :message_id AND status = 'processing'"
+
+
+class ProcessedMessages:
+    """
+    Idempotency record of inbound webhook messages, keyed by message id (wamid).
+
+    The processed_messages table (docker_init/scripts_sql/initialize_processed_messages.sql) is
+    the source of truth shared by replicas; a per-process LRU of recently finished ids in front
+    of it answers their retries without a database round trip.
+    """
+
+    def __init__(self, max_size: int = PROCESSED_MESSAGES_CACHE_SIZE, processing_timeout_s: float = PROCESSED_MESSAGES_PROCESSING_TIMEOUT_S):
+        self.max_size = max(1, max_size)
+        self.processing_timeout_s = processing_timeout_s
+        self._recent: "OrderedDict[str, Dict]" = OrderedDict()
+        self.claims = 0
+        self.duplicates = 0
+        self.duplicates_in_progress = 0
+        self.cache_hits = 0
+
+    def _remember(self, message_id: str, entry: Dict):
+        # Finished messages only: a processing claim may go stale and must be rechecked against the table
+        self._recent[message_id] = entry
+        self._recent.move_to_end(message_id)
+        while len(self._recent) > self.max_size:
+            self._recent.popitem(last=False)
+
+    def _duplicate(self, entry: Dict) -> Dict:
+        self.duplicates += 1
+        if entry["status"] != DONE:
+            self.duplicates_in_progress += 1
+        return entry
+
+    async def claim(self, message_id: str) -> Optional[Dict]:
+        """
+        None when the caller should handle the message; otherwise the existing record
+        ({"status", "status_code", "response"}) of the first delivery.
+        """
+        entry = self._recent.get(message_id)
+        if entry is not None:
+            self._recent.move_to_end(message_id)
+            self.cache_hits += 1
+            return self._duplicate(entry)
+
+        now = time.time()
+        claimed = await database.fetch_one(CLAIM_MESSAGE, values={
+            "message_id": message_id,
+            "now": now,
+            "stale_before": now - self.processing_timeout_s,
+        })
+        if claimed is not None:
+            self.claims += 1
+            return None
+
+        row = await database.fetch_one(SELECT_MESSAGE, values={"message_id": message_id})
+        if row is None:
+            # Released between the two statements; treat as still in flight rather than run it twice
+            return self._duplicate({"status": PROCESSING, "status_code": None, "response": None})
+        entry = dict(row)
+        if entry["status"] == DONE:
+            self._remember(message_id, entry)
+        return self._duplicate(entry)
+
+    async def finish(self, message_id: str, status_code: int, response: str):
+        """Store the response sent for `message_id`; its duplicates get the same one."""
+        await database.execute(FINISH_MESSAGE, values={
+            "message_id": message_id,
+            "status_code": status_code,
+            "response": response,
+            "now": time.time(),
+        })
+        self._remember(message_id, {"status": DONE, "status_code": status_code, "response": response})
+
+    async def release(self, message_id: str):
+        """Drop the claim of a message that wasn't handled, so the sender's retry is processed."""
+        self._recent.pop(message_id, None)
+        await database.execute(RELEASE_MESSAGE, values={"message_id": message_id})
+
+    def stats(self) -> Dict:
+        return {
+            "size": len(self._recent),
+            "max_size": self.max_size,
+            "claims": self.claims,
+            "duplicates": self.duplicates,
+            "duplicates_in_progress": self.duplicates_in_progress,
+            "cache_hits": self.cache_hits,
+        }
+
+
+processed_messages = ProcessedMessages()
@@ -0,0 +1,12 @@
+-- Rolling per-conversation summary of the messages flagged is_summarized = 1
+CREATE TABLE IF NOT EXISTS public.conversation_summaries (
+    conversation_id integer PRIMARY KEY,
+    summary text NOT NULL,
+    summarized_until_id integer NOT NULL,
+    updated_at double precision
+);
+
+-- Per-turn history load and the summarizer only read unsummarized messages
+CREATE INDEX IF NOT EXISTS messages_unsummarized_idx
+    ON public.messages (conversation_id, id)
+    WHERE COALESCE(is_summarized, 0) = 0;
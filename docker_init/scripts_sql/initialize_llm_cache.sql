@@ -0,0 +1,8 @@
+-- Shared LLM result cache (LLM_CACHE_BACKEND=postgres), keyed by sha256 of model params + rendered prompt
+CREATE TABLE IF NOT EXISTS public.llm_cache (
+    key text PRIMARY KEY,
+    response text NOT NULL,
+    created_at double precision NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS llm_cache_created_at_idx ON public.llm_cache (created_at);
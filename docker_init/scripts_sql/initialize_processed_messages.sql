@@ -0,0 +1,10 @@
+-- Inbound webhook messages already handled, keyed by the WhatsApp message id (wamid), so a retried
+-- delivery is answered with the stored response instead of running the agent again
+CREATE TABLE IF NOT EXISTS public.processed_messages (
+    message_id text PRIMARY KEY,
+    status text NOT NULL DEFAULT 'processing',
+    status_code integer,
+    response text,
+    created_at double precision NOT NULL,
+    updated_at double precision NOT NULL
+);
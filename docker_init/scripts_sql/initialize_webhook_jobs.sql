@@ -0,0 +1,23 @@
+-- Durable queue of webhook turns answered asynchronously (WEBHOOK_ASYNC_MODE), shared by all replicas.
+-- callback_url is always one of WEBHOOK_CALLBACK_URLS; the reply is POSTed there.
+-- Workers claim rows with FOR UPDATE SKIP LOCKED; a 'running' row whose locked_at is too old is reclaimed.
+CREATE TABLE IF NOT EXISTS public.webhook_jobs (
+    id bigserial PRIMARY KEY,
+    conversation_id bigint NOT NULL,
+    agent_id text NOT NULL,
+    client_id text NOT NULL,
+    message text NOT NULL,
+    callback_url text,
+    status text NOT NULL DEFAULT 'queued',
+    attempts integer NOT NULL DEFAULT 0,
+    available_at double precision NOT NULL,
+    locked_at double precision,
+    locked_by text,
+    reply text,
+    relevant_data jsonb,
+    error text,
+    created_at double precision NOT NULL,
+    updated_at double precision NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS webhook_jobs_claim_idx ON public.webhook_jobs (status, available_at);
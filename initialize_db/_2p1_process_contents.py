@@ -2,6 +2,7 @@ import json
 import os
 from langchain_core.messages import HumanMessage, SystemMessage
 from langchain_groq import ChatGroq
+from agents.llm.gateway import GatewayChatModel, LLMGateway
 from scripts_offline.initialize_db.utils.text_processing import load_property_data
 
 
@@ -28,11 +29,15 @@ def instruct_summarize(data):
     ]
     return messages
 
-# Initialize the agent
-agent_chat = ChatGroq(
-    model="llama-3.3-70b-versatile", 
-    temperature=0,
-    api_key=os.getenv("GROQ_API_KEY")
+# Initialize the agent (own gateway: TPM budget and retries with backoff instead of failing on a 429)
+agent_chat = GatewayChatModel(
+    model=ChatGroq(
+        model="llama-3.3-70b-versatile", 
+        temperature=0,
+        api_key=os.getenv("GROQ_API_KEY"),
+        max_retries=0
+    ),
+    gateway=LLMGateway()
 )
 
 # Process the data
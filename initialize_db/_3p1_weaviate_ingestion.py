@@ -6,7 +6,7 @@ from weaviate.classes.config import Configure
 import weaviate.classes as wvc
 import json 
 from typing import List, Dict
-from sentence_transformers import SentenceTransformer
+from agents.embeddings.service import get_embedding_service
 # from scripts_offline.initialize_db.utils.text_processing import load_property_data, process_property_data
 
 
@@ -88,7 +88,7 @@ chunked_property_data = process_property_data(property_data)
 
 weaviate_client = weaviate.connect_to_local()
 
-embedding_model = SentenceTransformer('all-distilroberta-v1')
+embedding_service = get_embedding_service()
 
 
 
@@ -112,9 +112,8 @@ collection = weaviate_client.collections.get("SupportAgent")
 
 print("chunked_property_data",chunked_property_data)
 # Generate and add data with custom vectors
-for item in chunked_property_data:
-    # Generate embedding
-    vector = embedding_model.encode(item['content'])
+vectors = embedding_service.encode_batch([item['content'] for item in chunked_property_data])
+for item, vector in zip(chunked_property_data, vectors):
     
     # Add object with custom vector
     collection.data.insert(
@@ -126,9 +125,9 @@ for item in chunked_property_data:
             "content": item['content'],
             "agentId":"1"
         },
-        vector=vector.tolist()  # Convert numpy array to list
+        vector=vector
     )
-    print("vector ...",vector.tolist())
+    print("vector ...",vector)
 
 
 